@@ -0,0 +1 @@
+Image build status is polled for all builds at once, quickly while builds change and less often while they are idle
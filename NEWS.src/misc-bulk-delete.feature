@@ -0,0 +1 @@
+Deleting or cancelling several images, targets, image definitions or users now looks them up in batches, asks for confirmation once, and runs the deletes concurrently.
@@ -0,0 +1 @@
+rbuild now keeps the rBuilder conaryrc in its cache, revalidates it hourly (see the conaryrc entry of cacheTimeouts), and uses the cached copy with a warning when rBuilder does not respond within a few seconds; rBuilder is then not asked again for five minutes.
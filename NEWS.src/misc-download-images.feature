@@ -0,0 +1 @@
+New rbuild download images command fetches image files concurrently, resumes partial downloads and verifies their size and SHA-1 digest
@@ -0,0 +1 @@
+The contents of search path groups are indexed in the rBuild cache directory, and the new "rbuild search" command lists matching packages from that index
@@ -0,0 +1 @@
+rbuild now caches the log messages and diffs of committed source versions shown by "rbuild status --verbose --repository", removing the least recently used entries when the cache grows too large.
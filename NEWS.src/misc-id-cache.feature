@@ -0,0 +1 @@
+rBuilder product and version IDs, and product definition labels, are remembered per checkout so image builds no longer look them up every time
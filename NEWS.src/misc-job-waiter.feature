@@ -0,0 +1 @@
+Jobs started on rBuilder, such as target configuration and image launch, deploy and cancel, are now polled with backoff instead of in a tight loop, and can be given a deadline with the jobTimeout option.
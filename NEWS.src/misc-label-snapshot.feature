@@ -0,0 +1 @@
+useLocal builds on labels the rBuild trove index cannot serve (caching disabled, or the index could not be synced) now keep a snapshot of the stage label in the checkout and fetch only the troves changed since it was taken.
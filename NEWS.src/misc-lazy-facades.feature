@@ -0,0 +1 @@
+rbuild now imports and constructs the conary, rmake and rbuilder facades on first use, so commands that do not need them start faster.
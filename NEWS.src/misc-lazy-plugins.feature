@@ -0,0 +1 @@
+rbuild now loads only the plugins needed by the command being run, using a manifest of plugin commands kept in the cache directory.
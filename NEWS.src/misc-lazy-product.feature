@@ -0,0 +1 @@
+The product definition is now read only by commands that use it, and the version of its source trove is cached in the product checkout.
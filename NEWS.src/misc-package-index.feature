@@ -0,0 +1 @@
+Listing the packages checked out in a stage no longer reads the CONARY file of every checkout each time, and the CONARY file of a checkout is read only once per command.
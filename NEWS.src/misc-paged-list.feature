@@ -0,0 +1 @@
+The list commands now fetch images, projects, targets and users from rBuilder one page at a time and print rows as they arrive. Use --limit and --page-size to control this.
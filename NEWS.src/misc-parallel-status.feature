@@ -0,0 +1 @@
+rbuild status no longer descends into checkouts, asks the repository about all checkouts in one query, and scans local changes several checkouts at a time
@@ -0,0 +1 @@
+rbuild update now updates several checkouts at once, each in a process of its own, skips checkouts already at the head of their branch using one repository query, and prints the output of each update together.
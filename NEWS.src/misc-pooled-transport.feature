@@ -0,0 +1 @@
+XML-RPC calls to rBuilder reuse persistent HTTP connections shared by all clients of a handle instead of connecting for every call
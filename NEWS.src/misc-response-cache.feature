@@ -0,0 +1 @@
+Platform lists and image definition descriptors are now kept in an on-disk cache under ~/.rbuild/cache and revalidated with conditional requests; see the cacheTimeouts and useCache options and the --no-cache flag.
@@ -0,0 +1 @@
+rbuild status and rbuild rebase no longer re-read unchanged files in checkouts to find local modifications.
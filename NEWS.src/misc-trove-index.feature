@@ -0,0 +1 @@
+rbuild now keeps a local sqlite index of the troves in repositories it has mirror access to, brought up to date once per command, and uses it to list the versions on a branch and the latest troves on a label.
@@ -29,7 +29,7 @@ class ListBranchesCommand(command.ListCommand):
 
     def runCommand(self, handle, argSet, args):
         _, project = self.requireParameters(args, expected="PROJECT")
-        self._list(handle, project)
+        self._list(handle, project, **self._getPagingOptions(argSet))
 
 
 class Branches(pluginapi.Plugin):
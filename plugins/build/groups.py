@@ -48,6 +48,17 @@ def _getJobBasedOnProductGroups(handle, groupRecipes, recurse=False):
     groupFlavors = handle.productStore.getGroupFlavors()
     if not (groupFlavors or groupRecipes):
         return None
+
+    # Queue the lookup of the group sources before setting up the rMake
+    # contexts, so that it is sent together with the search path lookup
+    # of the platform's autoload recipes.
+    label = str(handle.productStore.getActiveStageLabel())
+    groupSpecs = {}
+    for groupName, _ in groupFlavors:
+        if groupName not in groupRecipes:
+            groupSpecs[groupName] = (groupName + ':source', label, None)
+    query = handle.facade.conary._queueFindTroves(
+        sorted(set(groupSpecs.values())), allowMissing=True)
     contextDict = handle.facade.rmake._getRmakeContexts()
 
     groupsToFind = {}
@@ -58,12 +69,9 @@ def _getJobBasedOnProductGroups(handle, groupRecipes, recurse=False):
             # build recipe instead of whatever is in the repository
             recipesToBuild.append(groupRecipes[groupName] + '{%s}' % context)
         else:
-            groupsToFind.setdefault(
-                    (groupName + ':source', None, None), []).append(context)
+            groupsToFind.setdefault(groupSpecs[groupName], []).append(context)
 
-    label = handle.productStore.getActiveStageLabel()
-    results = handle.facade.conary._findTroves(groupsToFind.keys(), label,
-                                               allowMissing=True)
+    results = query.result()
     groupsToBuild = []
     for groupSpec in results.keys():
         for context in groupsToFind[groupSpec]:
@@ -0,0 +1,121 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+download command and related utilities.
+"""
+import os
+
+from rbuild import errors
+from rbuild import pluginapi
+from rbuild.internal import download
+from rbuild.pluginapi import command
+
+
+class DownloadCommand(command.CommandWithSubCommands):
+    #pylint: disable-msg=R0923
+    # "the creature can't help its ancestry"
+    help = 'Download files produced by rBuilder'
+
+    commands = ['download']
+
+
+class DownloadImagesCommand(command.BaseCommand):
+    '''
+    Downloads the files of the given image builds, or of the images last
+    built in this checkout.  Files are fetched several at a time, resume
+    where an earlier download stopped, and are checked against the size
+    and SHA-1 digest reported by rBuilder.
+    '''
+    help = 'Download image files'
+    paramHelp = '[buildId]*'
+    docs = {'dir': 'directory to save the files in (default: current'
+                   ' directory)'}
+
+    def addLocalParameters(self, argDef):
+        argDef['dir'] = command.ONE_PARAM
+
+    def runCommand(self, handle, argSet, args):
+        destDir = argSet.pop('dir', None)
+        _, buildIds = self.requireParameters(args, allowExtra=True)
+        for buildId in buildIds:
+            try:
+                int(buildId)
+            except ValueError:
+                raise errors.BadParameterError(
+                    "Cannot parse build id '%s'" % buildId)
+        buildIds = [int(x) for x in buildIds]
+        if not buildIds:
+            buildIds = handle.productStore and \
+                handle.productStore.getImageJobIds()
+            if not buildIds:
+                raise errors.PluginError(
+                    'No builds given and no images have been built in this'
+                    ' checkout')
+        if not handle.Download.downloadImages(buildIds, destDir):
+            return 1
+
+
+class Download(pluginapi.Plugin):
+    name = 'download'
+
+    def initialize(self):
+        self.handle.Commands.getCommandClass('download').registerSubCommand(
+                                    'images', DownloadImagesCommand)
+
+    def registerCommands(self):
+        self.handle.Commands.registerCommand(DownloadCommand)
+
+    def downloadImages(self, buildIds, destDir=None):
+        '''
+        Download the files of image builds, skipping files that are
+        already present with the expected digest
+        @param buildIds: builds to download
+        @type buildIds: list of ints
+        @param destDir: directory to save the files in (default: current
+        directory)
+        @type destDir: string
+        @return: C{True} if every file was downloaded
+        @rtype: bool
+        '''
+        destDir = destDir or os.getcwd()
+        downloads = []
+        for buildId in buildIds:
+            for buildFile in self.handle.facade.rbuilder.getBuildFiles(
+                    buildId):
+                if 'downloadUrl' not in buildFile:
+                    self.handle.ui.warning('Build %d: no download URL for %s',
+                        buildId, buildFile.get('baseFileName',
+                                               buildFile.get('title')))
+                    continue
+                downloads.append(download.FileDownload(
+                    buildFile['downloadUrl'],
+                    os.path.join(destDir, buildFile['baseFileName']),
+                    size=buildFile.get('size'),
+                    sha1=buildFile.get('sha1')))
+
+        ok = True
+        for fileDownload, error in download.Downloader().fetch(downloads):
+            if error is not None:
+                ok = False
+                self.handle.ui.error('Unable to download %s: %s',
+                                     fileDownload.path, error)
+            elif fileDownload.skipped:
+                self.handle.ui.info('%s is up to date', fileDownload.path)
+            else:
+                self.handle.ui.info('Downloaded %s', fileDownload.path)
+        return ok
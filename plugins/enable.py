@@ -40,7 +40,8 @@ class EnablePlatform(pluginapi.Plugin):
     name = 'enable'
 
     def _updatePlatform(self, label, enabled):
-        platform = self.handle.facade.rbuilder.getPlatform(label)
+        rb = self.handle.facade.rbuilder
+        platform = rb.getPlatform(label)
         if platform is None:
             raise errors.PluginError(
                 "No platform with label matching: '%s'" % label)
@@ -50,6 +51,7 @@ class EnablePlatform(pluginapi.Plugin):
         except robj.errors.HTTPUnauthorizedError:
             raise errors.PluginError(
                 "You are not authorized to do this")
+        rb.expirePlatforms()
 
     def disable(self, label):
         self._updatePlatform(label, enabled=False)
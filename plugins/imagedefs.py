@@ -66,7 +66,7 @@ class CreateImageDefCommand(command.BaseCommand):
         _, type, arch = self.requireParameters(
             args, expected=['TYPE', 'ARCH'])
 
-        imageType = [i for i in rb.getImageTypes() if i.name == type]
+        imageType = rb.getImageTypes(name=type)
         if not imageType:
             raise errors.PluginError("No such image type '%s'."
                 " Run `rbuild list imagetypes` to see valid image types" % type)
@@ -83,15 +83,30 @@ class CreateImageDefCommand(command.BaseCommand):
             handle.DescriptorConfig.writeConfig(toFile)
 
 
-class DeleteImageDefsCommand(command.BaseCommand):
+class DeleteImageDefsCommand(command.BulkCommand):
     help = 'Delete image definitions'
     paramHelp = '<imagedef id or name>+'
+    noun = 'image definition'
+    docs = {'force': 'Delete image definitions without prompting',
+            }
 
     def runCommand(self, handle, argSet, args):
+        force = argSet.pop('force', False)
         _, imagedefIds = self.requireParameters(
             args, expected=['ID'], appendExtra=True)
-        for imagedefId in imagedefIds:
-            handle.ImageDefs.delete(imagedefId)
+        self._runBulk(handle, imagedefIds, force)
+
+    def _resolve(self, handle, imagedefIds):
+        return handle.ImageDefs.getImageDefsById(imagedefIds)
+
+    def _executeAll(self, handle, imageDefs):
+        # all of the image definitions live in the product definition, so
+        # they are removed together in a single commit
+        try:
+            handle.ImageDefs.deleteImageDefs(imageDefs)
+        except errors.RbuildBaseError, err:
+            return [(None, err)] * len(imageDefs)
+        return [(None, None)] * len(imageDefs)
 
 
 class ListImageDefsCommand(command.ListCommand):
@@ -233,24 +248,65 @@ class ImageDefs(pluginapi.Plugin):
 
         if imageDefs:
             if self.handle.ui.getYn("Delete {0}?".format(imageDefs[0].name), default=False):
-                self._delete(imageDefId, imageDefs[0].name)
+                self._delete([imageDefId], [imageDefs[0].name])
         else:
             raise MissingImageDefError(image=imageDefId, project=shortName, version=version)
 
-    def _delete(self, imageDefId, imageDefName):
+    def getImageDefsById(self, imageDefIds):
+        '''
+        Get image definitions of the current product version by id, with
+        one query for all of them. Ids that do not match are reported as
+        warnings.
+
+        @param imageDefIds: image definition ids
+        @type imageDefIds: list
+        @return: image definitions, in the order of C{imageDefIds}
+        @rtype: list of rObj(image_definition)
+        '''
+        shortName = self.handle.product.getProductShortname()
+        version = self.handle.product.getProductVersion()
+
+        imageDefs = dict((self._imageDefId(x), x) for x in
+            self.handle.facade.rbuilder.getImageDefs(product=shortName,
+                                                     version=version))
+        found = []
+        for imageDefId in imageDefIds:
+            if imageDefId in imageDefs:
+                found.append(imageDefs[imageDefId])
+            else:
+                self.handle.ui.warning(str(MissingImageDefError(
+                    image=imageDefId, project=shortName, version=version)))
+        return found
+
+    def deleteImageDefs(self, imageDefs):
+        '''
+        Remove image definitions from the product definition, in one
+        commit.
+
+        @param imageDefs: image definitions to remove
+        @type imageDefs: list of rObj(image_definition)
+        '''
+        self._delete([self._imageDefId(x) for x in imageDefs],
+                     [x.name for x in imageDefs])
+
+    def _delete(self, imageDefIds, imageDefNames):
         pd = self.handle.product
         ps = self.handle.productStore
 
         pd.buildDefinition[:] = [ bd for bd in pd.buildDefinition
-                if self._buildDefinitionId(bd) != imageDefId ]
+                if self._buildDefinitionId(bd) not in imageDefIds ]
 
         with open(ps.getProductDefinitionXmlPath(), 'w') as fh:
             pd.serialize(fh, validate=True)
 
-        message = 'Remove image def %s' % imageDefName
+        message = 'Remove image def %s' % ', '.join(imageDefNames)
         ps.commit(message=message)
         ps.update()
 
+    @staticmethod
+    def _imageDefId(imageDef):
+        return imageDef.id.rsplit('/', 1)[-1]
+
     def _buildDefinitionId(self, buildDef):
         """
         compute the build definition ID the same way
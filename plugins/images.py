@@ -20,7 +20,6 @@ images
 '''
 from datetime import datetime
 import os
-import time
 
 from xobj import xobj
 
@@ -42,9 +41,15 @@ class MissingImageError(errors.RbuildError):
     params = ["image", "project", "stage"]
 
 
-class CancelImagesCommand(command.BaseCommand):
+class CancelImagesCommand(command.BulkCommand):
     help = 'Cancel image build'
     paramHelp = '<id>+'
+    noun = 'image'
+    action = 'cancel'
+    done = 'Cancelled'
+    confirm = False
+    # Images.cancel builds descriptor data, which is not thread-safe
+    workers = 1
 
     def runCommand(self, handle, argSet, args):
         _, imageIds = self.requireParameters(args, expected=['id'],
@@ -57,37 +62,54 @@ class CancelImagesCommand(command.BaseCommand):
                 raise errors.BadParameterError(
                     "Cannot parse image id '%s'" % imageId)
 
-            try:
-                image = handle.Images.getImage(imageId)
-            except MissingImageError as err:
-                handle.ui.warning(str(err))
-                continue
+        self._runBulk(handle, imageIds)
 
-            try:
-                handle.Images.cancel(image)
-            except CancelImageError as err:
-                handle.ui.warning(str(err))
+    def _resolve(self, handle, imageIds):
+        return handle.Images.getImagesById(imageIds)
+
+    def _execute(self, handle, image):
+        return handle.Images.cancel(image)
+
+    def _executeAll(self, handle, images):
+        results = command.BulkCommand._executeAll(self, handle, images)
+        jobs = [job for job, error in results if error is None]
+        if jobs:
+            # wait for all of the cancellations together
+            handle.facade.rbuilder.waitForJobs(jobs)
+        return [(job, errors.PluginError(job.status_text))
+                if error is None and job.job_state.name == 'Failed'
+                else (job, error) for job, error in results]
 
+    def _describe(self, image):
+        return image.image_id
 
-class DeleteImagesCommand(command.BaseCommand):
+
+class DeleteImagesCommand(command.BulkCommand):
     help = 'Delete images'
     paramHelp = '<image id>+'
+    noun = 'image'
     docs = {"force": "Delete images without prompting",
             }
 
-    def addLocalParameters(self, argDef):
-        argDef["force"] = "-f", command.NO_PARAM
-
     def runCommand(self, handle, argSet, args):
         force = argSet.pop("force", False)
         _, imageIds = self.requireParameters(
             args, expected=['IMAGEID'], appendExtra=True)
+        validIds = []
         for imageId in imageIds:
             try:
                 int(imageId)
-                handle.Images.delete(imageId, force)
+                validIds.append(imageId)
             except ValueError:
                 handle.ui.warning("Cannot parse image id '%s'" % imageId)
+        if validIds:
+            self._runBulk(handle, validIds, force)
+
+    def _resolve(self, handle, imageIds):
+        return handle.Images.getImagesById(imageIds)
+
+    def _execute(self, handle, image):
+        image.delete()
 
 
 class LaunchCommand(command.BaseCommand):
@@ -144,6 +166,7 @@ class LaunchCommand(command.BaseCommand):
 class ListImagesCommand(command.ListCommand):
     help = 'list images'
     resource = 'images'
+    paged = True
     listFields = ('image_id', 'name', 'image_type', 'architecture',
         'trailing_version', 'time_created', 'status', 'status_message',)
     listFieldMap = dict(
@@ -297,6 +320,31 @@ class Images(pluginapi.Plugin):
                                      image_name)
         return images[0]
 
+    def getImagesById(self, imageIds):
+        '''
+        Get images on the current stage by id, looking all of them up in
+        one query. Ids that do not match an image are reported as warnings.
+
+        :param imageIds: image ids
+        :type imageIds: list of str
+        :returns: the images found, in the order of imageIds
+        :rtype: list of rObj(image)
+        '''
+        project, branch, stage = self._getProductStage()
+        images = dict((str(i.image_id), i) for i in
+                      self.handle.facade.rbuilder.getImages(
+                          project=project, branch=branch, stage=stage,
+                          image_id=list(imageIds)))
+
+        found = []
+        for imageId in imageIds:
+            if imageId in images:
+                found.append(images[imageId])
+            else:
+                self.handle.ui.warning(str(MissingImageError(
+                    image=imageId, project=project, stage=stage)))
+        return found
+
     def getImages(self, image_name):
         rb = self.handle.facade.rbuilder
 
@@ -337,10 +385,10 @@ class Images(pluginapi.Plugin):
         '''
         return self._createJob(self.LAUNCH, *args, **kwargs)
 
-    def list(self):
+    def list(self, **kwargs):
         shortName, baseLabel, stageName = self._getProductStage()
         images = self.handle.facade.rbuilder.getImages(project=shortName,
-            stage=stageName, branch=baseLabel)
+            stage=stageName, branch=baseLabel, **kwargs)
         return images
 
     def initialize(self):
@@ -370,14 +418,15 @@ class Images(pluginapi.Plugin):
             return image[0]
 
     def watchJob(self, job):
-        last_status = None
-        while job.job_state.name in ['Queued', 'Running']:
+        last_status = [None]
+
+        def _showStatus(job):
             status = job.status_text
-            if status != last_status:
+            if job.job_state.name in ['Queued', 'Running'] and \
+                    status != last_status[0]:
                 self.handle.ui.lineOutProgress(status.replace('%', '%%'))
-            last_status = status
-            time.sleep(1)
-            job.refresh()
+            last_status[0] = status
+        self.handle.facade.rbuilder.waitForJobs([job], callback=_showStatus)
 
         if job.job_state.name == 'Failed':
             raise errors.PluginError(job.status_text)
@@ -65,6 +65,7 @@ class DeleteProjectsCommand(command.BaseCommand):
 class ListProjectsCommand(command.ListCommand):
     help = 'list projects'
     resource = 'projects'
+    paged = True
     listFields = ('short_name', 'description', 'repository_hostname',)
     showFieldMap = dict(
         members=dict(hidden=True),
@@ -0,0 +1,69 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+search command and related utilities.
+"""
+from rbuild import pluginapi
+from rbuild.pluginapi import command
+from rbuild.productstore.decorators import requiresProduct
+
+
+class SearchCommand(command.BaseCommand):
+    '''
+    Lists the packages in the groups on the product's search path whose
+    names match a shell-style pattern, such as "python*".  The contents
+    of those groups are indexed in the rBuild cache directory, so groups
+    that have been used before are searched without contacting the
+    repository.
+    '''
+    commands = ['search']
+    help = 'Search the product search path for packages'
+    paramHelp = '<pattern>'
+
+    #pylint: disable-msg=R0201,R0903
+    # could be a function, and too few public methods
+    def runCommand(self, handle, argSet, args):
+        pattern, = self.requireParameters(args, ['pattern'])[1:]
+        handle.Search.searchPackages(pattern)
+
+
+class Search(pluginapi.Plugin):
+    name = 'search'
+
+    def registerCommands(self):
+        self.handle.Commands.registerCommand(SearchCommand)
+
+    @requiresProduct
+    def searchPackages(self, pattern):
+        '''
+        Display the packages on the product search path whose names
+        match C{pattern}
+        @param pattern: shell-style pattern
+        @type pattern: string
+        @return: matching trove tuples
+        @rtype: list
+        '''
+        searchPaths = [ (x.troveName, x.label, None)
+                        for x in self.handle.product.getSearchPaths() ]
+        troveTups = self.handle.facade.conary.searchPackagesInSearchPaths(
+                                                        searchPaths, pattern)
+        if not troveTups:
+            self.handle.ui.info('No packages matching %s found', pattern)
+        for name, version, flavor in troveTups:
+            self.handle.ui.write('%s=%s[%s]', name, version, flavor)
+        return troveTups
@@ -18,9 +18,11 @@
 """
 status command and related utilities.
 """
+import itertools
 import os
 
 from rbuild import pluginapi
+from rbuild.lib import util as rbuild_util
 from rbuild.pluginapi import command
 
 from rbuild.productstore import dirstore
@@ -109,6 +111,8 @@ class StatusCommand(command.BaseCommand):
 
 class Status(pluginapi.Plugin):
     name = 'status'
+    # number of checkouts scanned for local changes at once
+    statusWorkers = 8
 
     def registerCommands(self):
         self.handle.Commands.registerCommand(StatusCommand)
@@ -158,26 +162,68 @@ class Status(pluginapi.Plugin):
                 return dirName[baseDirLen+1:]
             return dirName
 
-        pendingAnnounce = self._printOneDirectoryStatus(
-            directory, stripPrefix(directory), verbosity, '',
-            local=local, repository=repository)
-
+        conaryfacade = self.handle.facade.conary
+        dirList = [directory]
+        if not conaryfacade.isConaryCheckoutDirectory(directory):
+            dirList.extend(self._findDirectories(directory))
+        checkouts = set(x for x in dirList
+                        if conaryfacade.isConaryCheckoutDirectory(x))
+        newerVersions = {}
+        if repository and checkouts:
+            # one repository query for every checkout
+            newerVersions = \
+                conaryfacade._getNewerRepositoryVersionsByDirectory(checkouts)
+
+        def getCheckoutStatus(dirName):
+            if local and dirName in checkouts:
+                return conaryfacade.getCheckoutStatus(dirName)
+            return None
+
+        # Local changes are scanned several checkouts at a time, and each
+        # is printed as soon as it and those before it are ready.
+        pendingAnnounce = ''
+        results = rbuild_util.iterConcurrently(getCheckoutStatus, dirList,
+                                               self.statusWorkers)
+        for dirName, (checkoutStatus, err) in itertools.izip(dirList,
+                                                             results):
+            if err is not None:
+                raise err
+            kwargs = {}
+            if dirName in checkouts:
+                if repository:
+                    kwargs['newerVersions'] = newerVersions[dirName]
+                if local:
+                    kwargs['checkoutStatus'] = checkoutStatus
+            pendingAnnounce = self._printOneDirectoryStatus(
+                dirName, stripPrefix(dirName), verbosity, pendingAnnounce,
+                local=local, repository=repository, **kwargs)
+
+    def _findDirectories(self, directory):
+        '''
+        Lists the directories below C{directory} in a stable order,
+        without descending into Conary checkouts or the product store.
+        '''
+        conaryfacade = self.handle.facade.conary
+        dirList = []
         for dirpath, dirnames, _ in os.walk(directory):
-            for oneDir in sorted(dirnames):
-                if oneDir == '.rbuild':
-                    # product store already handled separately if
-                    # appropriate, stop from recursing
-                    dirnames.remove('.rbuild')
-                    continue
+            if '.rbuild' in dirnames:
+                # product store already handled separately if
+                # appropriate, stop from recursing
+                dirnames.remove('.rbuild')
+            dirnames.sort()
+            for oneDir in dirnames[:]:
                 dirName = os.path.join(dirpath, oneDir)
-                pendingAnnounce = self._printOneDirectoryStatus(
-                    dirName, stripPrefix(dirName), verbosity, pendingAnnounce,
-                    local=local, repository=repository)
-
+                dirList.append(dirName)
+                if conaryfacade.isConaryCheckoutDirectory(dirName):
+                    # the contents of a checkout, such as unpacked
+                    # sources, are never checkouts themselves
+                    dirnames.remove(oneDir)
+        return dirList
 
     def _printOneDirectoryStatus(self, dirName, displayName,
             verbosity, pendingAnnounce=None, proddef=False,
-            local=True, repository=True):
+            local=True, repository=True, newerVersions=None,
+            checkoutStatus=None):
         #pylint: disable-msg=R0912,R0913,R0914
         # branches are required by spec
         # conflating arguments would just make this harder to understand
@@ -194,6 +240,8 @@ class Status(pluginapi.Plugin):
         @param local: Display local filesystem changes not yet committed
         @param repository: Display changes committed to the repository
         but not yet applied locally
+        @param newerVersions: Newer repository versions, if already known
+        @param checkoutStatus: Local changes, if already known
         @return: current stage name pendingAnnounce for next iteration
         '''
 
@@ -203,13 +251,16 @@ class Status(pluginapi.Plugin):
 
             repositoryChanges = False
             if repository:
-                newerVersions = [x for x in
-                    conaryfacade._getNewerRepositoryVersions(dirName)]
+                if newerVersions is None:
+                    newerVersions = [x for x in
+                        conaryfacade._getNewerRepositoryVersions(dirName)]
                 repositoryChanges = newerVersions and True or False
 
             localChanges = False
+            status = checkoutStatus
             if local:
-                status = conaryfacade.getCheckoutStatus(dirName)
+                if status is None:
+                    status = conaryfacade.getCheckoutStatus(dirName)
                 if status:
                     localChanges = True
 
@@ -57,21 +57,24 @@ class CreateTargetCommand(command.BaseCommand):
             handle.DescriptorConfig.writeConfig(toFile)
 
 
-class DeleteTargetsCommand(command.BaseCommand):
+class DeleteTargetsCommand(command.BulkCommand):
     help = 'Delete targets'
     paramHelp = '<target id or name>+'
+    noun = 'target'
     docs = {'force': 'Delete targets without prompting',
             }
 
-    def addLocalParameters(self, argDef):
-        argDef['force'] = '-f', command.NO_PARAM
-
     def runCommand(self, handle, argSet, args):
         force = argSet.pop("force", False)
         _, targetIds = self.requireParameters(
             args, expected=['TARGET'], appendExtra=True)
-        for targetId in targetIds:
-            handle.Targets.delete(targetId, force)
+        self._runBulk(handle, targetIds, force)
+
+    def _resolve(self, handle, targetIds):
+        return handle.Targets.getTargetsByIdOrName(targetIds)
+
+    def _execute(self, handle, target):
+        target.delete()
 
 
 class EditTargetCommand(command.BaseCommand):
@@ -109,6 +112,7 @@ class EditTargetCommand(command.BaseCommand):
 class ListTargetsCommand(command.ListCommand):
     help = 'list targets'
     resource = 'targets'
+    paged = True
     listFields = ('target_id', 'name', 'description', 'is_configured',
                   'credentials_valid')
     listFieldMap = dict(
@@ -146,7 +150,7 @@ class Targets(pluginapi.Plugin):
         dc = self.handle.DescriptorConfig
         rb = self.handle.facade.rbuilder
 
-        targetTypes = [t for t in rb.getTargetTypes() if t.name == targetType]
+        targetTypes = rb.getTargetTypes(name=targetType)
         if not targetTypes:
             raise errors.PluginError(
                 "No such target type '%s'. Run `rbuild list targettypes` to"
@@ -207,13 +211,48 @@ class Targets(pluginapi.Plugin):
             self._deleteTarget(target[0], force)
         else:
             # no target found with that ID, check if the ID is really a name
-            targets = [ t for t in self.handle.facade.rbuilder.getTargets() if t.name == targetId ]
+            targets = self.handle.facade.rbuilder.getTargets(name=targetId)
             if targets:
                 for target in targets:
                     self._deleteTarget(target, force)
             else:
                 self.handle.ui.write("No target found with id or name '%s'" % targetId)
 
+    def getTargetsByIdOrName(self, targetIds):
+        '''
+            Get the targets matching each of C{targetIds}, first by id and
+            then by name, with one query for the ids and one for the
+            names. Values that match nothing are reported.
+
+            @param targetIds: target ids or names
+            @type targetIds: list of string
+            @return: matching targets, in the order of C{targetIds}
+            @rtype: list of rObj(target)
+        '''
+        rb = self.handle.facade.rbuilder
+        found = {}
+        ids = [x for x in targetIds if x.isdigit()]
+        if ids:
+            for target in rb.getTargets(target_id=ids):
+                # only keep what was asked for, whatever the server sent
+                if str(target.target_id) in ids:
+                    found.setdefault(str(target.target_id), []).append(target)
+        # anything not found by id may be a name
+        names = [x for x in targetIds if x not in found]
+        if names:
+            for target in rb.getTargets(name=names):
+                if str(target.name) in names:
+                    found.setdefault(str(target.name), []).append(target)
+
+        targets = []
+        for targetId in targetIds:
+            if targetId in found:
+                targets.extend(found[targetId])
+            else:
+                self.handle.ui.write(
+                    "No target found with id or name '%s'" % targetId)
+        return targets
+
     def _deleteTarget(self, target, force=False):
         """ target: rObj representing target """
         if force or self.handle.ui.getYn("Delete {0}?".format(target.name),
@@ -248,8 +287,7 @@ class Targets(pluginapi.Plugin):
         if rb.isAdmin(self.handle.getConfig().user[0]):
             currentValues = dict((e, getattr(target.target_configuration, e))
                                  for e in target.target_configuration.elements)
-            ttype = [t for t in rb.getTargetTypes()
-                     if t.name == target.target_type.name][0]
+            ttype = rb.getTargetTypes(name=target.target_type.name)[0]
             ddata = dc.createDescriptorData(
                 fromStream=ttype.descriptor_create_target.read(),
                 defaults=currentValues,
@@ -268,7 +306,7 @@ class Targets(pluginapi.Plugin):
             'targets', ListTargetsCommand)
 
     def list(self, *args, **kwargs):
-        return self.handle.facade.rbuilder.getTargets()
+        return self.handle.facade.rbuilder.getTargets(**kwargs)
 
     def show(self, *args, **kwargs):
         return self.handle.facade.rbuilder.getTarget(*args, **kwargs)
@@ -19,9 +19,11 @@
 Update packages and product definition source troves managed by Conary
 """
 import os
+import sys
 
 from rbuild import errors
 from rbuild import pluginapi
+from rbuild.lib import util as rbuild_util
 from rbuild.productstore.decorators import requiresStage
 from rbuild.productstore.decorators import requiresProduct
 
@@ -132,6 +134,8 @@ class Update(pluginapi.Plugin):
     Update plugin
     """
     name = 'update'
+    # number of checkouts updated at once
+    updateWorkers = 4
 
     def registerCommands(self):
         """
@@ -182,15 +186,57 @@ class Update(pluginapi.Plugin):
         @type stageNames: list of strings
         """
         productStore = self.handle.productStore
+        packageDirs = []
         for stageName in stageNames:
             for checkoutDict in productStore.getEditedRecipeDicts(stageName):
                 for packageDir in sorted(checkoutDict.values()):
                     if not os.path.isdir(packageDir):
                         packageDir = os.path.dirname(packageDir)
-                    self.handle.facade.conary.updateCheckout(packageDir)
+                    packageDirs.append(packageDir)
+        self._updateCheckouts(packageDirs)
 
     def updateCurrentDirectory(self):
         """
         Update the contents of the source package in the current directory
         """
-        self.handle.facade.conary.updateCheckout(os.getcwd())
+        self._updateCheckouts([os.getcwd()])
+
+    def _updateCheckouts(self, packageDirs):
+        """
+        Update several source checkouts at a time, skipping those already
+        at the head of their branch.  Each update runs in a forked process
+        of its own, since conary checkin updates use process-wide state
+        such as the output streams.  The output of each update is written
+        as a group, in the order of C{packageDirs}.  After a failure no
+        further updates are started.
+        @param packageDirs: directories containing source checkouts
+        @type packageDirs: list of strings
+        """
+        conaryfacade = self.handle.facade.conary
+        packageDirs = rbuild_util.unique(packageDirs)
+        if not packageDirs:
+            return
+        # one repository query for every checkout
+        newerVersions = \
+            conaryfacade._getNewerRepositoryVersionsByDirectory(packageDirs)
+        packageDirs = [x for x in packageDirs if newerVersions.get(x, True)]
+        if len(packageDirs) < 2 or self.updateWorkers < 2:
+            for packageDir in packageDirs:
+                conaryfacade.updateCheckout(packageDir)
+            return
+
+        def updateCheckout(packageDir):
+            # the repository connections of the parent cannot be shared
+            conaryfacade.clearCachedClient()
+            conaryfacade.updateCheckout(packageDir)
+
+        results = rbuild_util.iterForked(updateCheckout, packageDirs,
+                                         self.updateWorkers)
+        firstError = None
+        for output, error in results:
+            sys.stdout.write(output)
+            if error is not None and firstError is None:
+                firstError = error
+        sys.stdout.flush()
+        if firstError is not None:
+            raise errors.RbuildError(firstError)
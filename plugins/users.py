@@ -100,17 +100,27 @@ class CreateUserCommand(command.BaseCommand):
                 "a user '%s' already exists" % user_name)
 
 
-class DeleteUsersCommand(command.BaseCommand):
+class DeleteUsersCommand(command.BulkCommand):
     help = 'Delete an rbuilder user'
     paramHelp = '<username>+'
+    noun = 'user'
+    docs = {'force': 'Delete users without prompting',
+            }
 
     def runCommand(self, handle, argSet, args):
+        force = argSet.pop('force', False)
         _, usernames = self.requireParameters(args, expected='USERNAME',
             appendExtra=True)
+        self._runBulk(handle, usernames, force)
 
-        for user in usernames:
-            if handle.ui.getYn("Really delete user '%s'" % user, False):
-                handle.Users.delete(user)
+    def _resolve(self, handle, usernames):
+        return handle.Users.getUsersByName(usernames)
+
+    def _execute(self, handle, user):
+        user.delete()
+
+    def _describe(self, user):
+        return user.user_name
 
 
 class EditUserCommand(command.BaseCommand):
@@ -217,6 +227,7 @@ class ListUsersCommand(command.ListCommand):
     paramHelp = '<username>+'
 
     resource = 'users'
+    paged = True
     listFields = ('user_id', 'user_name', 'full_name', 'email', 'is_admin',
         'external_auth', 'can_create')
     showFieldMap = dict(
@@ -285,6 +296,26 @@ class Users(pluginapi.Plugin):
         else:
             self.handle.ui.warning("No user '%s' found" % user_name)
 
+    def getUsersByName(self, user_names):
+        '''Get several users with one query. Names that do not match a
+        user are reported as warnings.
+
+        :param user_names: names of the users
+        :type user_names: list of str
+        :returns: the users found, in the order of user_names
+        :rtype: list of robj(user)
+        '''
+        users = dict((u.user_name, u) for u in
+                     self.handle.facade.rbuilder.getUsers(
+                         user_name=list(user_names)))
+        found = []
+        for user_name in user_names:
+            if user_name in users:
+                found.append(users[user_name])
+            else:
+                self.handle.ui.warning("No user '%s' found" % user_name)
+        return found
+
     def edit(self, user, full_name=None, email=None, password=None,
             external_auth=None, is_admin=None, can_create=None):
         '''Change fields on an existing user. None values are assuemd to be
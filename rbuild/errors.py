@@ -231,6 +231,15 @@ class RbuilderError(RbuildError):
 class RbuilderUserError(RbuilderError):
     template = 'Error retrieving user details: %(error)s: %(frozen)r'
 
+class JobTimeoutError(RbuildError):
+    template = "Timed out after %(timeout)s seconds waiting for rBuilder jobs"
+    params = ['timeout']
+
+
+class DownloadError(RbuildError):
+    template = "Download of %(path)s failed: %(reason)s"
+    params = ['path', 'reason']
+
 
 ## END rBuild Errors
 
@@ -31,7 +31,11 @@ Module functions, classes, and class methods that do not start
 with a C{_} character are public.
 """
 
+import errno
+import httplib
+import socket
 import sys
+import threading
 import urllib
 import xmlrpclib
 from conary.lib import util
@@ -98,6 +102,124 @@ class _Method(xmlrpclib._Method):
                 del eType, eValue, eTraceback
 
 
+class PooledTransport(xmlrpclib.Transport):
+    """
+    XML-RPC transport that keeps HTTP/1.1 connections open between calls.
+    Idle connections are pooled per host, so one transport can be shared
+    by many server proxies and used from several threads at once.  A call
+    that fails because the server closed an idle connection is retried
+    once on a new connection.
+
+    @param secure: use HTTPS
+    @type  secure: bool
+    @param maxIdle: most idle connections kept open per host
+    @type  maxIdle: int
+    """
+
+    _staleErrors = (errno.ECONNRESET, errno.ECONNABORTED, errno.EPIPE)
+
+    def __init__(self, secure=False, use_datetime=0, maxIdle=8):
+        xmlrpclib.Transport.__init__(self, use_datetime=use_datetime)
+        self.secure = secure
+        self.maxIdle = maxIdle
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def request(self, host, handler, request_body, verbose=0):
+        for attempt in (0, 1):
+            self._local.fresh = bool(attempt)
+            try:
+                return self.single_request(host, handler, request_body,
+                    verbose)
+            except (socket.error, httplib.BadStatusLine), err:
+                if (attempt or not getattr(self._local, 'reused', False)
+                        or (isinstance(err, socket.error)
+                            and err.errno not in self._staleErrors)):
+                    raise
+                # the other idle connections to this host have most
+                # likely timed out as well
+                self._closeIdle(host)
+
+    def single_request(self, host, handler, request_body, verbose=0):
+        try:
+            result = xmlrpclib.Transport.single_request(self, host, handler,
+                request_body, verbose)
+        except xmlrpclib.Fault:
+            # the response was read in full; the connection is still good
+            self._release()
+            raise
+        except Exception:
+            self.close()
+            raise
+        self._release()
+        return result
+
+    def make_connection(self, host):
+        # the extra headers carry the credentials of this request, so they
+        # are kept per thread rather than on the shared transport
+        chost, self._local.extraHeaders, x509 = self.get_host_info(host)
+        connection = None
+        if not getattr(self._local, 'fresh', False):
+            self._lock.acquire()
+            try:
+                idle = self._idle.get(chost)
+                if idle:
+                    connection = idle.pop()
+            finally:
+                self._lock.release()
+        self._local.reused = connection is not None
+        if connection is None:
+            if self.secure:
+                connection = httplib.HTTPSConnection(chost, None,
+                    **(x509 or {}))
+            else:
+                connection = httplib.HTTPConnection(chost)
+        self._local.connection = chost, connection
+        return connection
+
+    def send_host(self, connection, host):
+        extraHeaders = getattr(self._local, 'extraHeaders', None)
+        if extraHeaders:
+            if isinstance(extraHeaders, dict):
+                extraHeaders = extraHeaders.items()
+            for key, value in extraHeaders:
+                connection.putheader(key, value)
+
+    def close(self):
+        """
+        Close the connection in use by the calling thread, if any.
+        """
+        current = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if current is not None:
+            current[1].close()
+
+    def _release(self):
+        chost, connection = self._local.connection
+        self._local.connection = None
+        self._lock.acquire()
+        try:
+            idle = self._idle.setdefault(chost, [])
+            if len(idle) < self.maxIdle:
+                idle.append(connection)
+                connection = None
+        finally:
+            self._lock.release()
+        if connection is not None:
+            connection.close()
+
+    def _closeIdle(self, host):
+        chost = self.get_host_info(host)[0]
+        self._lock.acquire()
+        try:
+            idle = self._idle.pop(chost, [])
+        finally:
+            self._lock.release()
+        for connection in idle:
+            connection.close()
+
+
 class ServerProxy(xmlrpclib.ServerProxy):
     """
     Generic ServerProxy that supports injecting username/password into
@@ -113,6 +235,10 @@ class ServerProxy(xmlrpclib.ServerProxy):
     #pylint: disable-msg=R0913
     # we really need all those arguments
     def __init__(self, uri, username=None, password=None, *args, **kwargs):
+        if not args and kwargs.get('transport') is None:
+            kwargs['transport'] = PooledTransport(
+                secure=uri.lower().startswith('https:'),
+                use_datetime=kwargs.get('use_datetime', 0))
         xmlrpclib.ServerProxy.__init__(self, uri, *args, **kwargs)
         # Hide password
         userpass, hostport = urllib.splituser(self.__host)
@@ -25,32 +25,100 @@ all plugins through the C{handle} object.
 """
 import sys
 import copy
+import fnmatch
+import httplib
 import itertools
 import os
+import socket
 import stat
+import threading
+import time
 import types
+import urllib2
 import urlparse
+from StringIO import StringIO
 
 from conary import conarycfg
 from conary import conaryclient
-from conary import checkin
 from conary import errors as conaryerrors
 from conary import state
 from conary import trove
 from conary import versions
 
-from conary.build import loadrecipe
-from conary.build import use
-from conary.build import errors as builderrors
-from conary.build import derive
-
-from conary.cmds import clone
-from conary.cmds import updatecmd
 from conary.conaryclient import cmdline
 from conary.deps import deps
 from conary.lib import util
 
 from rbuild import errors
+from rbuild.internal import groupindex
+from rbuild.internal import historycache
+from rbuild.internal import httpcache
+from rbuild.internal import labelsnapshot
+from rbuild.internal import statcache
+from rbuild.internal import troveindex
+from rbuild.lib import util as rbuild_util
+
+
+class _TroveQuery(object):
+    """
+    Pending C{findTroves} lookup queued on a L{ConaryFacade}.  Lookups
+    queued together that share a label path, default flavor and
+    C{allowMissing} setting are sent to the repository as a single
+    C{findTroves} call when the first of them is resolved.
+    """
+
+    def __init__(self, facade, labelPath, specs, specMap, defaultFlavor,
+                 allowMissing):
+        self._facade = facade
+        self.labelPath = labelPath
+        self.specs = specs
+        self.specMap = specMap
+        self.defaultFlavor = defaultFlavor
+        self.allowMissing = allowMissing
+        # lookups with the same key can share a findTroves call
+        self.key = (self._freeze(labelPath), self._freeze(defaultFlavor),
+                    bool(allowMissing))
+        self._done = False
+        self._result = None
+        self._error = None
+
+    @staticmethod
+    def _freeze(value):
+        if isinstance(value, list):
+            return tuple(value)
+        return value
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        """
+        Wait for the lookup, flushing the queue it belongs to if needed.
+        @return: dictionary mapping each trove spec to the list of trove
+        tuples found for it, as returned by C{findTroves}
+        """
+        if not self._done:
+            self._facade._flushTroveQueries()
+        if not self._done:
+            raise errors.RbuildError('Trove lookup was abandoned')
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _set(self, result=None, error=None):
+        if error is None:
+            self._result = dict((self.specMap[x], result[x])
+                                for x in self.specs if x in result)
+        self._error = error
+        self._done = True
+
+
+# Default seconds the rBuilder conaryrc is used before revalidating it
+CONARYRC_CACHE_TIMEOUT = 60 * 60
+# Seconds to wait for rBuilder before using the cached conaryrc
+CONARYRC_REQUEST_TIMEOUT = 3
+# Seconds the cached conaryrc is used after rBuilder could not be reached
+CONARYRC_RETRY_TIMEOUT = 5 * 60
 
 
 class ConaryFacade(object):
@@ -67,7 +135,18 @@ class ConaryFacade(object):
         """
         self._handle = handle
         self._conaryCfg = None
+        self._conaryClient = None
         self._initializedFlavors = False
+        self._groupIndex = None
+        self._statCache = None
+        self._historyCache = None
+        self._troveIndex = None
+        self._indexedHosts = {}
+        self._responseCache = None
+        self._conaryStates = {}
+        self._pendingQueries = []
+        self._queueLock = threading.Lock()
+        self._flushLock = threading.Lock()
 
 #{ Private Methods
     def _parseRBuilderConfigFile(self, cfg):
@@ -76,11 +155,57 @@ class ConaryFacade(object):
         @param cfg: configuration file to add rbuilder configuration
         data to.
         """
-        serverUrl = self._handle.getConfig().serverUrl
+        rbuildCfg = self._handle.getConfig()
+        serverUrl = rbuildCfg.serverUrl
         if serverUrl:
             hostname = urlparse.urlparse(serverUrl)[1]
             if hostname not in ['www.rpath.com', 'www.rpath.org']:
-                cfg.includeConfigFile(serverUrl + '/conaryrc')
+                url = serverUrl + '/conaryrc'
+                if not rbuildCfg.useCache:
+                    cfg.includeConfigFile(url)
+                    return
+                cache = self._getResponseCache()
+                try:
+                    contents = cache.get(url, 'conaryrc')
+                except (urllib2.URLError, socket.error,
+                        httplib.HTTPException), err:
+                    contents = cache.getStale(url)
+                    if contents is None:
+                        # nothing to fall back to; fail as we always have
+                        cfg.includeConfigFile(url)
+                        return
+                    self._handle.ui.warning('Could not refresh %s (%s),'
+                        ' using the copy fetched earlier', url, err)
+                    # do not wait for rBuilder again on every command
+                    cache.touch(url, 'conaryrc',
+                                seconds=CONARYRC_RETRY_TIMEOUT)
+                cfg.readObject(url, StringIO(contents))
+
+    def _getResponseCache(self):
+        """
+        Get the cache of the rBuilder conaryrc, kept in the rBuild cache
+        directory.  The conaryrc is revalidated once per
+        C{cacheTimeouts conaryrc} seconds, and requests give up after
+        C{CONARYRC_REQUEST_TIMEOUT} seconds.
+        """
+        if self._responseCache is None:
+            cfg = self._handle.getConfig()
+            timeouts = {'conaryrc': CONARYRC_CACHE_TIMEOUT}
+            timeouts.update(cfg.cacheTimeouts)
+            self._responseCache = httpcache.ResponseCache(cfg.cacheDirectory,
+                timeouts=timeouts, enabled=cfg.useCache,
+                requestTimeout=CONARYRC_REQUEST_TIMEOUT)
+        return self._responseCache
+
+    def _invalidateRBuilderConfigFile(self):
+        """
+        Drop the cached rBuilder conaryrc, which lists the repositories
+        of every project, so that the next configuration fetches it.
+        """
+        serverUrl = self._handle.getConfig().serverUrl
+        if serverUrl:
+            self._getResponseCache().invalidate(serverUrl + '/conaryrc')
+        self.clearCachedConfig()
 
     def _initializeFlavors(self):
         if not self._initializedFlavors:
@@ -89,9 +214,14 @@ class ConaryFacade(object):
 
     def _getConaryClient(self):
         """
-        Get a conaryclient object
+        Get a conaryclient object.  The client is created once for the
+        cached conary configuration, so that its repository connections
+        and server version negotiation are reused across calls.
         """
-        return conaryclient.ConaryClient(self.getConaryConfig())
+        cfg = self.getConaryConfig()
+        if self._conaryClient is None or self._conaryClient[0] is not cfg:
+            self._conaryClient = (cfg, conaryclient.ConaryClient(cfg))
+        return self._conaryClient[1]
 
     def _getRepositoryClient(self):
         """
@@ -190,6 +320,28 @@ class ConaryFacade(object):
 
     def _findTroves(self, specList, labelPath=None,
                     defaultFlavor=None, allowMissing=False):
+        return self._queueFindTroves(specList, labelPath=labelPath,
+                                     defaultFlavor=defaultFlavor,
+                                     allowMissing=allowMissing).result()
+
+    def _queueFindTroves(self, specList, labelPath=None,
+                         defaultFlavor=None, allowMissing=False):
+        """
+        Queue a C{findTroves} lookup without sending it yet.  Lookups
+        queued before the first of them is resolved that share a label
+        path, default flavor and C{allowMissing} setting are combined into
+        a single repository query, so callers that know several lookups
+        up front should queue them all before resolving any.
+        @param specList: trove specs to find, as strings or
+        C{(name, version, flavor)} tuples
+        @param labelPath: label(s) to search
+        @param defaultFlavor: flavor(s) to use for specs without one
+        @param allowMissing: if True, specs that are not found are left
+        out of the result instead of raising an error
+        @return: lookup whose C{result()} returns what L{_findTroves}
+        would have returned
+        @rtype: L{_TroveQuery}
+        """
         newSpecList = []
         specMap = {}
         for spec in specList:
@@ -199,17 +351,93 @@ class ConaryFacade(object):
                 newSpec = spec
             newSpecList.append(newSpec)
             specMap[newSpec] = spec
-        repos = self._getRepositoryClient()
         if isinstance(labelPath, (tuple, list)):
             labelPath = [ self._getLabel(x) for x in labelPath ]
         elif labelPath:
             labelPath = self._getLabel(labelPath)
 
         defaultFlavor = self._getFlavor(defaultFlavor, keepNone=True)
-        results = repos.findTroves(labelPath, newSpecList,
-                                   defaultFlavor = defaultFlavor,
-                                   allowMissing=allowMissing)
-        return dict((specMap[x[0]], x[1]) for x in results.items())
+        query = _TroveQuery(self, labelPath, newSpecList, specMap,
+                            defaultFlavor, allowMissing)
+        self._queueLock.acquire()
+        try:
+            self._pendingQueries.append(query)
+        finally:
+            self._queueLock.release()
+        return query
+
+    def _flushTroveQueries(self):
+        """
+        Send every queued lookup to the repository, one C{findTroves}
+        call per distinct label path, default flavor and C{allowMissing}
+        setting.  Lookups that could not be sent are failed with the
+        error that stopped them.
+        """
+        self._flushLock.acquire()
+        try:
+            self._queueLock.acquire()
+            try:
+                pending, self._pendingQueries = self._pendingQueries, []
+            finally:
+                self._queueLock.release()
+            if not pending:
+                return
+            try:
+                self._sendTroveQueries(pending)
+            except Exception, err:
+                for query in pending:
+                    if not query.done():
+                        query._set(error=err)
+        finally:
+            self._flushLock.release()
+
+    def _sendTroveQueries(self, pending):
+        groups = {}
+        groupOrder = []
+        for query in pending:
+            if query.key not in groups:
+                groups[query.key] = []
+                groupOrder.append(query.key)
+            groups[query.key].append(query)
+
+        repos = self._getRepositoryClient()
+        for key in groupOrder:
+            queries = groups[key]
+            troveSpecs = []
+            seen = set()
+            for query in queries:
+                for troveSpec in query.specs:
+                    if troveSpec not in seen:
+                        seen.add(troveSpec)
+                        troveSpecs.append(troveSpec)
+            if not troveSpecs:
+                for query in queries:
+                    query._set({})
+                continue
+            try:
+                results = self._sendTroveQuery(repos, queries[0], troveSpecs)
+            except Exception, err:
+                if len(queries) == 1:
+                    queries[0]._set(error=err)
+                    continue
+                # Send the lookups separately so that the failure is only
+                # reported to the lookup that caused it.
+                for query in queries:
+                    try:
+                        query._set(self._sendTroveQuery(repos, query,
+                                                        query.specs))
+                    except Exception, err:
+                        query._set(error=err)
+                continue
+            for query in queries:
+                query._set(results)
+
+    @staticmethod
+    def _sendTroveQuery(repos, query, troveSpecs):
+        kwargs = dict(allowMissing=query.allowMissing)
+        if query.defaultFlavor is not None:
+            kwargs['defaultFlavor'] = query.defaultFlavor
+        return repos.findTroves(query.labelPath, troveSpecs, **kwargs)
 
     def _findTrove(self, name, version, flavor=None, labelPath=None,
                    defaultFlavor = None, allowMissing=False):
@@ -235,11 +463,11 @@ class ConaryFacade(object):
         Note that C{version} and C{flavor} objects are B{opaque}.
         @rtype: (string, conary.versions.Version conary.deps.deps.Flavor)
         """
-        repos = self._getRepositoryClient()
         flavor = self._getFlavor(flavor)
         defaultFlavor = self._getFlavor(defaultFlavor)
         try:
-            results = repos.findTroves(labelPath, [(name, version, flavor)],
+            results = self._findTroves([(name, version, flavor)],
+                                       labelPath=labelPath,
                                        defaultFlavor=defaultFlavor,
                                        allowMissing=allowMissing)
         except conaryerrors.LabelPathNeeded:
@@ -351,9 +579,20 @@ class ConaryFacade(object):
 
     def clearCachedConfig(self):
         """
-        Purges the cached Conary config object, if any.
+        Purges the cached Conary config object, if any, along with the
+        client created from it.
         """
         self._conaryCfg = None
+        self._conaryClient = None
+
+    def clearCachedClient(self):
+        """
+        Purges the cached conaryclient object, if any, so that the next
+        one opens repository connections of its own.  A forked process
+        must do this before talking to the repository, since the
+        connections of its parent cannot be shared.
+        """
+        self._conaryClient = None
 
     @staticmethod
     def setFactoryFlag(factoryName, targetDir=None):
@@ -365,12 +604,15 @@ class ConaryFacade(object):
         is the current directory
         @type targetDir: string
         """
+        from conary import checkin
         if not factoryName:
             # convert from None to checkin's accepted ''
             factoryName = ''
         checkin.factory(factoryName, targetDir=targetDir)
 
     def commit(self, targetDir, message):
+        from conary import checkin
+        from conary.build import use
         cfg = self.getConaryConfig()
         self._initializeFlavors()
         use.setBuildFlagsFromFlavor(None, cfg.buildFlavor, False)
@@ -378,6 +620,7 @@ class ConaryFacade(object):
         try:
             os.chdir(targetDir)
             checkin.commit(self._getRepositoryClient(), cfg, message=message)
+            self._repositoryChanged()
         except conaryerrors.CvcError, e:
             tb = sys.exc_info()[2]
             raise errors.RbuildError, str(e), tb
@@ -400,6 +643,7 @@ class ConaryFacade(object):
         defaults to C{package}
         @type targetDir: string
         """
+        from conary import checkin
         cfg = self.getConaryConfig()
         checkin.checkout(self._getRepositoryClient(), cfg,
                          targetDir, ['%s=%s' % (package, label)])
@@ -410,6 +654,8 @@ class ConaryFacade(object):
         @param targetDir: checkout directory to refresh
         @type targetDir: string
         """
+        from conary import checkin
+        from conary.build import use
         cfg = self.getConaryConfig()
         self._initializeFlavors()
         use.setBuildFlagsFromFlavor(None, cfg.buildFlavor, False)
@@ -425,6 +671,8 @@ class ConaryFacade(object):
         @return: Status
         @rtype: bool
         """
+        from conary import checkin
+        from conary.build import errors as builderrors
         # Conary likes absolute paths RBLD-137
         targetDir = os.path.abspath(targetDir)
         try:
@@ -454,8 +702,17 @@ class ConaryFacade(object):
         @return: lines of text describing differences
         @rtype: list
         """
-        return checkin.generateStatus(self._getRepositoryClient(),
-                                      dirName=targetDir)
+        from conary import checkin
+        statCache = self._getStatCache()
+        status = statCache.getStatus(targetDir)
+        if status is None:
+            # snapshot first, so that files changed while the status is
+            # generated are noticed next time
+            snapshot = statCache.snapshot(targetDir)
+            status = checkin.generateStatus(self._getRepositoryClient(),
+                                            dirName=targetDir)
+            statCache.setStatus(targetDir, snapshot, status)
+        return status
 
     def getCheckoutLog(self, targetDir, newerOnly=False, versionList=None):
         """
@@ -472,6 +729,7 @@ class ConaryFacade(object):
         @type versionList: list of strings or (opaque) conary version objects
         @return: list of strings
         """
+        from conary import checkin
         repos, sourceState = self._getRepositoryStateFromDirectory(targetDir)
         troveName = sourceState.getName()
 
@@ -483,11 +741,32 @@ class ConaryFacade(object):
         else:
             versionList = [self._getVersion(x) for x in versionList]
 
-        emptyFlavor = deps.Flavor()
-        nvfList = [(troveName, v, emptyFlavor) for v in versionList]
-        troves = repos.getTroves(nvfList)
-
-        return [message for message in checkin.iterLogMessages(troves)]
+        # committed versions never change, so their log messages are
+        # fetched only once
+        historyCache = self._getHistoryCache()
+        messages = {}
+        missing = []
+        for version in versionList:
+            lines = historyCache.getLog(troveName,
+                                        self._versionToString(version))
+            if lines is None:
+                missing.append(version)
+            else:
+                messages[version] = lines
+
+        if missing:
+            emptyFlavor = deps.Flavor()
+            nvfList = [(troveName, v, emptyFlavor) for v in missing]
+            troves = repos.getTroves(nvfList)
+            for version, trv in itertools.izip(missing, troves):
+                lines = [message for message in
+                         checkin.iterLogMessages([trv])]
+                historyCache.setLog(troveName,
+                                    self._versionToString(version), lines)
+                messages[version] = lines
+
+        return [message for version in versionList
+                for message in messages[version]]
 
     def iterRepositoryDiff(self, targetDir, lastver=None):
         """
@@ -501,6 +780,7 @@ class ConaryFacade(object):
         which to generated the diff.
         @return: yields strings
         """
+        from conary import checkin
         repos, sourceState = self._getRepositoryStateFromDirectory(targetDir)
         troveName = sourceState.getName()
         ver = sourceState.getVersion()
@@ -511,9 +791,22 @@ class ConaryFacade(object):
         else:
             lastver = self._getVersion(lastver)
 
-        for line in checkin._getIterRdiff(repos, label, troveName,
-                                          ver.asString(), lastver.asString()):
-            yield line
+        # diffs between committed versions never change
+        historyCache = self._getHistoryCache()
+        lines = historyCache.getDiff(troveName, ver.asString(),
+                                     lastver.asString())
+        if lines is None:
+            lines = []
+            for line in checkin._getIterRdiff(repos, label, troveName,
+                                              ver.asString(),
+                                              lastver.asString()):
+                lines.append(line)
+                yield line
+            historyCache.setDiff(troveName, ver.asString(),
+                                 lastver.asString(), lines)
+        else:
+            for line in lines:
+                yield line
 
     def iterCheckoutDiff(self, targetDir):
         """
@@ -523,6 +816,7 @@ class ConaryFacade(object):
         @type targetDir: string
         @return: yields strings
         """
+        from conary import checkin
         repos, sourceState = self._getRepositoryStateFromDirectory(targetDir)
         ver = sourceState.getVersion()
 
@@ -555,6 +849,54 @@ class ConaryFacade(object):
         return [ver for ver in self._getRepositoryVersions(targetDir)
                 if ver.isAfter(troveVersion)]
 
+    def _getNewerRepositoryVersionsByDirectory(self, targetDirs):
+        '''
+        Returns lists of versions from the repository that are newer than
+        each of several checkouts, asking the repository about all of
+        them at once
+        @param targetDirs: directories containing Conary checkouts
+        @return: dictionary mapping each directory to a list of
+        C{conary.versions.Version}, newest first
+        '''
+        sourceStates = {}
+        query = {}
+        for targetDir in targetDirs:
+            _, sourceState = self._getRepositoryStateFromDirectory(targetDir)
+            sourceStates[targetDir] = sourceState
+            query.setdefault(sourceState.getName(), {})[
+                sourceState.getBranch()] = None
+        # branches on indexed repositories are looked up locally, and
+        # the rest with one repository query
+        troveIndex = self._getTroveIndex()
+        verDict = {}
+        remoteQuery = {}
+        for name, branches in query.iteritems():
+            for branch in branches:
+                if self._isIndexed(branch):
+                    verDict.setdefault(name, {}).update(
+                        troveIndex.getTroveVersionsByBranch(
+                            name, branch).get(name, {}))
+                else:
+                    remoteQuery.setdefault(name, {})[branch] = None
+        if remoteQuery:
+            remoteVerDict = self._getRepositoryClient(
+                ).getTroveVersionsByBranch(remoteQuery) or {}
+            for name, verFlavors in remoteVerDict.iteritems():
+                verDict.setdefault(name, {}).update(verFlavors)
+
+        newerVersions = {}
+        for targetDir, sourceState in sourceStates.iteritems():
+            branch = sourceState.getBranch()
+            troveVersion = sourceState.getVersion()
+            #pylint: disable-msg=E1103
+            # we know that ver does have an isAfter method
+            verList = [ver for ver in verDict.get(sourceState.getName(), {})
+                       if ver.branch() == branch and ver.isAfter(troveVersion)]
+            verList.sort()
+            verList.reverse()
+            newerVersions[targetDir] = verList
+        return newerVersions
+
     def _getRepositoryVersions(self, targetDir):
         '''
         List of versions of the this package checked into the repository
@@ -564,7 +906,12 @@ class ConaryFacade(object):
         repos, sourceState = self._getRepositoryStateFromDirectory(targetDir)
         branch = sourceState.getBranch()
         troveName = sourceState.getName()
-        verList = repos.getTroveVersionsByBranch({troveName: {branch: None}})
+        if self._isIndexed(branch):
+            verList = self._getTroveIndex().getTroveVersionsByBranch(
+                troveName, branch)
+        else:
+            verList = repos.getTroveVersionsByBranch(
+                {troveName: {branch: None}})
         if verList:
             verList = verList[troveName].keys()
             verList.sort()
@@ -579,10 +926,35 @@ class ConaryFacade(object):
         @param targetDir: directory containing Conary checkout
         '''
         repos = self._getRepositoryClient()
-        conaryState = state.ConaryStateFromFile(targetDir + '/CONARY', repos)
-        sourceState = conaryState.getSourceState()
+        sourceState = self._getConaryState(targetDir).getSourceState()
         return repos, sourceState
 
+    def _getConaryState(self, targetDir):
+        '''
+        Read the state of a checkout, reusing the state read earlier by
+        this facade while the CONARY file is unchanged.  The state
+        returned must not be modified.
+        @param targetDir: directory containing Conary checkout
+        '''
+        statePath = os.path.abspath(os.path.join(targetDir, 'CONARY'))
+        try:
+            sb = os.stat(statePath)
+            key = (sb.st_ino, sb.st_size, sb.st_mtime)
+        except OSError:
+            key = None
+        if key is not None and statePath in self._conaryStates:
+            cachedKey, conaryState = self._conaryStates[statePath]
+            if cachedKey == key:
+                return conaryState
+        readTime = time.time()
+        conaryState = state.ConaryStateFromFile(statePath,
+                                                self._getRepositoryClient())
+        # a file modified in the second it was read could be modified
+        # again without changing its mtime, so it is read again next time
+        if key is not None and int(key[2]) < int(readTime):
+            self._conaryStates[statePath] = (key, conaryState)
+        return conaryState
+
 
     @staticmethod
     def isConaryCheckoutDirectory(targetDir):
@@ -611,6 +983,7 @@ class ConaryFacade(object):
         @param factory: name of Conary factory to use, or True to create a factory
         @type factory: string, NoneType, or bool
         """
+        from conary import checkin
         # Normalize factory settings
         if factory is True:
             factory = 'factory'
@@ -659,14 +1032,17 @@ class ConaryFacade(object):
         return self._commitShadowChangeSet(results[0], results[1])[0]
 
     def derive(self, troveToDerive, targetLabel, targetDir):
+        from conary.build import derive
         repos = self._getRepositoryClient()
         cfg = self.getConaryConfig()
         derive.derive(repos,cfg, targetLabel, troveToDerive, targetDir,
                       extract = True)
+        self._repositoryChanged()
 
     def _commitShadowChangeSet(self, existingShadow, cs):
         if cs and not cs.isEmpty():
             self._getRepositoryClient().commitChangeSet(cs)
+            self._repositoryChanged()
         allTroves = []
         if existingShadow:
             allTroves.extend(self._troveTupToStrings(*x)
@@ -702,6 +1078,7 @@ class ConaryFacade(object):
         instead of running them in-place.
         @type tagScript: str
         """
+        from conary.cmds import updatecmd
         version = self._versionToString(version)
         flavor = self._flavorToString(flavor)
         cfg = self.getConaryConfig()
@@ -723,17 +1100,130 @@ class ConaryFacade(object):
                     for packageName in packageNames ]
         return [ (str(searchPath[0]), str(searchPath[1]), flv) ]
 
+    def _getGroupIndex(self):
+        """
+        Get the index of group contents, kept in the rBuild cache
+        directory unless caching is disabled.
+        """
+        if self._groupIndex is None:
+            cfg = self._handle.getConfig()
+            indexDir = None
+            if cfg.useCache:
+                indexDir = os.path.join(cfg.cacheDirectory, 'groups')
+            self._groupIndex = groupindex.GroupIndex(indexDir)
+        return self._groupIndex
+
+    def _getStatCache(self):
+        """
+        Get the cache of checkout status, kept in the product checkout;
+        caching is disabled outside of a product checkout.
+        """
+        if self._statCache is None:
+            cacheDir = None
+            productStore = self._handle.productStore
+            if productStore is not None:
+                try:
+                    cacheDir = productStore.getStatCachePath()
+                except errors.IncompleteInterfaceError:
+                    pass
+            self._statCache = statcache.StatCache(cacheDir)
+        return self._statCache
+
+    def _getHistoryCache(self):
+        """
+        Get the cache of change log messages and diffs of committed
+        versions, kept in the rBuild cache directory unless caching is
+        disabled.
+        """
+        if self._historyCache is None:
+            cfg = self._handle.getConfig()
+            cacheDir = None
+            if cfg.useCache:
+                cacheDir = os.path.join(cfg.cacheDirectory, 'history')
+            self._historyCache = historycache.HistoryCache(cacheDir)
+        return self._historyCache
+
+    def _getTroveIndex(self):
+        """
+        Get the index of the troves in the repositories, kept in the
+        rBuild cache directory unless caching is disabled.
+        """
+        if self._troveIndex is None:
+            cfg = self._handle.getConfig()
+            path = None
+            if cfg.useCache:
+                path = os.path.join(cfg.cacheDirectory, 'troves.db')
+            self._troveIndex = troveindex.TroveIndex(path)
+        return self._troveIndex
+
+    def _isIndexed(self, label):
+        """
+        Bring the trove index of the repository holding C{label} up to
+        date, once for each command and after each commit.
+        @param label: label or branch of the troves to look up
+        @type label: C{conary.versions.Label} or C{conary.versions.Branch}
+        @return: whether troves on C{label} can be looked up in the index
+        @rtype: bool
+        """
+        troveIndex = self._getTroveIndex()
+        if troveIndex.path is None:
+            return False
+        if isinstance(label, versions.Branch):
+            label = label.label()
+        host = label.getHost()
+        if host not in self._indexedHosts:
+            self._indexedHosts[host] = troveIndex.sync(
+                self._getRepositoryClient(), host)
+        return self._indexedHosts[host]
+
+    def _repositoryChanged(self):
+        """
+        Note that troves were committed, so that the trove index is
+        brought up to date before it is next used.
+        """
+        self._indexedHosts.clear()
+
+    def _getGroupContents(self, groupTups):
+        """
+        Get the troves referenced by each of C{groupTups}, fetching only
+        the groups that are not in the group index yet.
+        @return: dictionary mapping each group tuple to its
+        C{GroupContents}
+        @rtype: dict
+        """
+        index = self._getGroupIndex()
+        results = {}
+        missing = []
+        for groupTup in groupTups:
+            if groupTup in results:
+                continue
+            contents = index.get(groupTup)
+            if contents is None:
+                missing.append(groupTup)
+            results[groupTup] = contents
+        if missing:
+            repos = self._getRepositoryClient()
+            groupTroves = repos.getTroves(missing, withFiles=False)
+            for groupTup, trv in zip(missing, groupTroves):
+                results[groupTup] = index.add(groupTup,
+                    trv.iterTroveList(weakRefs=True, strongRefs=True))
+        return results
+
+    @staticmethod
+    def _getLatestTroves(troveList):
+        maxVersion = sorted(troveList, key=lambda x:x[1])[-1][1]
+        return [ x for x in troveList if x[1] == maxVersion ]
+
     def _findPackageInSearchPaths(self, searchPaths, packageName):
         return self._findPackagesInSearchPaths(searchPaths, [ packageName ])[0]
 
     def _findPackagesInSearchPaths(self, searchPaths, packageNames):
-        repos = self._getRepositoryClient()
         # Compose a list of all search paths. If a label is presented,
         # add all package names to it.
         extTroveSpecs = [ self._buildTroveSpec(x, packageNames)
                 for x in searchPaths ]
         troveSpecs = list(itertools.chain(*extTroveSpecs))
-        results = repos.findTroves(None, troveSpecs, allowMissing = True)
+        results = self._findTroves(troveSpecs, allowMissing=True)
 
         troveSpecResultsByPkgName = {}
         for packageName in packageNames:
@@ -754,11 +1244,11 @@ class ConaryFacade(object):
                 # we may have multiple flavors here.  We only want those
                 # flavors of these troves that have been built most recently
                 # to be taken into account
-                maxVersion = sorted(troveList, key=lambda x:x[1])[-1][1]
-                troveTups = [ x for x in troveList if x[1] == maxVersion ]
+                troveTups = self._getLatestTroves(troveList)
                 if searchPath[0] is not None:
                     # This is a group
                     assert len(troveSpecs) == 1
+                    self._getGroupIndex().setResolved(searchPath, troveTups)
                     groupTroveList.extend(troveTups)
                     # Add indices back, so we know where to put the results
                     for troveTup in troveTups:
@@ -769,17 +1259,16 @@ class ConaryFacade(object):
                 troveSpecResultsByPkgName[packageName][idx] = troveTups
 
         if groupTroveList:
-            groupTroves = repos.getTroves(groupTroveList, withFiles=False)
-            for trv, troveSpec in zip(groupTroves, groupTroveList):
+            groupContents = self._getGroupContents(groupTroveList)
+            for troveSpec in rbuild_util.unique(groupTroveList):
                 idxList = groupIndexMap[troveSpec]
-                for troveTup in trv.iterTroveList(weakRefs=True,
-                                                  strongRefs=True):
-                    for packageName in packageNames:
-                        if troveTup[0] != packageName:
-                            continue
-                        troveSpecResults = troveSpecResultsByPkgName[packageName]
-                        for idx in idxList:
-                            troveSpecResults[idx].append(troveTup)
+                for packageName in packageNames:
+                    troveTups = groupContents[troveSpec].find(packageName)
+                    if not troveTups:
+                        continue
+                    troveSpecResults = troveSpecResultsByPkgName[packageName]
+                    for idx in idxList:
+                        troveSpecResults[idx].extend(troveTups)
         ret = []
         for packageName in packageNames:
             troveSpecResults = troveSpecResultsByPkgName[packageName]
@@ -805,6 +1294,7 @@ class ConaryFacade(object):
         return dict((str(x[0]), x[1]) for x in descriptions.items())
 
     def _loadRecipeClassFromCheckout(self, recipePath):
+        from conary.build import loadrecipe
         directory = os.path.dirname(recipePath)
         repos, sourceState = self._getRepositoryStateFromDirectory(directory)
 
@@ -842,9 +1332,8 @@ class ConaryFacade(object):
                                 "cannot remove %s: %s", path, e.strerror)
         conaryState.write(statePath)
 
-    @staticmethod
-    def getNameForCheckout(checkoutDir):
-        conaryState = state.ConaryStateFromFile(checkoutDir + '/CONARY')
+    def getNameForCheckout(self, checkoutDir):
+        conaryState = self._getConaryState(checkoutDir)
         return conaryState.getSourceState().getName().split(':', 1)[0]
 
     @staticmethod
@@ -906,22 +1395,89 @@ class ConaryFacade(object):
                             for x in packageList ]
             if not infoOnly:
                 self._getRepositoryClient().commitChangeSet(cs)
+                self._repositoryChanged()
             return packageList
 
     def detachPackage(self, troveSpec, targetLabel, message=None):
+        from conary.cmds import clone
         cfg = self.getConaryConfig()
         if not message:
             message = 'Automatic promote by rBuild.'
+        self._repositoryChanged()
         return clone.CloneTrove(cfg, targetLabel,
             [troveSpec[0]+'='+troveSpec[1].asString()],
             message=message)
 
+    def searchPackagesInSearchPaths(self, searchPaths, pattern):
+        """
+        Find the troves in the groups on a search path whose names match
+        a shell-style pattern.  Groups that have been looked up before
+        are searched without contacting the repository, as of the last
+        time the search path element was resolved.
+        @param searchPaths: C{(name, version, flavor)} search path
+        elements; labels are skipped
+        @type searchPaths: list
+        @param pattern: shell-style pattern; components are only matched
+        if it contains a colon
+        @type pattern: string
+        @return: matching trove tuples, sorted
+        @rtype: list
+        """
+        index = self._getGroupIndex()
+        groupTups = []
+        unresolved = []
+        for searchPath in searchPaths:
+            if searchPath[0] is None:
+                continue
+            resolved = index.getResolved(searchPath)
+            if resolved is None:
+                unresolved.append(searchPath)
+            else:
+                groupTups.extend(resolved)
+
+        if unresolved:
+            troveSpecs = [ self._buildTroveSpec(x, [])[0] for x in unresolved ]
+            results = self._findTroves(troveSpecs, allowMissing=True)
+            for searchPath, troveSpec in zip(unresolved, troveSpecs):
+                troveList = results.get(troveSpec)
+                if not troveList:
+                    continue
+                troveTups = self._getLatestTroves(troveList)
+                index.setResolved(searchPath, troveTups)
+                groupTups.extend(troveTups)
+
+        matches = set()
+        for contents in self._getGroupContents(groupTups).itervalues():
+            for name in fnmatch.filter(contents.iterNames(), pattern):
+                if ':' in name and ':' not in pattern:
+                    continue
+                matches.update(contents.find(name))
+        return sorted(matches)
+
     def getLatestPackagesOnLabel(self, label, keepComponents=False,
-      keepGroups=False):
-        client = self._getConaryClient()
+      keepGroups=False, snapshotPath=None):
+        """
+        Get the latest version of every package on a label.
+        @param label: label to search
+        @type label: string or B{opaque} conary.versions.Label
+        @param keepComponents: whether to include components
+        @param keepGroups: whether to include groups
+        @param snapshotPath: path of a snapshot of the label to bring up
+        to date and use when the label is not in the trove index
+        @type snapshotPath: string
+        @return: list of (name, version, flavor) tuples
+        """
         label = self._getLabel(label)
-        results = client.getRepos().getTroveLatestByLabel(
-            {None: {label: [None]}})
+        if self._isIndexed(label):
+            results = self._getTroveIndex().getTroveLatestByLabel(label)
+        elif snapshotPath is not None:
+            snapshot = labelsnapshot.LabelSnapshot(snapshotPath)
+            results = snapshot.getTroveLatestByLabel(
+                self._getRepositoryClient(), label)
+        else:
+            client = self._getConaryClient()
+            results = client.getRepos().getTroveLatestByLabel(
+                {None: {label: [None]}})
 
         packages = []
         for name, versiondict in results.iteritems():
@@ -946,17 +1502,32 @@ class ConaryFacade(object):
             return False
         return True
 
-#pylint: disable-msg=C0103,R0901,W0221,R0904
-# "The creature can't help its ancestry"
-class _QuietUpdateCallback(checkin.CheckinCallback):
+_quietUpdateCallbackClass = None
+
+def _QuietUpdateCallback():
     """
-    Make checkout a bit quieter
+    Make checkout a bit quieter.  The callback class derives from
+    C{conary.checkin}, which is only imported once a callback is needed.
     """
-    #pylint: disable-msg=W0613
-    # unused arguments
-    # implements an interface that may pass arguments that need to be ignored
-    def setUpdateJob(self, *args, **kw):
-        #pylint: disable-msg=C0999
-        # arguments not documented: implements interface, ignores parameters
-        'stifle update announcement for extract'
-        return
+    #pylint: disable-msg=C0103
+    # named for the class it instantiates
+    global _quietUpdateCallbackClass
+    if _quietUpdateCallbackClass is None:
+        from conary import checkin
+
+        #pylint: disable-msg=R0901,W0221,R0904
+        # "The creature can't help its ancestry"
+        class QuietUpdateCallback(checkin.CheckinCallback):
+            #pylint: disable-msg=W0613
+            # unused arguments
+            # implements an interface that may pass arguments that need to
+            # be ignored
+            def setUpdateJob(self, *args, **kw):
+                #pylint: disable-msg=C0999
+                # arguments not documented: implements interface, ignores
+                # parameters
+                'stifle update announcement for extract'
+                return
+
+        _quietUpdateCallbackClass = QuietUpdateCallback
+    return _quietUpdateCallbackClass()
@@ -23,25 +23,27 @@ plugins.  It provides public methods which are only to be accessed
 via C{handle.facade.rbuilder} which is automatically available to
 all plugins through the C{handle} object.
 """
+import json
 import os
+import Queue
 import re
+import sys
 import time
 import socket
 import random
+import threading
 import urllib
 import urllib2
 import urlparse
 
-import robj
-from xobj import xobj
-
 from conary.lib import util
 from conary.lib.cfg import ConfigFile
 
-from rpath_proddef import api1 as proddef
 from rbuild import constants
 from rbuild import errors
 from rbuild import facade
+from rbuild.internal import httpcache
+from rbuild.lib import util as rbuild_util
 
 
 class _rBuilderConfig(ConfigFile):
@@ -65,46 +67,238 @@ class _AbstractRbuilderClient(object):
         self._handle = handle
 
 
+class _IdCache(object):
+    """
+    Persistent map of rBuilder product and version names to the IDs and
+    product definition labels they resolve to.  Entries are kept per
+    server and never expire; they are dropped when the server rejects an
+    ID.  A cache without a path remembers nothing.
+    @param path: file holding the cache, or C{None}
+    @param serverUrl: rBuilder the entries belong to
+    """
+
+    def __init__(self, path, serverUrl):
+        self.path = path
+        self.serverUrl = serverUrl
+        self._entries = None
+
+    def get(self, kind, key):
+        return self._load().get(kind, {}).get(key)
+
+    def set(self, kind, key, value):
+        if not self.path:
+            return
+        self._load().setdefault(kind, {})[key] = value
+        self._save()
+
+    def invalidate(self, productName):
+        """
+        Forget the product C{productName} and everything about its
+        versions.
+        """
+        entries = self._load()
+        entries.get('products', {}).pop(productName, None)
+        prefix = productName + '/'
+        for kind in ('versions', 'labels'):
+            mapping = entries.get(kind, {})
+            for key in [x for x in mapping if x.startswith(prefix)]:
+                del mapping[key]
+        self._save()
+
+    def _readFile(self):
+        try:
+            data = json.load(open(self.path))
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return data
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            if self.path:
+                self._entries = self._readFile().get(self.serverUrl, {})
+        return self._entries
+
+    def _save(self):
+        if not self.path:
+            return
+        # Failing to write the cache is not fatal; the IDs are looked up
+        # again next time
+        try:
+            data = self._readFile()
+            data[self.serverUrl] = self._entries
+            util.mkdirChain(os.path.dirname(self.path))
+            f = util.AtomicFile(self.path)
+            f.write(json.dumps(data))
+            f.commit()
+        except (IOError, OSError):
+            pass
+
+
 class RbuilderRPCClient(_AbstractRbuilderClient):
     """
     XMLRPC rBuilder Client. As rBuilder moves functionality to the REST
     interface this client will become deprecated.
     """
 
+    # number of build status requests sent at once
+    statusWorkers = 8
+    # shortest wait between build status polls, used while builds change
+    minPollInterval = 1
+
     def __init__(self, rbuilderUrl, user, pw, handle):
         _AbstractRbuilderClient.__init__(self, rbuilderUrl, user, pw, handle)
         rpcUrl = rbuilderUrl + '/xmlrpc-private'
+        self._rpcArgs = (rpcUrl, user, pw)
+        try:
+            # connections are kept open for every client of the handle
+            self._transport = handle.facade.rbuilder._getRPCTransport(rpcUrl)
+        except AttributeError:
+            # callers of the RbuilderClient entry point may pass no handle,
+            # or one without a rbuilder facade; the client then keeps its
+            # own connections
+            self._transport = facade.PooledTransport(
+                secure=rpcUrl.lower().startswith('https:'))
         self.server = facade.ServerProxy(rpcUrl, username=user, password=pw,
-                allow_none=True)
+                allow_none=True, transport=self._transport)
+        self._serverPool = Queue.Queue()
+        self._serverPool.put(self.server)
+        self._idCache = None
+
+    def _getIdCache(self):
+        if self._idCache is None:
+            self._idCache = _IdCache(self._getIdCachePath(), self.rbuilderUrl)
+        return self._idCache
+
+    def _getIdCachePath(self):
+        if self._handle is None or not hasattr(self._handle, 'productStore'):
+            # callers of the RbuilderClient entry point may pass no handle,
+            # or one without a product store; IDs are then not cached
+            return None
+        productStore = self._handle.productStore
+        if productStore is None:
+            # outside of a checkout, e.g. while running rbuild init
+            cfg = self._handle.getConfig()
+            if not cfg.useCache:
+                return None
+            return os.path.join(os.path.expanduser(cfg.cacheDirectory),
+                                'idcache')
+        try:
+            return productStore.getIdCachePath()
+        except errors.IncompleteInterfaceError:
+            return None
 
-    def _pollBuild(self, buildId, interval=10, max_dropped=3):
-        dropped = 0
-        buildStatus = None
-        while buildStatus is None:
+    def _callForVersion(self, productName, versionName, method, *args):
+        """
+        Call XML-RPC C{method} with the ID of version C{versionName} of
+        product C{productName} followed by C{args}.  If the server does
+        not know a cached ID, the version is looked up again and the call
+        retried.
+        @return: result of the call
+        """
+        idCache = self._getIdCache()
+        cached = idCache.get('versions',
+                             '%s/%s' % (productName, versionName)) is not None
+        versionId = self.getBranchIdFromName(productName, versionName)
+        error, result = getattr(self.server, method)(versionId, *args)
+        if error and cached and result and result[0] == 'ItemNotFound':
+            idCache.invalidate(productName)
+            versionId = self.getBranchIdFromName(productName, versionName)
+            error, result = getattr(self.server, method)(versionId, *args)
+        if error:
+            raise errors.RbuilderError(*result)
+        return result
+
+    def _callConcurrently(self, method, argList):
+        """
+        Call XML-RPC C{method} once for each entry of C{argList}, several
+        at a time.
+        @return: a (result, exception) pair for each entry
+        """
+        def call(args):
+            # an xmlrpclib proxy holds a single connection, so each
+            # concurrent call borrows a proxy of its own
             try:
-                error, buildStatus = self.server.getBuildStatus(buildId)
-            except socket.timeout:
+                server = self._serverPool.get_nowait()
+            except Queue.Empty:
+                rpcUrl, user, pw = self._rpcArgs
+                server = facade.ServerProxy(rpcUrl, username=user,
+                        password=pw, allow_none=True,
+                        transport=self._transport)
+            try:
+                return getattr(server, method)(*args)
+            finally:
+                self._serverPool.put(server)
+        return rbuild_util.runConcurrently(call, argList, self.statusWorkers)
+
+    def _getBuildStatuses(self, buildIds, interval=10, max_dropped=3):
+        """
+        Fetch the status of every build in C{buildIds} concurrently.
+        Requests that time out are sent again after C{interval} seconds,
+        giving up after C{max_dropped} attempts.
+        @return: build status keyed by build id
+        @rtype: dict
+        """
+        statuses = {}
+        pending = list(buildIds)
+        dropped = 0
+        while pending:
+            results = self._callConcurrently('getBuildStatus',
+                                             [(x, ) for x in pending])
+            timedOut = []
+            for buildId, (result, err) in zip(pending, results):
+                if isinstance(err, socket.timeout):
+                    timedOut.append(buildId)
+                    continue
+                elif err is not None:
+                    raise err
+                error, buildStatus = result
+                if error:
+                    raise errors.RbuilderError(*buildStatus)
+                statuses[buildId] = buildStatus
+
+            if timedOut:
                 dropped += 1
                 if dropped >= max_dropped:
                     raise errors.RbuildError(
-                        'rBuilder connection timed out after 3 attempts')
+                        'rBuilder connection timed out after %d attempts'
+                        % max_dropped)
                 self._handle.ui.info(
                     'Status request timed out, trying again')
                 time.sleep(interval)
-                continue
+            pending = timedOut
+        return statuses
 
-        if error:
-            raise errors.RbuilderError(*buildStatus)
-        return buildStatus
+    def _pollBuild(self, buildId, interval=10, max_dropped=3):
+        return self._getBuildStatuses([buildId], interval,
+                                      max_dropped)[buildId]
 
     def getBranchIdFromName(self, productName, versionName):
         #pylint: disable-msg=R0914
         # not a great candidate for refactoring
-        productId = self.getProductId(productName)
-        error, versionList = self.server.getProductVersionListForProduct(
+        idCache = self._getIdCache()
+        versionKey = '%s/%s' % (productName, versionName)
+        versionId = idCache.get('versions', versionKey)
+        if versionId is not None:
+            return versionId
+
+        error = True
+        productId = idCache.get('products', productName)
+        if productId is not None:
+            error, versionList = self.server.getProductVersionListForProduct(
                                                                     productId)
+            if error:
+                # the cached ID may be stale; look the product up again
+                idCache.invalidate(productName)
         if error:
-            raise errors.RbuilderError(*versionList)
+            productId = self.getProductId(productName)
+            error, versionList = self.server.getProductVersionListForProduct(
+                                                                    productId)
+            if error:
+                raise errors.RbuilderError(*versionList)
+            idCache.set('products', productName, productId)
 
         versionNames = []
         # W0612: leave unused variables as documentation
@@ -114,6 +308,7 @@ class RbuilderRPCClient(_AbstractRbuilderClient):
              namespace, versionName2, desc)  in versionList:
             versionNames.append(versionName2)
             if versionName == versionName2:
+                idCache.set('versions', versionKey, versionId2)
                 return versionId2
 
         errstr = '%s is not a valid version for product %s.' % \
@@ -126,17 +321,22 @@ class RbuilderRPCClient(_AbstractRbuilderClient):
         raise errors.RbuildError(errstr)
 
     def getProductLabelFromNameAndVersion(self, productName, versionName):
-        versionId = self.getBranchIdFromName(productName, versionName)
-        error, stream = self.server.getProductDefinitionForVersion(versionId)
-        if error:
-            raise errors.RbuilderError(*stream)
+        from rpath_proddef import api1 as proddef
+        idCache = self._getIdCache()
+        versionKey = '%s/%s' % (productName, versionName)
+        label = idCache.get('labels', versionKey)
+        if label is not None:
+            return label
+        stream = self._callForVersion(productName, versionName,
+                                      'getProductDefinitionForVersion')
         product = proddef.ProductDefinition(stream)
-        return product.getProductDefinitionLabel()
+        label = product.getProductDefinitionLabel()
+        idCache.set('labels', versionKey, label)
+        return label
 
     def startProductBuilds(self, productName, versionName, stageName,
             buildNames=None, groupSpecs=None, groupVersion=None):
-        versionId = self.getBranchIdFromName(productName, versionName)
-        methodArgs = [versionId, stageName, False, buildNames ]
+        methodArgs = [stageName, False, buildNames ]
         if groupSpecs is not None:
             # image builds from system model was added later (Sept # 2013),
             # and it causes tracebacks on older rbuilders; only supply
@@ -145,38 +345,35 @@ class RbuilderRPCClient(_AbstractRbuilderClient):
         elif groupVersion is not None:
             methodArgs.append(groupVersion)
 
-        error, buildIds = self.server.newBuildsFromProductDefinition(
-                *methodArgs)
-        if error:
-            raise errors.RbuilderError(*buildIds)
-        return buildIds
+        return self._callForVersion(productName, versionName,
+                                    'newBuildsFromProductDefinition',
+                                    *methodArgs)
 
-    def watchImages(self, buildIds, timeout = 0, interval = 5, quiet=False):
-        interval = 10
+    def watchImages(self, buildIds, timeout=0, interval=10, quiet=False):
+        """
+        Wait for image builds to finish, reporting each change of status
+        as it is seen. All unfinished builds are polled together; polls
+        are C{minPollInterval} seconds apart while builds are changing,
+        backing off to C{interval} seconds while they are not.
+        @param timeout: give up after this many seconds without a change,
+        or C{0} to wait forever
+        @return: C{True} if every build finished successfully
+        """
         st = time.time()
         timedOut = False
-        dropped = 0
         finalStatus = {}
+        delay = self.minPollInterval
 
         activeBuilds = dict.fromkeys(buildIds)
         while activeBuilds:
-            for buildId in list(activeBuilds):
-                try:
-                    error, buildStatus = self.server.getBuildStatus(buildId)
-                except socket.timeout:
-                    dropped += 1
-                    if dropped >= 3:
-                        raise errors.RbuildError(
-                            'rBuilder connection timed out after 3 attempts')
-                    self._handle.ui.info(
-                        'Status request timed out, trying again')
-                    time.sleep(interval)
+            statuses = self._getBuildStatuses(activeBuilds, interval)
+            changed = False
+            for buildId in buildIds:
+                if buildId not in activeBuilds:
                     continue
-
-                if error:
-                    raise errors.RbuilderError(*buildStatus)
-                dropped = 0
+                buildStatus = statuses[buildId]
                 if activeBuilds[buildId] != buildStatus:
+                    changed = True
                     st = time.time() # reset timeout counter if status changes
                     activeBuilds[buildId] = buildStatus
                     if not quiet:
@@ -191,7 +388,11 @@ class RbuilderRPCClient(_AbstractRbuilderClient):
                     if activeBuilds[buildId]['status'] > 200:
                         finalStatus[buildId] = activeBuilds.pop(buildId)
             if activeBuilds:
-                time.sleep(interval)
+                if changed:
+                    delay = self.minPollInterval
+                else:
+                    delay = min(delay * 2, interval)
+                time.sleep(delay)
                 if timeout and time.time() - st > timeout:
                     timedOut = True
                     break
@@ -307,8 +508,9 @@ class RbuilderRPCClient(_AbstractRbuilderClient):
         return result
 
     def showImageStatus(self, buildIds):
+        statuses = self._getBuildStatuses(buildIds)
         for buildId in buildIds:
-            buildStatus = self._pollBuild(buildId)
+            buildStatus = statuses[buildId]
             self._handle.ui.write(
                 '%s: %s "%s"',
                 buildId,
@@ -323,12 +525,224 @@ class RbuilderRPCClient(_AbstractRbuilderClient):
 RbuilderClient = RbuilderRPCClient
 
 
+class _PageFetcher(threading.Thread):
+    """
+    Fetches one page of a collection in the background.
+    """
+
+    def __init__(self, fetch, start, size):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._fetch = fetch
+        self.start_index = start
+        self.size = size
+        self._result = None
+        self._error = None
+
+    def run(self):
+        try:
+            self._result = self._fetch(self.start_index, self.size)
+        except Exception:
+            self._error = sys.exc_info()
+
+    def getResult(self):
+        self.join()
+        if self._error is not None:
+            raise self._error[0], self._error[1], self._error[2]
+        return self._result
+
+
+class _ResourcePager(object):
+    """
+    Lazy iterable over a collection that the server returns one page at a
+    time. The first page is fetched when the pager is first tested or
+    iterated; while a page is being consumed the next one is fetched in
+    the background.
+
+    @param fetch: callable taking a start index and a page size and
+    returning that page of the collection
+    @param pageSize: number of resources to request per page
+    @param limit: maximum number of resources to return, or C{None}
+    @param prefetch: callable like C{fetch}, used to fetch pages in the
+    background; defaults to C{fetch}
+    """
+
+    def __init__(self, fetch, pageSize, limit=None, prefetch=None):
+        self._fetch = fetch
+        self._prefetch = prefetch or fetch
+        self._pageSize = pageSize
+        self._limit = limit
+        self._first = None
+
+    def _getPageSize(self, start):
+        if self._limit is None:
+            return self._pageSize
+        return min(self._pageSize, self._limit - start)
+
+    def _getFirstPage(self):
+        if self._first is None:
+            self._first = self._fetch(0, self._getPageSize(0))
+        return self._first
+
+    @staticmethod
+    def _hasNextPage(page, size, previous):
+        if len(page) != size:
+            # a short page is the last one, and a long one means the
+            # server does not support paging and sent the whole collection
+            return False
+        node = getattr(page, '_node', None)
+        nextPage = getattr(node, 'next_page', None)
+        if nextPage is not None:
+            return bool(nextPage)
+        # no paging information; stop if the server sent the same page again
+        return not (previous and page and
+                    getattr(page[0], 'id', None) is not None and
+                    getattr(previous[0], 'id', None) == page[0].id)
+
+    def iterPages(self):
+        start = 0
+        size = self._getPageSize(0)
+        page = self._getFirstPage()
+        previous = None
+        while True:
+            fetcher = None
+            if (self._hasNextPage(page, size, previous)
+                    and (self._limit is None
+                         or start + len(page) < self._limit)):
+                fetcher = _PageFetcher(self._prefetch, start + len(page),
+                                       self._getPageSize(start + len(page)))
+                fetcher.start()
+            yield page
+            if fetcher is None:
+                return
+            start, size, previous = fetcher.start_index, fetcher.size, page
+            page = fetcher.getResult()
+
+    def __iter__(self):
+        count = 0
+        for page in self.iterPages():
+            for resource in page:
+                if self._limit is not None and count >= self._limit:
+                    return
+                count += 1
+                yield resource
+
+    def __nonzero__(self):
+        return bool(self._getFirstPage())
+
+    @property
+    def _node(self):
+        # collection-level data such as links is taken from the first page
+        return self._getFirstPage()._node
+
+
+class JobWaiter(object):
+    """
+    Waits for rBuilder jobs to leave the C{Queued} and C{Running} states.
+
+    All jobs share one poll schedule: each round refreshes every job that
+    is still active and then sleeps.  The sleep starts at C{interval}
+    seconds and grows by a factor of C{backoff} after every round in which
+    no job changed, up to C{maxInterval}; any change drops it back to
+    C{interval}.  Each sleep is randomly spread by up to C{jitter} of its
+    length so that many clients do not poll in step.
+
+    @param timeout: seconds to wait before giving up, or C{None} to wait
+    until the jobs finish
+    """
+    ACTIVE_STATES = ('Queued', 'Running')
+
+    def __init__(self, interval=0.5, maxInterval=15, backoff=1.5,
+                 jitter=0.1, timeout=None):
+        self.interval = interval
+        self.maxInterval = maxInterval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.timeout = timeout
+
+    @classmethod
+    def fromConfig(cls, cfg, timeout=None, **kwargs):
+        """
+        Create a waiter whose deadline defaults to the C{jobTimeout}
+        configuration option.
+        """
+        if timeout is None:
+            timeout = cfg.jobTimeout or None
+        return cls(timeout=timeout, **kwargs)
+
+    @classmethod
+    def isActive(cls, job):
+        return job.job_state.name in cls.ACTIVE_STATES
+
+    @staticmethod
+    def _getStatus(job):
+        return job.job_state.name, job.status_text
+
+    def _getDelay(self, interval):
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def wait(self, jobs, callback=None, cancel=None):
+        '''
+            Poll C{jobs} until none of them is queued or running.
+
+            @param jobs: jobs to wait for
+            @type jobs: list of rObj(job)
+            @param callback: called with a job whenever its state or status
+            text changes, including once for the state each job starts in
+            @param cancel: event which stops the wait when set; jobs which
+            have not finished are left queued or running
+            @type cancel: threading.Event
+            @return: C{jobs}
+            @raise errors.JobTimeoutError: if the jobs do not finish within
+            C{timeout} seconds
+        '''
+        jobs = list(jobs)
+        deadline = None
+        if self.timeout:
+            deadline = time.time() + self.timeout
+        interval = self.interval
+        last = {}
+        active = jobs
+        while True:
+            changed = False
+            for job in active:
+                status = self._getStatus(job)
+                if last.get(id(job)) != status:
+                    last[id(job)] = status
+                    changed = True
+                    if callback is not None:
+                        callback(job)
+            active = [x for x in active if self.isActive(x)]
+            if not active or (cancel is not None and cancel.isSet()):
+                return jobs
+
+            if changed:
+                interval = self.interval
+            delay = self._getDelay(interval)
+            interval = min(interval * self.backoff, self.maxInterval)
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise errors.JobTimeoutError(timeout=self.timeout)
+                delay = min(delay, remaining)
+
+            if cancel is not None:
+                cancel.wait(delay)
+                if cancel.isSet():
+                    return jobs
+            else:
+                time.sleep(delay)
+            for job in active:
+                job.refresh()
+
+
 class RbuilderRESTClient(_AbstractRbuilderClient):
     """
     REST rBuilder Client. This will replace the RPC client as more
     functionality is moved into the REST interface.
     """
     _singleBackslashRe = re.compile(r'\\')
+    DEFAULT_PAGE_SIZE = 100
 
     def __init__(self, rbuilderUrl, user, pw, handle):
         _AbstractRbuilderClient.__init__(self, rbuilderUrl, user, pw, handle)
@@ -336,31 +750,54 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
         path = util.joinPaths(path, 'api')
         self._url = util.urlUnsplit(
                 (scheme, user, pw, host, port, path, None, None))
+        self._baseUrl = util.urlUnsplit(
+                (scheme, None, None, host, port, path, None, None))
+        self._user = user
+        self._pw = pw
         self._api = None
+        self._apiRoot = None
+        self._cache = None
+        self._indexes = {}
 
     def _getResources(self, resource, **kwargs):
         '''
-            Get a fitlered and ordered list of resoruces
+            Get a fitlered and ordered list of resoruces. Other keyword
+            arguments filter on fields of the resources; a list or tuple
+            value matches any of its elements.
 
             @param resource: resource collection name
             @param order_by: field and direction to order results
             @param uri: alternative uri
+            @param page_size: if set, fetch the collection in pages of this
+            many resources, and return a lazy iterable instead of a list
+            @param limit: if set, return at most this many resources, using
+            paged fetches
             @return: list of resources
             @rtype: list
         '''
         uri = kwargs.pop('uri', None)
         order_by = kwargs.pop('order_by', None)
+        pageSize = kwargs.pop('page_size', None)
+        limit = kwargs.pop('limit', None)
 
         fullUri = self.api._uri + '/'
         if uri is not None:
             fullUri += uri.strip('/') + '/'
         fullUri += resource
 
-        filter_by = []
-        for field, param in kwargs.items():
+        def equal(field, param):
             param = self._singleBackslashRe.sub('r\\\\', param)
             param = param.replace('"', r'\"')
-            filter_by.append('EQUAL(%s,"%s")' % (field, param))
+            return 'EQUAL(%s,"%s")' % (field, param)
+
+        filter_by = []
+        for field, param in kwargs.items():
+            if isinstance(param, (list, tuple)):
+                # match any of several values in one query
+                filter_by.append('OR(%s)' % ','.join(
+                    equal(field, x) for x in param))
+            else:
+                filter_by.append(equal(field, param))
 
         if filter_by:
             fullUri += ';filter_by=AND(%s)' % ','.join(filter_by)
@@ -370,17 +807,47 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
             fullUri += ';order_by=%s' % order_by
 
         client = self.api._client
-        try:
-            results = client.do_GET(fullUri)
-            if results:
-                return results
-            return []
-        except robj.errors.HTTPNotFoundError:
-            raise errors.RbuildError("Unable to fetch resource '%s' at '%s'" %
-                                     (resource, fullUri))
+
+        def fetch(uri, client=client):
+            import robj
+            try:
+                results = client.do_GET(uri)
+                if results:
+                    return results
+                return []
+            except robj.errors.HTTPNotFoundError:
+                raise errors.RbuildError(
+                    "Unable to fetch resource '%s' at '%s'" % (resource, uri))
+
+        if pageSize is None and limit is None:
+            return fetch(fullUri)
+        pageUri = fullUri + ';start_index=%d;limit=%d'
+
+        prefetchClient = []
+        def prefetch(start, size):
+            # Later pages are fetched in the background while the caller
+            # may be using the shared client, so they get a client (and
+            # connection) of their own.
+            if not prefetchClient:
+                prefetchClient.append(self._newClient())
+            return fetch(pageUri % (start, size), prefetchClient[0])
+
+        return _ResourcePager(
+            lambda start, size: fetch(pageUri % (start, size)),
+            pageSize or self.DEFAULT_PAGE_SIZE, limit, prefetch=prefetch)
+
+    def _newClient(self):
+        '''
+            Connect a new REST client, not shared with the API object
+
+            @return: robj HTTP client
+        '''
+        import robj
+        return robj.connect(self._url)._client
 
     @property
     def api(self):
+        import robj
         if self._api is None:
             top = robj.connect(self._url)
             for ver in top.api_versions:
@@ -392,6 +859,93 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
             self._api = ver
         return self._api
 
+    @property
+    def cache(self):
+        if self._cache is None:
+            cfg = self._handle.getConfig()
+            self._cache = httpcache.ResponseCache(cfg.cacheDirectory,
+                timeouts=cfg.cacheTimeouts, enabled=cfg.useCache)
+        return self._cache
+
+    def _getApiRoot(self):
+        '''
+            Get the URL of the v1 API, as listed by the server. The list of
+            API versions is itself fetched through the response cache, so
+            that cached documents can be used without contacting the server.
+
+            @return: URL of the v1 API root
+            @rtype: string
+        '''
+        if self._apiRoot is None:
+            if self._api is not None:
+                self._apiRoot = str(self._api._uri).rstrip('/')
+                return self._apiRoot
+            from xobj import xobj
+            doc = xobj.parse(self._fetchCachedContent('api_versions',
+                                                      self._baseUrl))
+            apiVersions = getattr(getattr(getattr(doc, 'api', None),
+                'api_versions', None), 'api_version', [])
+            if not isinstance(apiVersions, list):
+                apiVersions = [apiVersions]
+            for ver in apiVersions:
+                if getattr(ver, 'name', None) == 'v1':
+                    break
+            else:
+                raise errors.RbuildError("No compatible REST API found on "
+                        "rBuilder '%s'" % self._url.__safe_str__())
+            self._apiRoot = str(ver.id).rstrip('/')
+        return self._apiRoot
+
+    def _getCachedContent(self, resource, path):
+        '''
+            Get the body of a read-mostly document through the on-disk
+            response cache
+
+            @param resource: resource name, used to look up the cache timeout
+            @param path: path of the document below the v1 API root
+            @return: document body
+            @rtype: string
+        '''
+        return self._fetchCachedContent(resource, self._getApiRoot() + path)
+
+    def _fetchCachedContent(self, resource, url):
+        try:
+            return self.cache.get(url, resource, self._user, self._pw)
+        except urllib2.URLError, err:
+            raise errors.RbuildError("Unable to fetch resource '%s' at '%s':"
+                                     " %s" % (resource, url, err))
+
+    def _getCachedResources(self, resource, path, tag):
+        '''
+            Get a collection through the on-disk response cache. The
+            elements are plain xobj documents, which cannot be refreshed or
+            persisted.
+
+            @param resource: resource name, used to look up the cache timeout
+            @param path: path of the collection below the API root
+            @param tag: element name of the collection members
+            @return: list of resources
+            @rtype: list
+        '''
+        from xobj import xobj
+        doc = xobj.parse(self._getCachedContent(resource, path))
+        collection = getattr(doc, resource, None)
+        results = getattr(collection, tag, [])
+        if not isinstance(results, list):
+            results = [results]
+        return results
+
+    def expireCachedResource(self, resource, path):
+        '''
+            Drop a document from the on-disk response cache, so that the
+            next fetch goes to the server
+
+            @param resource: resource name
+            @param path: path of the document below the v1 API root
+        '''
+        self._indexes.pop(resource, None)
+        self.cache.invalidate(self._getApiRoot() + path, self._user)
+
     def createTarget(self, ttype, ddata):
         '''
         Create a target using the descriptor data provided
@@ -403,6 +957,8 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
         @return: the created Target
         @rtype: robj.HTTPData
         '''
+        from xobj import xobj
+        import robj
         # Construct the target xml
         target_doc = xobj.Document()
         target_doc.target = target = xobj.XObj()
@@ -429,6 +985,7 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
         @return: the configured target
         @rtype: rObj(target)
         '''
+        from xobj import xobj
         # make sure our target object is up to date
         target.refresh()
 
@@ -440,8 +997,7 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
         job.descriptor_data = xobj.parse(ddata.toxml()).descriptor_data
 
         jobObj = target.jobs.append(doc)
-        while jobObj.job_state.name in ['Queued', 'Running']:
-            jobObj.refresh()
+        self.waitForJobs([jobObj])
 
         if jobObj.job_state.name == 'Failed':
             raise errors.RbuildError(jobObj.status_text)
@@ -458,6 +1014,7 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
         @return: the configured target
         @rtype: rObj(target)
         '''
+        from xobj import xobj
         # make sure our target object is up to date
         target.refresh()
 
@@ -468,40 +1025,99 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
         job.descriptor_data = xobj.parse(ddata.toxml()).descriptor_data
 
         jobObj = target.jobs.append(doc)
-        while jobObj.job_state.name in ['Queued', 'Running']:
-            jobObj.refresh()
+        self.waitForJobs([jobObj])
 
         if jobObj.job_state.name == 'Failed':
             raise errors.RbuildError('Unable to set credentials')
         return target
 
+    def waitForJobs(self, jobs, callback=None, timeout=None, cancel=None):
+        '''
+            Wait for rBuilder jobs to finish, polling them all on one
+            backoff schedule
+
+            @param jobs: jobs to wait for
+            @type jobs: list of rObj(job)
+            @param callback: called with a job whenever its status changes
+            @param timeout: seconds to wait, defaults to the C{jobTimeout}
+            configuration option
+            @param cancel: event which stops the wait when set
+            @type cancel: threading.Event
+            @return: C{jobs}
+            @rtype: list
+        '''
+        waiter = JobWaiter.fromConfig(self._handle.getConfig(),
+                                      timeout=timeout)
+        return waiter.wait(jobs, callback=callback, cancel=cancel)
+
+    @staticmethod
+    def _filterResources(resources, **kwargs):
+        '''
+            Filter resources locally. Used for collections on the old API,
+            which cannot filter on the server, and by C{_getCheckedResources}
+            to check the results of a server-side filter.
+
+            @param resources: resources to filter
+            @param **kwargs: keyword args of field name and value to filter
+            on; a list or tuple value matches any of its elements
+            @return: resources matching all of the filters
+            @rtype: list
+        '''
+        def matches(resource, field, value):
+            actual = getattr(resource, field, None)
+            if actual is None:
+                return False
+            if isinstance(value, (list, tuple)):
+                return any(actual == x or str(actual) == str(x)
+                           for x in value)
+            return actual == value or str(actual) == str(value)
+
+        if not resources:
+            return []
+        return [r for r in resources
+                if all(matches(r, field, value)
+                       for field, value in kwargs.items())]
+
+    def _getCheckedResources(self, resource, **kwargs):
+        '''
+            Get resources filtered on the server, and check the filters
+            again locally, for callers that index or act on every result. A
+            server which ignores C{filter_by} returns the whole collection.
+
+            Takes the same arguments as C{_getResources}.
+            @return: list of resources
+            @rtype: list
+        '''
+        results = self._getResources(resource, **kwargs)
+        filters = dict((k, v) for k, v in kwargs.items()
+                       if k not in ('uri', 'order_by', 'page_size', 'limit'))
+        if not filters:
+            return results
+        return self._filterResources(results, **filters)
+
     def getGroups(self, shortName, label, **kwargs):
+        import robj
         client = self.api._client
         uri = ('/products/%s/repos/search?type=group&amp;label=%s' %
                (shortName, label))
         try:
             groups = client.do_GET(uri)
-            if groups:
-                return groups
-            return []
         except robj.errors.HTTPNotFoundError:
             raise errors.RbuildError(
                 "Project '%s' and label '%s' not found" % (shortName, label))
+        if kwargs:
+            return self._filterResources(groups, **kwargs)
+        if groups:
+            return groups
+        return []
 
     def getImageDefDescriptor(self, imageType):
         # image_type_definition_descriptors are not in a collection, and they
-        # have an xml header, which causes rObj to process them incorrectly
-        # thus this mess
-        client = self.api._client._client  # Ew
-        uri = self.api._uri + \
-            '/platforms/image_type_definition_descriptors/' + imageType
-
-        request = client.do_GET(uri)
-        request.wait()
-        response = request.response
-        if response.status >= 400:
-            raise errors.RbuildError(response.reason)
-        return response.content
+        # have an xml header, which causes rObj to process them incorrectly,
+        # so fetch the raw document; they only change with rBuilder upgrades
+        return self._getCachedContent('image_def_descriptors',
+            '/platforms/image_type_definition_descriptors/' +
+            imageType)
 
     def getImages(self, *args, **kwargs):
         '''
@@ -544,6 +1160,7 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
         return self._getResources('images', **kwargs)
 
     def getImageDefs(self, product, version, **kwargs):
+        import robj
         # image defs are on the old api, so we have to construct our own url
         client = self.api._client
 
@@ -555,37 +1172,38 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
             raise errors.RbuildError(
                 "Project '%s' and version '%s' not found" % (product, version))
 
-        imageDefs = []
-        if availableImageDefs:
-            for imageDef in availableImageDefs:
-                add = True
-                for key, value in kwargs.items():
-                    if key == 'id':
-                        add = (value == imageDef.id.rsplit('/')[-1])
-                    else:
-                        add = (getattr(imageDef, key) == value)
-                if add:
-                    imageDefs.append(imageDef)
+        imageDefId = kwargs.pop('id', None)
+        imageDefs = self._filterResources(availableImageDefs, **kwargs)
+        if imageDefId is not None:
+            imageDefs = [i for i in imageDefs
+                         if i.id.rsplit('/')[-1] == imageDefId]
         return imageDefs
 
     def getImageTypes(self, *args, **kwargs):
         return self._getResources("image_types", **kwargs)
 
     def getImageTypeDef(self, product, version, imageType, arch):
-        client = self.api._client
-        uri = ('/products/%s/versions/%s/imageTypeDefinitions' %
-               (product, version))
-        try:
-            for imageTypeDef in client.do_GET(uri):
-                if (imageTypeDef.container.name == imageType
-                        and imageTypeDef.architecture.name == arch):
-                    return imageTypeDef
-        except robj.errors.HTTPNotFoundError:
-            raise errors.RbuildError(
-                "Project '%s' and version '%s' not found" % (product, version))
-
-        raise errors.RbuildError("No image type definition with name '%s'"
-                                 " and architecture '%s'" % (imageType, arch))
+        import robj
+        index = self._indexes.setdefault('image_type_definitions', {})
+        if (product, version) not in index:
+            client = self.api._client
+            uri = ('/products/%s/versions/%s/imageTypeDefinitions' %
+                   (product, version))
+            try:
+                index[product, version] = dict(
+                    ((x.container.name, x.architecture.name), x)
+                    for x in client.do_GET(uri))
+            except robj.errors.HTTPNotFoundError:
+                raise errors.RbuildError(
+                    "Project '%s' and version '%s' not found" %
+                    (product, version))
+
+        imageTypeDef = index[product, version].get((imageType, arch))
+        if imageTypeDef is None:
+            raise errors.RbuildError("No image type definition with name '%s'"
+                                     " and architecture '%s'" %
+                                     (imageType, arch))
+        return imageTypeDef
 
     def getTarget(self, name):
         client = self.api._client
@@ -598,7 +1216,7 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
         raise errors.RbuildError("Target '%s' not found" % (name,))
 
     def getTargetTypes(self, **kwargs):
-        return self._getResources("target_types", **kwargs)
+        return self._getCheckedResources("target_types", **kwargs)
 
     def getTargets(self, **kwargs):
         '''
@@ -607,7 +1225,7 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
         @return: list of configured targets
         @rtype: list of rObj(target)
         '''
-        return self._getResources('targets', **kwargs)
+        return self._getCheckedResources('targets', **kwargs)
 
     def getUsers(self, **kwargs):
         '''
@@ -658,6 +1276,8 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
 
     def createProject(self, title, shortName, hostName=None, domainName=None,
             description='', external=False, external_params=None):
+        from xobj import xobj
+        import robj
         assert((external and external_params is not None)
                or (not external and external_params is None))
 
@@ -683,6 +1303,7 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
                     "parameters already exists")
 
     def getProject(self, shortName):
+        import robj
         # FIXME: robj allows neither URL construction nor searching/filtering,
         # so the only "kosher" way to find a project is to iterate over all of
         # them. So cheating looks attractive by comparison...
@@ -695,6 +1316,8 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
 
     def createBranch(self, project, name, platformLabel, namespace=None,
             description=''):
+        from xobj import xobj
+        import robj
         project = self.getProject(project)
         if project.project_branches and \
                 name in [b.name for b in project.project_branches]:
@@ -717,9 +1340,39 @@ class RbuilderRESTClient(_AbstractRbuilderClient):
             raise errors.RbuildError("Branch named '%s' already exists" % name)
         return br.label
 
+    def getPlatform(self, label):
+        '''
+        Get a platform by label. Unlike C{getPlatforms}, the result is a
+        live object which may be modified and persisted.
+
+        @return: platform or None
+        @rtype: rObj(platform)
+        '''
+        index = self._indexes.get('platforms')
+        if index is None:
+            index = self._indexes['platforms'] = dict(
+                (x.label, x) for x in self.api.platforms)
+        return index.get(label)
+
+    def getPlatforms(self):
+        '''
+        Get all platforms, from the response cache if possible
+
+        @return: list of platforms
+        @rtype: list of xobj(platform)
+        '''
+        return self._getCachedResources('platforms',
+            '/platforms', 'platform')
+
+    def expirePlatforms(self):
+        '''
+        Drop cached platform data, after a platform has been changed
+        '''
+        self.expireCachedResource('platforms', '/platforms')
+
     def listPlatforms(self):
         ret = []
-        for platform in self.api.platforms:
+        for platform in self.getPlatforms():
             if platform.enabled.lower() == 'false':
                 continue
             if platform.hidden.lower() == 'true':
@@ -744,13 +1397,45 @@ class RbuilderFacade(object):
         @param handle: The handle with which this instance is associated.
         """
         self._handle = handle
+        self._clients = {}
+        self._transports = {}
+
+    def _getRPCTransport(self, url):
+        """
+        Return the XML-RPC transport shared by every client of this
+        handle that talks to C{url}'s scheme, so that connections are
+        kept open across clients and calls.
+        """
+        secure = url.lower().startswith('https:')
+        if secure not in self._transports:
+            self._transports[secure] = facade.PooledTransport(secure=secure)
+        return self._transports[secure]
 
     def _getRbuilderClient(self, clientcls=None):
+        """
+        Return the client of type C{clientcls} for this handle. Clients
+        are cached so that their connections and the REST API discovery
+        document are reused across facade calls; a new client is created
+        only when C{serverUrl} or the credentials change.
+        """
         if clientcls is None:
             clientcls=RbuilderRPCClient
         cfg = self._handle.getConfig()
-        return clientcls(cfg.serverUrl, cfg.user[0], cfg.user[1],
+        key = (cfg.serverUrl, cfg.user[0], cfg.user[1])
+        cached = self._clients.get(clientcls)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        client = clientcls(cfg.serverUrl, cfg.user[0], cfg.user[1],
                                  self._handle)
+        self._clients[clientcls] = (key, client)
+        return client
+
+    def clearCachedClients(self):
+        """
+        Discards cached rBuilder clients, along with their connections
+        and API discovery data.
+        """
+        self._clients.clear()
 
     def _getRbuilderRPCClient(self):
         return self._getRbuilderClient(RbuilderRPCClient)
@@ -758,6 +1443,14 @@ class RbuilderFacade(object):
     def _getRbuilderRESTClient(self):
         return self._getRbuilderClient(RbuilderRESTClient)
 
+    def _newClient(self):
+        """
+        Connect a REST client of its own, for a thread that must not
+        share the connection of the handle's cached client.
+        @return: robj HTTP client
+        """
+        return self._getRbuilderRESTClient()._newClient()
+
     def _getBaseServerUrl(self):
         """
         Fetch serverUrl from ~/.rbuilderrc if it exists and is specified
@@ -795,11 +1488,8 @@ class RbuilderFacade(object):
         versionName = str(self._handle.product.getProductVersion())
         if groupVersion is not None:
             label = self._handle.product.getLabelForStage(stageName)
-            groups = self.getGroups(productName, label)
-            for group in groups:
-                if group.trailingVersion == groupVersion:
-                    break
-            else:
+            if not self.getGroups(productName, label,
+                                  trailingVersion=groupVersion):
                 raise errors.BadParameterError("No group matching version: %s" %
                                                groupVersion)
             groupVersion = "%s/%s" % (label, groupVersion)
@@ -861,13 +1551,13 @@ class RbuilderFacade(object):
         return client.getImageTypeDef(product, version, imageType, arch)
 
     def getPlatform(self, label):
-        client = self._getRbuilderRESTClient()
-        for platform in client.api.platforms:
-            if platform.label == label:
-                return platform
+        return self._getRbuilderRESTClient().getPlatform(label)
 
     def getPlatforms(self):
-        return self._getRbuilderRESTClient().api.platforms
+        return self._getRbuilderRESTClient().getPlatforms()
+
+    def expirePlatforms(self):
+        self._getRbuilderRESTClient().expirePlatforms()
 
     def getProductLabelFromNameAndVersion(self, productName, versionName):
         client = self._getRbuilderRPCClient()
@@ -918,7 +1608,29 @@ class RbuilderFacade(object):
         else:
             return project.project_branches
 
-    def watchImages(self, buildIds, timeout=0, interval = 5, quiet = False):
+    def waitForJobs(self, jobs, callback=None, timeout=None, cancel=None):
+        '''
+        Wait for rBuilder jobs to leave the queued and running states.
+        All jobs are refreshed together, at an interval that backs off
+        while nothing changes.
+
+        @param jobs: jobs to wait for
+        @type jobs: list of rObj(job)
+        @param callback: called with a job whenever its status changes
+        @param timeout: seconds to wait, defaults to the C{jobTimeout}
+        configuration option; C{0} waits forever
+        @type timeout: int
+        @param cancel: event which stops the wait when set
+        @type cancel: threading.Event
+        @return: C{jobs}
+        @rtype: list
+        @raise errors.JobTimeoutError: if the jobs do not finish in time
+        '''
+        client = self._getRbuilderRESTClient()
+        return client.waitForJobs(jobs, callback=callback, timeout=timeout,
+                                  cancel=cancel)
+
+    def watchImages(self, buildIds, timeout=0, interval=10, quiet=False):
         client = self._getRbuilderRPCClient()
         return client.watchImages(buildIds, timeout=timeout, interval=interval,
                 quiet=quiet)
@@ -1001,8 +1713,11 @@ class RbuilderFacade(object):
                 and not self.isValidUrl(external_params[1])):
             raise errors.BadParameterError("Invalid upstream url")
         client = self._getRbuilderRESTClient()
-        return client.createProject(title, shortName, hostName, domainName,
-                description, external, external_params)
+        projectId = client.createProject(title, shortName, hostName,
+                domainName, description, external, external_params)
+        # the rBuilder conaryrc now maps the new repository
+        self._handle.facade.conary._invalidateRBuilderConfigFile()
+        return projectId
 
     def getProject(self, shortName):
         client = self._getRbuilderRESTClient()
@@ -1115,8 +1830,8 @@ class RbuilderFacade(object):
         client = self._getRbuilderRESTClient()
         return client.getTargets(**kwargs)
 
-    def getTargetTypes(self):
-        return self._getRbuilderRESTClient().getTargetTypes()
+    def getTargetTypes(self, **kwargs):
+        return self._getRbuilderRESTClient().getTargetTypes(**kwargs)
 
     def getUsers(self, **kwargs):
         return self._getRbuilderRESTClient().getUsers(**kwargs)
@@ -27,10 +27,6 @@ all plugins through the C{handle} object.
 import itertools
 import os
 
-from rmake.build import buildcfg
-from rmake.cmdline import helper
-from rmake.cmdline import query
-from rmake import plugins
 from rbuild import errors
 from conary import trovetup
 
@@ -62,6 +58,7 @@ class RmakeFacade(object):
         @type readConfigFiles: bool
         @return: C{rmake.build.buildcfg.BuildConfiguration} B{opaque} object
         """
+        from rmake.build import buildcfg
         return buildcfg.BuildConfiguration(readConfigFiles = readConfigFiles,
                                            ignoreErrors = True)
 
@@ -81,6 +78,8 @@ class RmakeFacade(object):
         @return: rMake configuration file suitable for use with the current
         product.
         """
+        from rmake import plugins
+        from rmake.build import buildcfg
         if not includeContext:
             # context-free config must not be cached
             useCache = False
@@ -238,6 +237,7 @@ class RmakeFacade(object):
         product, and a dictionary of {flavor : contextName} lists that match the
         flavors in the current product's build definitions.
         """
+        from rmake.cmdline import helper
         cfg, contextDict = self._getRmakeConfigWithContexts()
         client = helper.rMakeHelper(buildConfig=cfg, plugins=self._plugins)
         return client, contextDict
@@ -251,9 +251,20 @@ class RmakeFacade(object):
         @return: an rMakeHelper object suitable for use with the current
         product (without any contexts for use in starting a build)
         """
+        from rmake.cmdline import helper
         cfg = self._getRmakeConfig()
         return helper.rMakeHelper(buildConfig=cfg)
 
+    def _getLabelSnapshotPath(self):
+        """
+        @return: path of the snapshot of the active stage label kept in
+        the checkout, or C{None} if the product store does not keep one
+        """
+        try:
+            return self._handle.productStore.getLabelSnapshotPath()
+        except errors.IncompleteInterfaceError:
+            return None
+
     def createBuildJobForStage(self, itemList, recurse=True, rebuild=True,
       useLocal=False, progress=True):
         """
@@ -291,7 +302,8 @@ class RmakeFacade(object):
             # Insert troves from the build label into resolveTroves
             # to emulate a recursive job's affinity for built troves.
             conary = handle.facade.conary
-            initialTroves = conary.getLatestPackagesOnLabel(stageLabel)
+            initialTroves = conary.getLatestPackagesOnLabel(stageLabel,
+                snapshotPath=self._getLabelSnapshotPath())
             cfg.resolveTroves.insert(0, initialTroves)
 
         job = rmakeClient.createBuildJob(itemList,
@@ -414,8 +426,11 @@ class RmakeFacade(object):
             message='Automatic commit by rbuild'
 
         client = self._getRmakeHelper()
-        return client.watch(jobId, commit=True, showTroveLogs=True,
-                            showBuildLogs=True, message=message)
+        committed = client.watch(jobId, commit=True, showTroveLogs=True,
+                                 showBuildLogs=True, message=message)
+        if committed:
+            self._handle.facade.conary._repositoryChanged()
+        return committed
 
     def watchJob(self, jobId):
         """
@@ -428,6 +443,7 @@ class RmakeFacade(object):
                             exitOnFinish=True)
 
     def displayJob(self, jobId, troveList=None, showLogs=False):
+        from rmake.cmdline import query
         client = self._getRmakeHelper()
         query.displayJobInfo(client, jobId, troveList, showLogs=showLogs,
                              displayTroves=True)
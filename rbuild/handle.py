@@ -25,9 +25,8 @@ that implement rBuild functionality, and by which plugins communicate
 with each other.
 """
 
-import rbuild.facade.conaryfacade
-import rbuild.facade.rmakefacade
-import rbuild.facade.rbuilderfacade
+import threading
+
 from rbuild import errors
 from rbuild import rbuildcfg
 from rbuild import ui
@@ -55,6 +54,59 @@ class _PluginProxy(dict):
             raise errors.MissingPluginError(attr)
 
 
+class _DeferredFacade(object):
+    """
+    Facade which is imported and constructed when it is first used.
+    @param moduleName: name of the module defining the facade
+    @param className: name of the facade class in that module
+    """
+
+    def __init__(self, moduleName, className):
+        self.moduleName = moduleName
+        self.className = className
+
+    def load(self, handle):
+        module = __import__(self.moduleName, {}, {}, [self.className])
+        return getattr(module, self.className)(handle)
+
+
+class _FacadeProxy(_PluginProxy):
+    """
+    Proxy for facade calls via the handle.  Facades given as
+    C{_DeferredFacade} instances are imported and constructed on first
+    access, so that commands pay only for the libraries behind the
+    facades they use.
+    """
+
+    def __init__(self, handle, facades):
+        _PluginProxy.__init__(self, facades)
+        self._handle = handle
+        # facades may first be used from several threads at once
+        self._lock = threading.RLock()
+
+    def __getitem__(self, name):
+        facade = dict.__getitem__(self, name)
+        if isinstance(facade, _DeferredFacade):
+            self._lock.acquire()
+            try:
+                facade = dict.__getitem__(self, name)
+                if isinstance(facade, _DeferredFacade):
+                    facade = facade.load(self._handle)
+                    self[name] = facade
+            finally:
+                self._lock.release()
+        return facade
+
+    def isLoaded(self, name):
+        """
+        @return: whether the facade C{name} has been constructed
+        @rtype: bool
+        """
+        return (name in self
+                and not isinstance(dict.__getitem__(self, name),
+                                   _DeferredFacade))
+
+
 class RbuildHandle(_PluginProxy):
     """
     The rBuild Appliance Developer Process Toolkit handle object.
@@ -109,7 +161,7 @@ class RbuildHandle(_PluginProxy):
             plugin.setHandle(self)
 
         # Provide access to facades
-        self.facade = _PluginProxy(self._getFacades())
+        self.facade = _FacadeProxy(self, self._getFacades())
 
         # Provide the command manager as if it were a plugin
         self['Commands'] = CommandManager()
@@ -135,7 +187,9 @@ class RbuildHandle(_PluginProxy):
         self.productStore = productStore
 
         if productStore:
-            self.product = productStore.getProduct()
+            # the product definition is loaded on first use, since many
+            # commands never need it
+            self._productPending = True
 
             if hasattr(productStore, 'getRbuildConfigPath'):
                 rBuildConfigPath = productStore.getRbuildConfigPath()
@@ -145,16 +199,67 @@ class RbuildHandle(_PluginProxy):
                 RbuildConfigData = productStore.getRbuildConfigData()
                 if RbuildConfigData is not None:
                     self._cfg.readObject('INTERNAL', RbuildConfigData)
-            self.facade.conary.clearCachedConfig()
+            if self.facade.isLoaded('conary'):
+                self.facade.conary.clearCachedConfig()
+
+    def __getattr__(self, attr):
+        try:
+            return _PluginProxy.__getattr__(self, attr)
+        except errors.MissingPluginError:
+            if not self._loadDeferredPlugin(attr):
+                raise
+            return self[attr]
+
+    def _loadDeferredPlugin(self, className):
+        '''
+        Load and initialize a plugin that was deferred until first use.
+        @return: whether the plugin was loaded
+        '''
+        pluginManager = self.__dict__.get('_pluginManager')
+        if not isinstance(pluginManager, pluginloader.PluginManager):
+            return False
+        plugin = pluginManager.loadDeferredPlugin(className)
+        if plugin is None:
+            return False
+        # load the plugins providing the commands this one extends
+        for pluginName in pluginManager.manifest.getRequiredPlugins(
+                                                            plugin.name):
+            getattr(self, pluginManager.manifest.getClassName(pluginName))
+
+        self._cfg.setSection(plugin.name, plugin.PluginConfiguration)
+        plugin.pluginCfg = self._cfg.getSection(plugin.name)
+        self[className] = plugin
+        plugin.setHandle(self)
+        plugin.registerCommands()
+        plugin.registerFacade(self)
+        plugin.initialize()
+        return True
+
+    def _getProduct(self):
+        if self._productPending:
+            self._product = self.productStore.getProduct()
+            self._productPending = False
+        return self._product
+
+    def _setProduct(self, product):
+        self._product = product
+        self._productPending = False
+
+    product = property(_getProduct, _setProduct)
 
     def _getFacades(self):
         '''
         Override this method to provide your own versions of these facades.
+        Each facade may be given as an instance, or as a C{_DeferredFacade}
+        to be imported and constructed on first use.
         '''
         return {
-            'conary': rbuild.facade.conaryfacade.ConaryFacade(self),
-            'rmake': rbuild.facade.rmakefacade.RmakeFacade(self),
-            'rbuilder': rbuild.facade.rbuilderfacade.RbuilderFacade(self),
+            'conary': _DeferredFacade('rbuild.facade.conaryfacade',
+                                      'ConaryFacade'),
+            'rmake': _DeferredFacade('rbuild.facade.rmakefacade',
+                                     'RmakeFacade'),
+            'rbuilder': _DeferredFacade('rbuild.facade.rbuilderfacade',
+                                        'RbuilderFacade'),
         }
 
     def __repr__(self):
@@ -171,6 +276,9 @@ class RbuildHandle(_PluginProxy):
         return self._cfg
 
     def getPlugin(self, name):
+        if isinstance(self._pluginManager, pluginloader.PluginManager) and \
+                name in self._pluginManager.deferredPlugins:
+            getattr(self, self._pluginManager.manifest.getClassName(name))
         return self._pluginManager.getPlugin(name)
 
     def installPrehook(self, apiMethod, hookFunction):
@@ -233,6 +341,7 @@ class CommandManager(object):
     """
     def __init__(self):
         self._commands = {}
+        self._requested = None
 
     def registerCommand(self, commandClass):
         """
@@ -248,8 +357,18 @@ class CommandManager(object):
             @param name: command name as specified on the command line
             @return: commandClass that matches the given command line command.
         """
+        if self._requested is not None:
+            self._requested.add(name)
         return self._commands[name]
 
+    def trackRequests(self):
+        """
+            Record the names of the command classes requested from now on.
+            @return: set to which the names requested are added
+        """
+        self._requested = set()
+        return self._requested
+
     def getAllCommandClasses(self):
         """
             @return: all registered command classes
@@ -0,0 +1,355 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Implements concurrent, resumable and verified downloads of large files
+such as rBuilder images.
+
+A file whose size is known is fetched as a number of byte ranges at once
+and written into C{<path>.part}.  The ranges that are complete are
+recorded in C{<path>.part.state}, so an interrupted download resumes
+where it stopped.  The SHA-1 digest is computed while the data arrives
+and is checked, together with the size, before the file is moved into
+place.  A file whose size is not known, or whose server ignores range
+requests, is fetched as a single stream.
+
+Example::
+    from rbuild.internal import download
+    files = [download.FileDownload(url, 'image.iso', size, sha1)]
+    for fileDownload, error in download.Downloader().fetch(files):
+        ...
+"""
+
+import json
+import os
+import threading
+import urllib2
+
+from conary.lib import digestlib
+from conary.lib import util
+
+from rbuild import errors
+from rbuild.lib import util as rbuild_util
+
+# Length of the byte range requested at once
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+# Length of each read from the server or from disk
+BLOCK_SIZE = 64 * 1024
+
+
+class _RangesNotSupported(Exception):
+    """Raised when the server answers a range request with the whole file"""
+
+
+class FileDownload(object):
+    """
+    A file to fetch, and what it is checked against once fetched.
+    @param url: URL to fetch
+    @type url: string
+    @param path: destination path
+    @type path: string
+    @param size: expected length in bytes, or C{None} if unknown
+    @type size: int
+    @param sha1: expected hex SHA-1 digest, or C{None} if unknown
+    @type sha1: string
+    """
+
+    def __init__(self, url, path, size=None, sha1=None):
+        self.url = url
+        self.path = path
+        self.size = size
+        self.sha1 = sha1 and sha1.lower()
+        # set when the destination already held the expected file
+        self.skipped = False
+
+    @property
+    def partPath(self):
+        return self.path + '.part'
+
+    @property
+    def statePath(self):
+        return self.path + '.part.state'
+
+
+class _Transfer(object):
+    """
+    Range download of one file.  Chunks may complete in any order; the
+    digest is fed with the completed chunks at the front of the file, from
+    memory when possible and otherwise from the partial file.
+    """
+
+    def __init__(self, fileDownload, chunkSize, maxPending):
+        self.download = fileDownload
+        self.chunkSize = chunkSize
+        self.maxPending = maxPending
+        self.chunkCount = (fileDownload.size + chunkSize - 1) // chunkSize
+        self.lock = threading.Lock()
+        self.digest = digestlib.sha1()
+        self.done = set()
+        self.pending = {}
+        self.hashed = 0
+        self.error = None
+        self.fobj = None
+
+    def open(self):
+        """
+        Open the partial file, resuming from its recorded state when the
+        state matches this download.
+        """
+        done = self._readState()
+        if done is None:
+            self.fobj = open(self.download.partPath, 'w+b')
+            self.fobj.truncate(self.download.size)
+        else:
+            self.fobj = open(self.download.partPath, 'r+b')
+            self.done.update(done)
+            self._advance()
+
+    def getMissingChunks(self):
+        return [x for x in range(self.chunkCount) if x not in self.done]
+
+    def fetchChunk(self, opener, index):
+        """
+        Fetch chunk C{index} and write it into the partial file.
+        """
+        if self.error is not None:
+            # another chunk of this file failed; don't waste the bandwidth
+            return
+        start = index * self.chunkSize
+        end = start + self._chunkLength(index)
+        request = urllib2.Request(self.download.url,
+            headers={'Range': 'bytes=%d-%d' % (start, end - 1)})
+        response = opener(request)
+        try:
+            if response.getcode() != 206:
+                raise _RangesNotSupported()
+            blocks = []
+            offset = start
+            while offset < end:
+                block = response.read(min(BLOCK_SIZE, end - offset))
+                if not block:
+                    break
+                self.lock.acquire()
+                try:
+                    self.fobj.seek(offset)
+                    self.fobj.write(block)
+                finally:
+                    self.lock.release()
+                blocks.append(block)
+                offset += len(block)
+        finally:
+            response.close()
+        if offset != end:
+            raise errors.DownloadError(path=self.download.path,
+                reason='expected %d bytes at offset %d, received %d' % (
+                    end - start, start, offset - start))
+
+        self.lock.acquire()
+        try:
+            self.done.add(index)
+            # out of order chunks are kept in memory only up to a limit, the
+            # rest are read back from disk when the digest reaches them
+            if index == self.hashed or len(self.pending) < self.maxPending:
+                self.pending[index] = ''.join(blocks)
+            self._advance()
+            self._writeState()
+        finally:
+            self.lock.release()
+
+    def close(self):
+        """
+        Close the partial file.
+        @return: hex SHA-1 digest and length of the data, or C{None} if
+        some chunks are missing
+        """
+        self.fobj.close()
+        if self.hashed < self.chunkCount:
+            return None
+        return self.digest.hexdigest(), self.download.size
+
+    def _chunkLength(self, index):
+        return min(self.chunkSize,
+                   self.download.size - index * self.chunkSize)
+
+    def _advance(self):
+        while self.hashed in self.done:
+            data = self.pending.pop(self.hashed, None)
+            if data is None:
+                self.fobj.seek(self.hashed * self.chunkSize)
+                data = self.fobj.read(self._chunkLength(self.hashed))
+            self.digest.update(data)
+            self.hashed += 1
+
+    def _readState(self):
+        fileDownload = self.download
+        try:
+            state = json.load(open(fileDownload.statePath))
+            if (state['url'] == fileDownload.url
+                    and state['size'] == fileDownload.size
+                    and state['chunkSize'] == self.chunkSize
+                    and os.path.getsize(fileDownload.partPath)
+                        == fileDownload.size):
+                return [x for x in state['done'] if 0 <= x < self.chunkCount]
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def _writeState(self):
+        # the data must be on disk before the state claims it is
+        self.fobj.flush()
+        f = util.AtomicFile(self.download.statePath)
+        f.write(json.dumps(dict(url=self.download.url,
+            size=self.download.size, chunkSize=self.chunkSize,
+            done=sorted(self.done))))
+        f.commit()
+
+
+class Downloader(object):
+    """
+    Fetches files over HTTP using a bounded pool of threads.
+    @param workers: maximum number of requests in flight
+    @type workers: int
+    @param chunkSize: length of each byte range requested
+    @type chunkSize: int
+    """
+
+    def __init__(self, workers=4, chunkSize=DEFAULT_CHUNK_SIZE):
+        self.workers = workers
+        self.chunkSize = chunkSize
+
+    def fetch(self, downloads):
+        """
+        Fetch every file in C{downloads}.  Files that already exist with
+        the expected digest are not fetched again, and are marked
+        C{skipped}.
+        @param downloads: files to fetch
+        @type downloads: list of L{FileDownload}
+        @return: a (download, exception) pair for each file, in order;
+        exception is C{None} if the file was fetched or skipped
+        @rtype: list
+        """
+        failed = {}
+        transfers = []
+        streams = []
+        for fileDownload in downloads:
+            try:
+                if self._isCurrent(fileDownload):
+                    fileDownload.skipped = True
+                elif fileDownload.size:
+                    transfer = _Transfer(fileDownload, self.chunkSize,
+                                         self.workers)
+                    transfer.open()
+                    transfers.append(transfer)
+                else:
+                    streams.append(fileDownload)
+            except EnvironmentError, err:
+                failed[id(fileDownload)] = err
+
+        tasks = [(x, y) for x in transfers for y in x.getMissingChunks()]
+        rbuild_util.runConcurrently(self._fetchChunk, tasks, self.workers)
+        for transfer in transfers:
+            fileDownload = transfer.download
+            result = transfer.close()
+            if isinstance(transfer.error, _RangesNotSupported):
+                streams.append(fileDownload)
+            elif transfer.error is not None:
+                failed[id(fileDownload)] = transfer.error
+            elif result is None:
+                failed[id(fileDownload)] = errors.DownloadError(
+                    path=fileDownload.path, reason='incomplete transfer')
+            else:
+                try:
+                    self._commit(fileDownload, *result)
+                except (errors.DownloadError, EnvironmentError), err:
+                    failed[id(fileDownload)] = err
+
+        results = rbuild_util.runConcurrently(self._fetchStream, streams,
+                                              self.workers)
+        for fileDownload, (_, err) in zip(streams, results):
+            if err is not None:
+                failed[id(fileDownload)] = err
+
+        return [(x, failed.get(id(x))) for x in downloads]
+
+    def _open(self, request):
+        return urllib2.urlopen(request)
+
+    def _fetchChunk(self, task):
+        transfer, index = task
+        try:
+            transfer.fetchChunk(self._open, index)
+        except Exception, err:
+            if transfer.error is None:
+                transfer.error = err
+            raise
+
+    def _fetchStream(self, fileDownload):
+        digest = digestlib.sha1()
+        length = 0
+        response = self._open(urllib2.Request(fileDownload.url))
+        try:
+            fobj = open(fileDownload.partPath, 'wb')
+            try:
+                while True:
+                    block = response.read(BLOCK_SIZE)
+                    if not block:
+                        break
+                    fobj.write(block)
+                    digest.update(block)
+                    length += len(block)
+            finally:
+                fobj.close()
+        finally:
+            response.close()
+        util.removeIfExists(fileDownload.statePath)
+        self._commit(fileDownload, digest.hexdigest(), length)
+
+    @staticmethod
+    def _commit(fileDownload, sha1, size):
+        reason = None
+        if fileDownload.size is not None and size != fileDownload.size:
+            reason = 'expected %d bytes, received %d' % (
+                fileDownload.size, size)
+        elif fileDownload.sha1 and sha1 != fileDownload.sha1:
+            reason = 'expected SHA-1 %s, received %s' % (
+                fileDownload.sha1, sha1)
+        if reason:
+            # the partial data cannot be trusted to resume from
+            util.removeIfExists(fileDownload.partPath)
+            util.removeIfExists(fileDownload.statePath)
+            raise errors.DownloadError(path=fileDownload.path, reason=reason)
+        os.rename(fileDownload.partPath, fileDownload.path)
+        util.removeIfExists(fileDownload.statePath)
+
+    @staticmethod
+    def _isCurrent(fileDownload):
+        if not fileDownload.sha1 or not os.path.isfile(fileDownload.path):
+            return False
+        if (fileDownload.size is not None
+                and os.path.getsize(fileDownload.path) != fileDownload.size):
+            return False
+        digest = digestlib.sha1()
+        fobj = open(fileDownload.path, 'rb')
+        try:
+            while True:
+                block = fobj.read(BLOCK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+        finally:
+            fobj.close()
+        return digest.hexdigest() == fileDownload.sha1
@@ -0,0 +1,194 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Implements a persistent index of the troves referenced by groups, such
+as the groups on a product's search path.
+
+The contents of a group never change once it has been committed, so an
+entry is keyed by the group's name, version and flavor and is never
+invalidated.  Each group is stored in its own file, named by the SHA-1
+digest of that key, listing the name and frozen version and flavor of
+every trove the group references.  The index also remembers which groups
+each search path element resolved to most recently, so that the contents
+of a search path can be listed without contacting the repository.
+
+Example::
+    from rbuild.internal import groupindex
+    index = groupindex.GroupIndex('~/.rbuild/cache/groups')
+    contents = index.get(groupTup)
+    if contents is None:
+        contents = index.add(groupTup, trove.iterTroveList(
+            strongRefs=True, weakRefs=True))
+    troveTups = contents.find('foo')
+"""
+
+import json
+import os
+
+from conary import versions
+from conary.deps import deps
+from conary.lib import digestlib
+from conary.lib import util
+
+
+class GroupContents(object):
+    """
+    Troves referenced by one group, by name.  Versions and flavors read
+    from disk are thawed only when their name is looked up.
+    """
+
+    def __init__(self, troves):
+        self._troves = troves
+
+    def find(self, name):
+        """
+        @return: trove tuples named C{name} referenced by the group
+        @rtype: list
+        """
+        troveList = self._troves.get(name)
+        if not troveList:
+            return []
+        if not isinstance(troveList[0], tuple):
+            # json hands back unicode strings
+            troveList = [ (str(name), versions.ThawVersion(str(x[0])),
+                           deps.ThawFlavor(str(x[1]))) for x in troveList ]
+            self._troves[name] = troveList
+        return list(troveList)
+
+    def iterNames(self):
+        return iter(sorted(self._troves))
+
+
+class GroupIndex(object):
+    """
+    On-disk index of group contents.
+    @param indexDir: directory holding the index, or C{None} to keep the
+    index in memory only
+    @type indexDir: string
+    """
+
+    def __init__(self, indexDir):
+        if indexDir is not None:
+            indexDir = os.path.expanduser(indexDir)
+        self.indexDir = indexDir
+        self._groups = {}
+        self._resolved = None
+
+    def get(self, groupTup):
+        """
+        @return: contents of the group, or C{None} if it is not indexed
+        @rtype: L{GroupContents}
+        """
+        key = self._getKey(groupTup)
+        contents = self._groups.get(key)
+        if contents is None and self.indexDir is not None:
+            try:
+                data = json.load(open(self._getPath(key)))
+                troves = data['troves']
+            except (IOError, OSError, ValueError, KeyError, TypeError):
+                return None
+            contents = self._groups[key] = GroupContents(troves)
+        return contents
+
+    def add(self, groupTup, troveTups):
+        """
+        Index the troves referenced by a group.
+        @param groupTup: name, version and flavor of the group
+        @param troveTups: every trove tuple the group references
+        @return: contents of the group
+        @rtype: L{GroupContents}
+        """
+        troves = {}
+        for troveTup in troveTups:
+            troves.setdefault(troveTup[0], []).append(tuple(troveTup))
+        key = self._getKey(groupTup)
+        contents = self._groups[key] = GroupContents(troves)
+        if self.indexDir is not None:
+            frozen = dict((name, [ (x[1].freeze(), x[2].freeze())
+                                   for x in troveList ])
+                          for name, troveList in troves.iteritems())
+            self._write(self._getPath(key), dict(
+                group='%s=%s[%s]' % (groupTup[0], groupTup[1], groupTup[2]),
+                troves=frozen))
+        return contents
+
+    def getResolved(self, searchPath):
+        """
+        @param searchPath: C{(name, version, flavor)} spec of a search path
+        element
+        @return: the group tuples C{searchPath} most recently resolved to,
+        or C{None} if it has not been resolved
+        @rtype: list
+        """
+        frozen = self._getResolvedMap().get(self._getSpecKey(searchPath))
+        if frozen is None:
+            return None
+        return [ (str(x[0]), versions.ThawVersion(str(x[1])),
+                  deps.ThawFlavor(str(x[2]))) for x in frozen ]
+
+    def setResolved(self, searchPath, groupTups):
+        """
+        Record the group tuples a search path element resolved to.
+        """
+        resolved = self._getResolvedMap()
+        frozen = [ [x[0], x[1].freeze(), x[2].freeze()] for x in groupTups ]
+        specKey = self._getSpecKey(searchPath)
+        if resolved.get(specKey) == frozen:
+            return
+        resolved[specKey] = frozen
+        if self.indexDir is not None:
+            self._write(os.path.join(self.indexDir, 'searchpaths'), resolved)
+
+    def _getResolvedMap(self):
+        if self._resolved is None:
+            self._resolved = {}
+            if self.indexDir is not None:
+                try:
+                    self._resolved = json.load(open(
+                        os.path.join(self.indexDir, 'searchpaths')))
+                except (IOError, OSError, ValueError):
+                    pass
+        return self._resolved
+
+    @staticmethod
+    def _getKey(groupTup):
+        name, version, flavor = groupTup
+        # frozen versions carry timestamps, which are not part of the
+        # identity of a trove
+        return digestlib.sha1('%s=%s[%s]' % (name, version.asString(),
+                                             flavor.freeze())).hexdigest()
+
+    @staticmethod
+    def _getSpecKey(searchPath):
+        name, version, flavor = searchPath
+        return '%s=%s[%s]' % (name, version, flavor or '')
+
+    def _getPath(self, key):
+        return os.path.join(self.indexDir, key[:2], key)
+
+    @staticmethod
+    def _write(path, data):
+        # Failing to write the index is not fatal; the group is simply
+        # fetched again next time.
+        try:
+            util.mkdirChain(os.path.dirname(path))
+            f = util.AtomicFile(path)
+            f.write(json.dumps(data))
+            f.commit()
+        except (IOError, OSError):
+            pass
@@ -0,0 +1,173 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Implements a persistent cache of the repository history of source
+packages: the change log messages of committed versions, and the diffs
+between two committed versions.
+
+Committed versions never change, so an entry is keyed by the package name
+and version (or pair of versions) and is never invalidated.  Instead the
+cache is bounded in size, and the entries used least recently are removed
+once it grows past that size.  Each entry is stored in its own file,
+named by the SHA-1 digest of its key, whose modification time records
+when the entry was last used.  Entries are stored as JSON, with the bytes
+of each line kept as Latin-1 characters.
+
+Example::
+    from rbuild.internal import historycache
+    cache = historycache.HistoryCache('~/.rbuild/cache/history')
+    lines = cache.getLog(name, version)
+    if lines is None:
+        lines = list(checkin.iterLogMessages([trove]))
+        cache.setLog(name, version, lines)
+"""
+
+import json
+import os
+
+from conary.lib import digestlib
+from conary.lib import util
+
+# Default limit, in bytes, on the total size of the cache entries
+DEFAULT_MAX_SIZE = 32 * 1024 * 1024
+
+
+class HistoryCache(object):
+    """
+    On-disk cache of change log messages and diffs, one file per entry.
+    @param cacheDir: directory holding the cache, or C{None} to disable
+    caching
+    @type cacheDir: string
+    @param maxSize: limit, in bytes, on the total size of the entries
+    @type maxSize: int
+    """
+
+    def __init__(self, cacheDir, maxSize=DEFAULT_MAX_SIZE):
+        if cacheDir is not None:
+            cacheDir = os.path.expanduser(cacheDir)
+        self.cacheDir = cacheDir
+        self.maxSize = maxSize
+        # total size of the entries, counted when first needed
+        self._size = None
+
+    def getLog(self, name, version):
+        """
+        @param name: name of the source package
+        @param version: version string of a committed version
+        @return: log message lines recorded for C{version}, or C{None}
+        @rtype: list of strings
+        """
+        return self._get(('log', name, version))
+
+    def setLog(self, name, version, lines):
+        """
+        Record the log message lines for one committed version.
+        """
+        self._set(('log', name, version), lines)
+
+    def getDiff(self, name, oldVersion, newVersion):
+        """
+        @param name: name of the source package
+        @param oldVersion: version string of a committed version
+        @param newVersion: version string of a later committed version
+        @return: diff lines recorded between the two versions, or C{None}
+        @rtype: list of strings
+        """
+        return self._get(('diff', name, oldVersion, newVersion))
+
+    def setDiff(self, name, oldVersion, newVersion, lines):
+        """
+        Record the diff lines between two committed versions.
+        """
+        self._set(('diff', name, oldVersion, newVersion), lines)
+
+    def _getPath(self, key):
+        digest = digestlib.sha1('\0'.join(key)).hexdigest()
+        return os.path.join(self.cacheDir, digest)
+
+    def _get(self, key):
+        if self.cacheDir is None:
+            return None
+        path = self._getPath(key)
+        try:
+            data = json.load(open(path))
+            if not isinstance(data, list) or len(data) != 2:
+                return None
+            storedKey, lines = data
+            if storedKey != list(key) or not isinstance(lines, list):
+                return None
+            lines = [x.encode('latin-1') for x in lines]
+        except (IOError, OSError, ValueError):
+            # a missing or damaged entry just means fetching it again
+            return None
+        try:
+            # mark the entry as the most recently used
+            os.utime(path, None)
+        except OSError:
+            pass
+        return lines
+
+    def _set(self, key, lines):
+        if self.cacheDir is None:
+            return
+        data = json.dumps([key, list(lines)], encoding='latin-1')
+        if len(data) > self.maxSize:
+            return
+        # Failing to write the cache is not fatal; the entry is simply
+        # fetched again next time.
+        try:
+            util.mkdirChain(self.cacheDir)
+            if self._size is None:
+                self._size = sum(x[2] for x in self._listEntries())
+            f = util.AtomicFile(self._getPath(key))
+            f.write(data)
+            f.commit()
+        except (IOError, OSError):
+            return
+        self._size += len(data)
+        if self._size > self.maxSize:
+            self._evict()
+
+    def _listEntries(self):
+        entries = []
+        for fileName in os.listdir(self.cacheDir):
+            path = os.path.join(self.cacheDir, fileName)
+            try:
+                sb = os.stat(path)
+            except OSError:
+                continue
+            entries.append((sb.st_mtime, path, sb.st_size))
+        return entries
+
+    def _evict(self):
+        """
+        Remove the least recently used entries until the cache is at most
+        three quarters of its size limit, so that it is not pruned again
+        on every write.
+        """
+        try:
+            entries = self._listEntries()
+        except OSError:
+            return
+        entries.sort()
+        self._size = sum(x[2] for x in entries)
+        for _, path, size in entries:
+            if self._size <= self.maxSize * 3 / 4:
+                break
+            util.removeIfExists(path)
+            self._size -= size
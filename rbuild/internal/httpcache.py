@@ -0,0 +1,210 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Implements a persistent cache of HTTP response bodies for read-mostly
+resources such as the rBuilder platform list.
+
+Entries are keyed by URL and user name.  A cached body is returned as-is
+while it is younger than the timeout configured for its resource; after
+that it is revalidated with a conditional request (C{If-None-Match} /
+C{If-Modified-Since}), so an unchanged resource costs only a C{304}.
+When the server cannot be reached, the caller may fall back to the stale
+copy returned by C{getStale}.
+
+Example::
+    from rbuild.internal import httpcache
+    cache = httpcache.ResponseCache('~/.rbuild/cache', {'platforms': 3600})
+    body = cache.get(url, 'platforms', user, password)
+    cache.invalidate(url, user)
+"""
+
+import base64
+import json
+import os
+import time
+import urllib2
+
+from conary.lib import digestlib
+from conary.lib import util
+
+# Default time, in seconds, that a cached body is used without revalidation
+DEFAULT_TIMEOUT = 24 * 60 * 60
+
+
+class ResponseCache(object):
+    """
+    On-disk cache of HTTP response bodies.
+    @param cacheDir: directory holding the cache entries
+    @type cacheDir: string
+    @param timeouts: seconds a body of each named resource stays fresh
+    @type timeouts: dict
+    @param enabled: if C{False}, every request goes to the server and
+    nothing is read from or written to C{cacheDir}
+    @type enabled: bool
+    @param requestTimeout: seconds to wait for the server to respond, or
+    C{None} to use the default socket timeout
+    @type requestTimeout: int
+    """
+
+    def __init__(self, cacheDir, timeouts=None, enabled=True,
+                 defaultTimeout=DEFAULT_TIMEOUT, requestTimeout=None):
+        self.cacheDir = os.path.expanduser(cacheDir)
+        self.timeouts = timeouts or {}
+        self.enabled = enabled
+        self.defaultTimeout = defaultTimeout
+        self.requestTimeout = requestTimeout
+
+    def getTimeout(self, resource):
+        """
+        @return: seconds a cached body of C{resource} is used without
+        revalidating it
+        @rtype: int
+        """
+        return self.timeouts.get(resource, self.defaultTimeout)
+
+    def get(self, url, resource=None, user=None, password=None):
+        """
+        Fetch the body of C{url}, using the cached copy when it is fresh
+        or the server reports that it has not changed.
+        @param url: URL to fetch; must not contain credentials
+        @type url: string
+        @param resource: name used to look up the timeout for this entry
+        @type resource: string
+        @param user: user name to authenticate with; also part of the key
+        @type user: string
+        @param password: password to authenticate with
+        @type password: string
+        @return: response body
+        @rtype: string
+        @raise urllib2.URLError: if the server could not be reached or
+        returned an error
+        """
+        if not self.enabled:
+            return self._open(url, {}, user, password).read()
+
+        path = self._getPath(url, user)
+        meta, body = self._readEntry(path)
+        headers = {}
+        if meta is not None:
+            if time.time() - meta['fetched'] < self.getTimeout(resource):
+                return body
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('lastModified'):
+                headers['If-Modified-Since'] = meta['lastModified']
+
+        try:
+            response = self._open(url, headers, user, password)
+        except urllib2.HTTPError, err:
+            if err.code != 304 or meta is None:
+                raise
+            # Unchanged on the server; restart the timeout
+            meta['fetched'] = time.time()
+            self._writeEntry(path, meta)
+            return body
+
+        body = response.read()
+        info = response.info()
+        meta = dict(url=url, fetched=time.time(),
+                    etag=info.getheader('ETag'),
+                    lastModified=info.getheader('Last-Modified'))
+        self._writeEntry(path, meta, body)
+        return body
+
+    def getStale(self, url, user=None):
+        """
+        @return: the cached body of C{url} however old it is, or C{None}
+        if there is none
+        @rtype: string
+        """
+        if not self.enabled:
+            return None
+        return self._readEntry(self._getPath(url, user))[1]
+
+    def touch(self, url, resource=None, user=None, seconds=None):
+        """
+        Treat the cached copy of C{url}, if any, as fresh again, so that
+        a server that could not be reached is not asked again by every
+        request.
+        @param resource: name used to look up the timeout for this entry
+        @type resource: string
+        @param seconds: seconds the copy stays fresh, or C{None} for the
+        whole timeout of C{resource}
+        @type seconds: int
+        """
+        if not self.enabled:
+            return
+        path = self._getPath(url, user)
+        meta = self._readEntry(path)[0]
+        if meta is None:
+            return
+        fetched = time.time()
+        if seconds is not None:
+            fetched -= max(self.getTimeout(resource) - seconds, 0)
+        meta['fetched'] = fetched
+        self._writeEntry(path, meta)
+
+    def invalidate(self, url, user=None):
+        """
+        Remove the cached copy of C{url}, if any, so that the next C{get}
+        fetches it from the server.
+        """
+        path = self._getPath(url, user)
+        for name in (path + '.meta', path):
+            util.removeIfExists(name)
+
+    def _getPath(self, url, user):
+        key = digestlib.sha1('%s\0%s' % (user or '', url)).hexdigest()
+        return os.path.join(self.cacheDir, key)
+
+    def _open(self, url, headers, user, password):
+        request = urllib2.Request(url, headers=headers)
+        if user:
+            auth = base64.b64encode('%s:%s' % (user, password or ''))
+            request.add_header('Authorization', 'Basic ' + auth)
+        if self.requestTimeout is not None:
+            return urllib2.urlopen(request, timeout=self.requestTimeout)
+        return urllib2.urlopen(request)
+
+    @staticmethod
+    def _readEntry(path):
+        try:
+            meta = json.load(open(path + '.meta'))
+            body = open(path).read()
+        except (IOError, OSError, ValueError):
+            return None, None
+        return meta, body
+
+    def _writeEntry(self, path, meta, body=None):
+        # The body is written before its metadata so that a reader never
+        # pairs new validators with an old body.  Failing to write the
+        # cache is not fatal; the next command simply fetches again.
+        try:
+            util.mkdirChain(self.cacheDir)
+            if body is not None:
+                self._writeFile(path, body)
+            self._writeFile(path + '.meta', json.dumps(meta))
+        except (IOError, OSError):
+            pass
+
+    @staticmethod
+    def _writeFile(path, contents):
+        # cached bodies may hold data only visible to this user
+        f = util.AtomicFile(path, chmod=0600)
+        f.write(contents)
+        f.commit()
@@ -0,0 +1,187 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Implements a snapshot of the latest troves on a label, kept up to date
+with only the troves that changed since it was taken.
+
+The snapshot records the latest version of every flavor of every trove on
+each branch of the label, together with the repository change mark it is
+current to.  The troves changed since that mark are fetched with the same
+C{getNewTroveList} call that C{conary mirror} uses and merged in.  That
+call needs mirror access to the repository; without it, or when a trove
+the snapshot depends on was removed, the whole label is fetched again.
+
+The snapshot is only used for labels that the trove index in the rBuild
+cache cannot answer for: when caching is disabled, or when the index of
+the host could not be brought up to date.  Like the index, it relies on
+mirror access, so on hosts that refuse it the whole label is still
+fetched for every build.
+
+Repository marks are the server times at which troves changed, so a new
+snapshot is marked somewhat before the time it was taken, to allow for
+clock skew between the client and the server.  Troves fetched twice are
+simply merged again.
+
+Example::
+    from rbuild.internal import labelsnapshot
+    snapshot = labelsnapshot.LabelSnapshot('.rbuild/labelsnapshots/devel')
+    latest = snapshot.getTroveLatestByLabel(repos, label)
+"""
+
+import json
+import os
+import time
+
+from conary import errors as conaryerrors
+from conary import trove
+from conary import versions
+from conary.deps import deps
+from conary.lib import util
+
+from rbuild.internal import troveindex
+
+# Seconds a new snapshot is marked before the time it was taken
+MARK_MARGIN = 60 * 60
+# Seconds before asking again for changes from a repository that refused
+RETRY_TIMEOUT = 24 * 60 * 60
+
+
+class LabelSnapshot(object):
+    """
+    Snapshot of the latest troves on one label, stored in one file.
+    @param path: path of the snapshot file
+    @type path: string
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def getTroveLatestByLabel(self, repos, label):
+        """
+        Bring the snapshot up to date and return its contents.
+        @param repos: repository client
+        @param label: label of the troves
+        @type label: C{conary.versions.Label}
+        @return: the latest version of every trove on each branch of
+        C{label}, with all of its flavors, in the form returned by the
+        repository call of the same name
+        @rtype: dict
+        """
+        leaves, mark, refused = self._read(label)
+        if leaves is not None and mark is not None:
+            try:
+                mark = self._merge(repos, label, leaves, mark)
+            except conaryerrors.InsufficientPermission:
+                refused = time.time()
+                mark = None
+            if mark is None:
+                leaves = None
+        if leaves is None:
+            if refused is None or time.time() - refused >= RETRY_TIMEOUT:
+                refused = None
+                mark = str(time.time() - MARK_MARGIN)
+            else:
+                mark = None
+            results = repos.getTroveLatestByLabel({None: {label: [None]}})
+            leaves = {}
+            for name, versionDict in (results or {}).iteritems():
+                for version, flavors in versionDict.iteritems():
+                    for flavor in flavors:
+                        self._add(leaves, name, version, flavor)
+        self._write(label, leaves, mark, refused)
+        return self._getLatest(leaves)
+
+    @staticmethod
+    def _add(leaves, name, version, flavor):
+        key = (name, version.branch().asString(), flavor.freeze())
+        current = leaves.get(key)
+        if (current is None or version.trailingRevision().timeStamp
+                > current.trailingRevision().timeStamp):
+            leaves[key] = version
+
+    def _merge(self, repos, label, leaves, mark):
+        """
+        Merge the troves on C{label} changed since C{mark} into C{leaves}.
+        @return: the new mark, or C{None} if the snapshot has to be taken
+        again
+        """
+        for troveList, mark in troveindex.iterNewTroves(repos,
+                                                        label.getHost(), mark):
+            for item in troveList:
+                (name, version, flavor), troveType = item[1], item[2]
+                if version.branch().label() != label:
+                    continue
+                if troveType == trove.TROVE_TYPE_REMOVED:
+                    key = (name, version.branch().asString(), flavor.freeze())
+                    if leaves.get(key) == version:
+                        # the version it replaced is not known
+                        return None
+                    continue
+                self._add(leaves, name, version, flavor)
+        return mark
+
+    @staticmethod
+    def _getLatest(leaves):
+        latest = {}
+        for (name, branch, _), version in leaves.iteritems():
+            current = latest.get((name, branch))
+            if (current is None or version.trailingRevision().timeStamp
+                    > current.trailingRevision().timeStamp):
+                latest[(name, branch)] = version
+        results = {}
+        for (name, branch, flavor), version in leaves.iteritems():
+            if version == latest[(name, branch)]:
+                results.setdefault(name, {}).setdefault(version, []).append(
+                    deps.ThawFlavor(flavor))
+        return results
+
+    def _read(self, label):
+        try:
+            data = json.load(open(self.path))
+            if data['label'] != label.asString():
+                return None, None, None
+            refused = data['refused']
+            mark = data['mark']
+            if mark is None:
+                return None, None, refused
+            # json hands back unicode strings
+            leaves = dict(((str(x[0]), str(x[1]), str(x[2])),
+                           versions.ThawVersion(str(x[3])))
+                          for x in data['troves'])
+            return leaves, str(mark), refused
+        except (IOError, OSError, ValueError, KeyError, TypeError,
+                IndexError):
+            return None, None, None
+
+    def _write(self, label, leaves, mark, refused):
+        # Failing to write the snapshot is not fatal; the whole label is
+        # simply fetched again next time.
+        troves = []
+        if mark is not None:
+            # without a mark the snapshot cannot be brought up to date
+            troves = [ list(key) + [version.freeze()]
+                       for key, version in leaves.iteritems() ]
+        data = dict(label=label.asString(), mark=mark, refused=refused,
+                    troves=troves)
+        try:
+            util.mkdirChain(os.path.dirname(self.path))
+            f = util.AtomicFile(self.path)
+            f.write(json.dumps(data))
+            f.commit()
+        except (IOError, OSError):
+            pass
@@ -25,6 +25,7 @@ Example::
 """
 
 import errno
+import os
 import re
 import sys
 
@@ -70,20 +71,26 @@ class RbuildMain(mainhandler.MainHandler):
 
     def getCommand(self, argv, cfg):
         """
-        Initializes plugins so that all commands are available,
+        Initializes the plugins needed for the command in argv (all
+        plugins, if the plugin manifest is missing or out of date),
         then returns the correct command based on argv.
 
         @param argv: Argument vector as provided by C{sys.argv}
         @param cfg: An C{RbuildConfiguration} object
         @return: C{commandClass} instance selected by C{argv}
         """
-        self.plugins = pluginloader.getPlugins(argv, cfg.pluginDirs)
+        manifestPath = None
+        if cfg.useCache:
+            manifestPath = os.path.join(cfg.cacheDirectory, 'plugins')
+        self.plugins = pluginloader.getPlugins(argv, cfg.pluginDirs,
+                                               manifestPath=manifestPath)
         self.handle = handle.RbuildHandle(cfg, self.plugins)
         self.handle.ui.pushContext('rBuild %s: %s',
                                    self.version, ' '.join(argv))
         self.plugins.registerCommands(self, self.handle)
         self.plugins.registerFacade(self.handle)
         self.plugins.initialize()
+        self.plugins.saveManifest()
         return mainhandler.MainHandler.getCommand(self, argv, cfg)
 
     def _getPreCommandOptions(self, argv, cfg):
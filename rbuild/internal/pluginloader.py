@@ -15,6 +15,11 @@
 #
 
 
+import json
+import os
+
+from conary.lib import digestlib
+from conary.lib import util
 from rmake.lib import pluginlib
 
 #: C{PLUGIN_PREFIX} is a synthetic namespace which plugins use to
@@ -25,9 +30,26 @@ class PluginManager(pluginlib.PluginManager):
     #pylint: disable-msg=R0904
     # "the creature can't help its ancestry"
 
+    def __init__(self, pluginDirs=None, disabledPlugins=None, **kw):
+        pluginlib.PluginManager.__init__(self, pluginDirs, disabledPlugins,
+                                         **kw)
+        self._pluginDirs = pluginDirs
+        self._disabledPlugins = list(disabledPlugins or [])
+        self._loaderArgs = kw
+        #: L{PluginManifest} describing all plugins, or C{None}
+        self.manifest = None
+        #: names of plugins not loaded until they are first used
+        self.deferredPlugins = set()
+        # plugin registrations recorded to generate the manifest
+        self._records = None
+
     def registerCommands(self, main, handle):
         for plugin in self.plugins:
+            if self._records is not None:
+                before = self._getCommandClasses(handle)
             plugin.registerCommands()
+            if self._records is not None:
+                self._recordCommands(plugin, handle, before)
         for command in handle.Commands.getAllCommandClasses():
             main.registerCommand(command)
 
@@ -37,7 +59,20 @@ class PluginManager(pluginlib.PluginManager):
 
     def initialize(self):
         for plugin in self.plugins:
+            if self._records is None:
+                plugin.initialize()
+                continue
+            handle = plugin.handle
+            before = self._getCommandClasses(handle)
+            hooks = self._countHooks()
+            requested = handle.Commands.trackRequests()
             plugin.initialize()
+            self._recordCommands(plugin, handle, before)
+            record = self._records[plugin.name]
+            record['extends'] = sorted(requested)
+            if self._countHooks() != hooks:
+                # hooks into other plugins only work if loaded up front
+                record['eager'] = True
 
     def addPluginConfigurationClasses(self, cfg):
         for plugin in self.plugins:
@@ -47,12 +82,236 @@ class PluginManager(pluginlib.PluginManager):
         for plugin in self.plugins:
             plugin.pluginCfg = cfg.getSection(plugin.name)
 
-def getPlugins(argv, pluginDirs, disabledPlugins=None):
-    # TODO: look for plugin-related options in argv, perhaps with our
-    # own lenient parser.
-    # until then, ignore unused argv argument
-    # pylint: disable-msg=W0613
-    pluginMgr = PluginManager(pluginDirs, disabledPlugins,
-                              pluginPrefix=PLUGIN_PREFIX)
+    def recordManifest(self):
+        """
+        Record the commands each plugin registers while they are
+        registered, to be written by L{saveManifest}.
+        """
+        from rbuild import pluginapi
+        self._records = {}
+        for plugin in self.plugins:
+            pluginClass = plugin.__class__
+            # facades and configuration must be set up before any
+            # command runs
+            eager = (pluginClass.registerFacade.im_func
+                        is not pluginapi.Plugin.registerFacade.im_func
+                     or plugin.PluginConfiguration
+                        is not pluginapi.PluginConfiguration)
+            self._records[plugin.name] = dict(
+                className=pluginClass.__name__, commands=[], extends=[],
+                eager=eager)
+
+    def saveManifest(self):
+        """
+        Write the manifest recorded since L{recordManifest} was called.
+        """
+        if self.manifest is not None and self._records is not None:
+            self.manifest.save(self._records)
+        self._records = None
+
+    def loadDeferredPlugin(self, className):
+        """
+        Load a plugin that was deferred until first use.
+        @param className: class name of the plugin
+        @return: the plugin, or C{None} if no such plugin was deferred
+        """
+        if self.manifest is None:
+            return None
+        pluginName = self.manifest.getPluginName(className)
+        if pluginName not in self.deferredPlugins:
+            return None
+        self.deferredPlugins.discard(pluginName)
+        disabledPlugins = self._disabledPlugins + sorted(
+            set(self.manifest.getPluginNames()) - set([pluginName]))
+        loader = PluginManager(self._pluginDirs, disabledPlugins,
+                               **self._loaderArgs)
+        loader.loadPlugins()
+        for plugin in loader.plugins:
+            if plugin.__class__.__name__ == className:
+                self.plugins.append(plugin)
+                if hasattr(self, 'pluginsByName'):
+                    self.pluginsByName[plugin.name] = plugin
+                return plugin
+        return None
+
+    @staticmethod
+    def _getCommandClasses(handle):
+        commands = {}
+        for commandClass in handle.Commands.getAllCommandClasses():
+            for name in commandClass.commands:
+                commands[name] = commandClass
+        return commands
+
+    def _recordCommands(self, plugin, handle, before):
+        record = self._records[plugin.name]
+        for name, commandClass in self._getCommandClasses(handle).items():
+            if before.get(name) is not commandClass:
+                record['commands'].append(name)
+        record['commands'].sort()
+
+    def _countHooks(self):
+        return sum(len(hooks) for plugin in self.plugins
+                   for hooks in (plugin._prehooks.values()
+                                 + plugin._posthooks.values()))
+
+
+class PluginManifest(object):
+    """
+    Record of the commands provided by each plugin in the plugin
+    directories, so that a command can be run after loading only the
+    plugins it needs.  The manifest is regenerated whenever an entry in
+    a plugin directory, or a file in a plugin package, changes.
+
+    For each plugin, the manifest stores the class name of the plugin,
+    the commands it registers, the commands it looks up to extend (for
+    instance with subcommands) and whether it must always be loaded.
+    Plugins that register facades, define configuration or install
+    hooks into other plugins must always be loaded.
+    """
+
+    def __init__(self, path, pluginDirs, disabledPlugins=None):
+        self._path = os.path.expanduser(path)
+        self._key = self._getKey(pluginDirs, disabledPlugins)
+        self._plugins = None
+        try:
+            data = json.load(open(self._path))
+            if data['key'] == self._key:
+                # json hands back unicode strings
+                self._plugins = dict((str(name), dict(
+                    className=str(x['className']),
+                    commands=[ str(y) for y in x['commands'] ],
+                    extends=[ str(y) for y in x['extends'] ],
+                    eager=bool(x['eager'])))
+                    for name, x in data['plugins'].items())
+        except (IOError, OSError, ValueError, KeyError, TypeError,
+                AttributeError):
+            pass
+
+    def isValid(self):
+        return self._plugins is not None
+
+    def getPluginNames(self):
+        return sorted(self._plugins)
+
+    def getPluginName(self, className):
+        for name, plugin in self._plugins.iteritems():
+            if plugin['className'] == className:
+                return name
+        return None
+
+    def getClassName(self, pluginName):
+        plugin = self._plugins.get(pluginName)
+        return plugin and plugin['className']
+
+    def getRequiredPlugins(self, pluginName):
+        """
+        @return: names of the plugins providing the commands that the
+        plugin C{pluginName} extends
+        @rtype: list
+        """
+        extends = set(self._plugins[pluginName]['extends'])
+        return sorted(name for name, plugin in self._plugins.iteritems()
+                      if extends.intersection(plugin['commands']))
+
+    def getPluginsForArgs(self, argv):
+        """
+        @param argv: argument vector of the command to run
+        @return: names of the plugins needed to run the command, or
+        C{None} if every plugin is needed, as for listing all commands
+        @rtype: set
+        """
+        if not self.isValid():
+            return None
+        args = argv[1:]
+        if args and args[0] == 'help':
+            args = args[1:]
+        if not args or args[0].startswith('-'):
+            return None
+        commandName = args[0]
+        needed = set(name for name, plugin in self._plugins.iteritems()
+                     if commandName in plugin['commands']
+                     or commandName in plugin['extends'])
+        if not needed:
+            # unknown commands print the list of all commands
+            return None
+        needed.update(name for name, plugin in self._plugins.iteritems()
+                      if plugin['eager'])
+        pending = list(needed)
+        while pending:
+            for name in self.getRequiredPlugins(pending.pop()):
+                if name not in needed:
+                    needed.add(name)
+                    pending.append(name)
+        return needed
+
+    def save(self, plugins):
+        """
+        Write the manifest for the current plugin directories.
+        @param plugins: dictionary mapping plugin name to a dictionary of
+        C{className}, C{commands}, C{extends} and C{eager}
+        """
+        self._plugins = plugins
+        # Failing to write the manifest is not fatal; all plugins are
+        # simply loaded again next time.
+        try:
+            util.mkdirChain(os.path.dirname(self._path))
+            f = util.AtomicFile(self._path)
+            f.write(json.dumps(dict(key=self._key, plugins=plugins)))
+            f.commit()
+        except (IOError, OSError):
+            pass
+
+    @staticmethod
+    def _getKey(pluginDirs, disabledPlugins):
+        stats = [sorted(disabledPlugins or [])]
+        for pluginDir in pluginDirs or []:
+            pluginDir = os.path.expanduser(pluginDir)
+            try:
+                entries = sorted(os.listdir(pluginDir))
+                stats.append([pluginDir, os.stat(pluginDir).st_mtime])
+            except OSError:
+                stats.append([pluginDir, None])
+                continue
+            for entry in entries:
+                path = os.path.join(pluginDir, entry)
+                try:
+                    stats.append([path, os.stat(path).st_mtime])
+                    if os.path.isdir(path):
+                        for fileName in sorted(os.listdir(path)):
+                            filePath = os.path.join(path, fileName)
+                            stats.append([filePath,
+                                          os.stat(filePath).st_mtime])
+                except OSError:
+                    stats.append([path, None])
+        return digestlib.sha1(json.dumps(stats)).hexdigest()
+
+
+def getPlugins(argv, pluginDirs, disabledPlugins=None, manifestPath=None):
+    """
+    Load the rBuild plugins.
+    @param argv: argument vector of the command to run
+    @param pluginDirs: directories to load plugins from
+    @param disabledPlugins: names of plugins not to load
+    @param manifestPath: path to the plugin manifest, or C{None} to load
+    every plugin.  With a manifest, only the plugins needed for the
+    command in C{argv} are loaded, and the rest are deferred until they
+    are first used.
+    """
+    manifest = neededPlugins = None
+    if manifestPath is not None:
+        manifest = PluginManifest(manifestPath, pluginDirs, disabledPlugins)
+        neededPlugins = manifest.getPluginsForArgs(argv)
+    deferredPlugins = set()
+    if neededPlugins is not None:
+        deferredPlugins = set(manifest.getPluginNames()) - neededPlugins
+    pluginMgr = PluginManager(pluginDirs,
+            list(disabledPlugins or []) + sorted(deferredPlugins),
+            pluginPrefix=PLUGIN_PREFIX)
+    # deferred plugins are not disabled once they are loaded
+    pluginMgr._disabledPlugins = list(disabledPlugins or [])
+    pluginMgr.manifest = manifest
+    pluginMgr.deferredPlugins = deferredPlugins
     pluginMgr.loadPlugins()
+    if manifest is not None and not manifest.isValid():
+        pluginMgr.recordManifest()
     return pluginMgr
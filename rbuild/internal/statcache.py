@@ -0,0 +1,202 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Implements a cache of the local status of Conary checkouts, in the manner
+of the git index.
+
+For every file in a checkout, the cache records its inode, size, mtime and
+ctime together with the SHA-1 digest of its contents, and the status that
+was generated for the checkout from those files.  While no file has been
+added or removed and the stat data of every file is unchanged, the
+recorded status is returned without reading any file.  Files whose stat
+data changed are hashed again, and if their contents are the same the
+recorded status still holds.  A file modified in the same second that its
+entry was recorded cannot be told apart from an unmodified one by its
+timestamps, so such a file is always hashed.
+
+Example::
+    from rbuild.internal import statcache
+    cache = statcache.StatCache('.rbuild/statcache')
+    status = cache.getStatus(checkoutDir)
+    if status is None:
+        snapshot = cache.snapshot(checkoutDir)
+        status = checkin.generateStatus(repos, dirName=checkoutDir)
+        cache.setStatus(checkoutDir, snapshot, status)
+"""
+
+import json
+import os
+import stat
+import time
+
+from conary.lib import digestlib
+from conary.lib import util
+
+# Length of each read when hashing a file
+BLOCK_SIZE = 64 * 1024
+
+
+class StatCache(object):
+    """
+    On-disk cache of checkout status, one file per checkout.
+    @param cacheDir: directory holding the cache, or C{None} to disable
+    caching
+    @type cacheDir: string
+    """
+
+    def __init__(self, cacheDir):
+        self.cacheDir = cacheDir
+
+    def getStatus(self, checkoutDir):
+        """
+        @return: the status recorded for C{checkoutDir}, or C{None} if it
+        is not recorded or the files in the checkout may have changed
+        since it was
+        @rtype: list of C{(status, path)} tuples
+        """
+        if self.cacheDir is None:
+            return None
+        entry = self._read(checkoutDir)
+        if entry is None:
+            return None
+        recorded = entry['recorded']
+        files = entry['files']
+        now = time.time()
+        current = self._scan(checkoutDir)
+        if set(current) != set(files):
+            return None
+        changed = False
+        for path, statData in current.iteritems():
+            oldData = files[path][:4]
+            if statData == oldData and not self._isRacy(oldData, recorded):
+                continue
+            digest = self._hash(checkoutDir, path)
+            if digest != files[path][4]:
+                return None
+            files[path] = statData + [digest]
+            changed = True
+        status = [ tuple(x) for x in entry['status'] ]
+        if changed:
+            # record the new stat data so the files are not hashed again
+            self._write(checkoutDir, dict(recorded=now, files=files),
+                        status)
+        return status
+
+    def snapshot(self, checkoutDir):
+        """
+        Record the stat data and digest of every file in C{checkoutDir},
+        before its status is generated.  Files whose stat data is the same
+        as in the previous entry for the checkout keep the digest recorded
+        there instead of being hashed again.
+        @return: opaque snapshot to pass to L{setStatus}
+        """
+        if self.cacheDir is None:
+            return None
+        oldFiles = {}
+        entry = self._read(checkoutDir)
+        if entry is not None:
+            oldFiles = entry['files']
+            oldRecorded = entry['recorded']
+        recorded = time.time()
+        files = self._scan(checkoutDir)
+        for path, statData in files.iteritems():
+            oldData = oldFiles.get(path)
+            if (oldData is not None and statData == oldData[:4]
+                    and not self._isRacy(oldData, oldRecorded)):
+                digest = oldData[4]
+            else:
+                digest = self._hash(checkoutDir, path)
+            files[path] = statData + [digest]
+        return dict(recorded=recorded, files=files)
+
+    def setStatus(self, checkoutDir, snapshot, status):
+        """
+        Record the status generated for C{checkoutDir} after L{snapshot}
+        was taken.
+        """
+        if self.cacheDir is None or snapshot is None:
+            return
+        self._write(checkoutDir, snapshot, status)
+
+    @staticmethod
+    def _isRacy(statData, recorded):
+        # mtime is not later than the time the entry was recorded, but
+        # with whole second timestamps it may still be a later change
+        return int(statData[2]) >= int(recorded)
+
+    @staticmethod
+    def _scan(checkoutDir):
+        files = {}
+        for dirpath, _, filenames in os.walk(checkoutDir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                sb = os.lstat(path)
+                files[path[len(checkoutDir):].lstrip('/')] = [
+                    sb.st_ino, sb.st_size, sb.st_mtime, sb.st_ctime]
+        return files
+
+    @staticmethod
+    def _hash(checkoutDir, path):
+        path = os.path.join(checkoutDir, path)
+        digest = digestlib.sha1()
+        if stat.S_ISLNK(os.lstat(path).st_mode):
+            digest.update(os.readlink(path))
+            return digest.hexdigest()
+        fobj = open(path, 'rb')
+        try:
+            while True:
+                block = fobj.read(BLOCK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+        finally:
+            fobj.close()
+        return digest.hexdigest()
+
+    def _getPath(self, checkoutDir):
+        key = digestlib.sha1(os.path.abspath(checkoutDir)).hexdigest()
+        return os.path.join(self.cacheDir, key)
+
+    def _read(self, checkoutDir):
+        try:
+            entry = json.load(open(self._getPath(checkoutDir)))
+            if entry['dir'] != os.path.abspath(checkoutDir):
+                return None
+            # json hands back unicode strings
+            entry['files'] = dict((str(x), y)
+                                  for x, y in entry['files'].iteritems())
+            entry['status'] = [ [ str(y) for y in x ]
+                                for x in entry['status'] ]
+            return entry
+        except (IOError, OSError, ValueError, KeyError, TypeError,
+                AttributeError):
+            return None
+
+    def _write(self, checkoutDir, snapshot, status):
+        # Failing to write the cache is not fatal; the status is simply
+        # generated again next time.
+        entry = dict(dir=os.path.abspath(checkoutDir),
+                     recorded=snapshot['recorded'], files=snapshot['files'],
+                     status=[ list(x) for x in status ])
+        try:
+            util.mkdirChain(self.cacheDir)
+            f = util.AtomicFile(self._getPath(checkoutDir))
+            f.write(json.dumps(entry))
+            f.commit()
+        except (IOError, OSError):
+            pass
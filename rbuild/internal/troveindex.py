@@ -0,0 +1,232 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Implements a persistent sqlite index of the troves in a repository, so
+that the versions on a branch and the latest troves on a label can be
+listed without asking the repository.
+
+The index of each repository host is brought up to date with the troves
+that changed since the last mark it saw, using the same
+C{getNewTroveList} call that C{conary mirror} uses.  That call needs
+mirror access to the repository; hosts that refuse it are remembered for
+a while and queried directly instead.
+
+Example::
+    from rbuild.internal import troveindex
+    index = troveindex.TroveIndex('~/.rbuild/cache/troves.db')
+    if index.sync(repos, label.getHost()):
+        latest = index.getTroveLatestByLabel(label)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from conary import errors as conaryerrors
+from conary import trove
+from conary import versions
+from conary.deps import deps
+from conary.lib import util
+
+# Seconds before syncing again with a host that refused to sync
+RETRY_TIMEOUT = 24 * 60 * 60
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS Hosts(
+        host        TEXT PRIMARY KEY,
+        mark        TEXT,
+        refused     REAL)""",
+    """CREATE TABLE IF NOT EXISTS Troves(
+        host        TEXT NOT NULL,
+        name        TEXT NOT NULL,
+        version     TEXT NOT NULL,
+        flavor      TEXT NOT NULL,
+        branch      TEXT NOT NULL,
+        label       TEXT NOT NULL,
+        timestamp   REAL NOT NULL,
+        PRIMARY KEY (name, version, flavor))""",
+    """CREATE INDEX IF NOT EXISTS TrovesBranchIdx ON Troves(branch, name)""",
+    """CREATE INDEX IF NOT EXISTS TrovesLabelIdx ON Troves(label)""",
+    ]
+
+
+def iterNewTroves(repos, host, mark):
+    """
+    Page through the troves that changed on C{host} since C{mark}, with
+    the C{getNewTroveList} call that C{conary mirror} uses.
+    @param repos: repository client
+    @param host: repository host name
+    @param mark: repository change mark to start from
+    @type mark: string
+    @return: iterator over C{(troveList, newMark)} pairs, one for each
+    reply, where C{troveList} holds the C{(mark, (name, version, flavor),
+    troveType)} entries of the reply and C{newMark} is the mark to resume
+    from after it
+    @raise conary.errors.InsufficientPermission: if the repository does
+    not allow mirror access
+    """
+    while True:
+        troveList = repos.getNewTroveList(host, mark)
+        if not troveList:
+            return
+        newMark = str(max(float(x[0]) for x in troveList))
+        yield troveList, newMark
+        if newMark == mark:
+            # a single mark fills the whole reply
+            return
+        mark = newMark
+
+
+class TroveIndex(object):
+    """
+    On-disk index of the troves in one or more repositories.
+    @param path: path of the sqlite database, or C{None} to disable the
+    index
+    @type path: string
+    """
+
+    def __init__(self, path):
+        if path is not None:
+            path = os.path.expanduser(path)
+        self.path = path
+        self._db = None
+        # the connection is shared by the threads of one command
+        self._lock = threading.RLock()
+
+    def sync(self, repos, host):
+        """
+        Add the troves that changed on C{host} since the last sync.
+        @param repos: repository client
+        @param host: repository host name
+        @return: whether the index of C{host} is complete and can be used
+        in place of the repository
+        @rtype: bool
+        """
+        if self.path is None:
+            return False
+        self._lock.acquire()
+        try:
+            db = self._getDb()
+            if db is None:
+                return False
+            row = db.execute("SELECT mark, refused FROM Hosts WHERE host = ?",
+                             (host,)).fetchone()
+            mark, refused = row or (None, None)
+            if refused is not None and time.time() - refused < RETRY_TIMEOUT:
+                return False
+            # sqlite hands back unicode strings
+            mark = str(mark or '0')
+            try:
+                self._fetch(db, repos, host, mark)
+            except conaryerrors.InsufficientPermission:
+                # no mirror access; look up troves on this host directly
+                # for a while
+                db.rollback()
+                db.execute("INSERT OR REPLACE INTO Hosts VALUES (?, NULL, ?)",
+                           (host, time.time()))
+                db.commit()
+                return False
+            except Exception:
+                # the troves fetched so far are kept for the next sync
+                db.rollback()
+                return False
+            return True
+        finally:
+            self._lock.release()
+
+    def getTroveVersionsByBranch(self, name, branch):
+        """
+        @return: versions of C{name} on C{branch} and their flavors, in
+        the form returned by the repository call of the same name
+        @rtype: dict
+        """
+        rows = self._query("SELECT name, version, flavor FROM Troves"
+                           " WHERE branch = ? AND name = ?",
+                           (branch.asString(), name))
+        return self._thaw(rows)
+
+    def getTroveLatestByLabel(self, label):
+        """
+        @return: the latest version of every trove on each branch of
+        C{label}, with all of its flavors, in the form returned by the
+        repository call of the same name
+        @rtype: dict
+        """
+        rows = self._query("""
+            SELECT Troves.name, Troves.version, Troves.flavor
+            FROM Troves JOIN (
+                SELECT name, branch, MAX(timestamp) AS latest FROM Troves
+                WHERE label = ? GROUP BY name, branch) AS Latest
+            ON Troves.name = Latest.name AND Troves.branch = Latest.branch
+               AND Troves.timestamp = Latest.latest
+            WHERE Troves.label = ?""",
+            (label.asString(), label.asString()))
+        return self._thaw(rows)
+
+    def _fetch(self, db, repos, host, mark):
+        for troveList, newMark in iterNewTroves(repos, host, mark):
+            for item in troveList:
+                (name, version, flavor), troveType = item[1], item[2]
+                if troveType == trove.TROVE_TYPE_REMOVED:
+                    db.execute("DELETE FROM Troves WHERE name = ? AND"
+                               " version = ? AND flavor = ?",
+                               (name, version.freeze(), flavor.freeze()))
+                    continue
+                branch = version.branch()
+                db.execute(
+                    "INSERT OR REPLACE INTO Troves VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (host, name, version.freeze(), flavor.freeze(),
+                     branch.asString(), branch.label().asString(),
+                     version.trailingRevision().timeStamp))
+            db.execute("INSERT OR REPLACE INTO Hosts VALUES (?, ?, NULL)",
+                       (host, newMark))
+            db.commit()
+
+    def _query(self, sql, args):
+        self._lock.acquire()
+        try:
+            db = self._getDb()
+            return db.execute(sql, args).fetchall()
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _thaw(rows):
+        results = {}
+        for name, version, flavor in rows:
+            # sqlite hands back unicode strings
+            results.setdefault(str(name), {}).setdefault(
+                versions.ThawVersion(str(version)), []).append(
+                deps.ThawFlavor(str(flavor)))
+        return results
+
+    def _getDb(self):
+        if self._db is None:
+            try:
+                util.mkdirChain(os.path.dirname(self.path))
+                db = sqlite3.connect(self.path, timeout=30,
+                                     check_same_thread=False)
+                for statement in SCHEMA:
+                    db.execute(statement)
+                db.commit()
+            except (IOError, OSError, sqlite3.Error):
+                # without a usable database the repository is asked
+                return None
+            self._db = db
+        return self._db
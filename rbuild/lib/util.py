@@ -19,6 +19,11 @@ Generic utility functions that can be used by rbuild or rbuild plugins
 """
 
 from datetime import datetime
+import os
+import Queue
+import sys
+import tempfile
+import threading
 
 from dateutil import parser as dtparser
 from dateutil import tz
@@ -41,3 +46,210 @@ def convertTime(string):
 
     d.replace(tzinfo=tz.tzlocal())
     return datetime.strftime(d, "%Y/%m/%d %H:%M:%S")
+
+
+def unique(items):
+    """Return items without duplicates, keeping the first of each
+
+    :param items: hashable items
+    :rtype: list
+    """
+    seen = set()
+    result = []
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            result.append(item)
+    return result
+
+
+def runConcurrently(func, items, workers=8):
+    """Call func on each of items using a bounded pool of threads
+
+    Exceptions raised by func are returned instead of raised, so that one
+    failure does not stop the remaining items.
+
+    :param func: callable taking one item
+    :param items: items to process
+    :param int workers: maximum number of threads
+    :returns: a (result, exception) pair for each item, in the order of
+        items; exception is None if func returned normally
+    :rtype: list
+    """
+    return list(iterConcurrently(func, items, workers))
+
+
+def iterConcurrently(func, items, workers=8):
+    """Like runConcurrently, but yield each (result, exception) pair as
+    soon as it and every pair before it are available
+
+    Results are yielded in the order of items, so output based on them is
+    stable while the items complete in any order.  Items that have not
+    been started when the caller stops iterating are skipped.
+
+    :param func: callable taking one item
+    :param items: items to process
+    :param int workers: maximum number of threads
+    """
+    items = list(items)
+    results = [None] * len(items)
+    pending = Queue.Queue()
+    for index in range(len(items)):
+        pending.put(index)
+    done = threading.Condition()
+    stopped = []
+
+    def worker():
+        while not stopped:
+            try:
+                index = pending.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                result = (func(items[index]), None)
+            except Exception, err:
+                result = (None, err)
+            done.acquire()
+            try:
+                results[index] = result
+                done.notifyAll()
+            finally:
+                done.release()
+
+    threads = []
+    for _ in range(min(workers, len(items))):
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    try:
+        for index in range(len(items)):
+            done.acquire()
+            try:
+                while results[index] is None:
+                    # wait with a timeout so that KeyboardInterrupt is
+                    # still delivered
+                    done.wait(1)
+                result = results[index]
+            finally:
+                done.release()
+            yield result
+    finally:
+        # let the items already started finish
+        stopped.append(True)
+        for thread in threads:
+            while thread.isAlive():
+                thread.join(1)
+
+
+def iterForked(func, items, workers=4):
+    """Call func on each of items in a bounded pool of forked processes,
+    yielding an (output, error) pair for each item
+
+    Each call runs in a child process of its own with its stdout and
+    stderr captured, so calls which change process-wide state, such as
+    the output streams, cannot affect each other or the caller.  Pairs
+    are yielded in the order of items.  output is everything the call
+    wrote; error is None, or a message if the call failed.  Once a call
+    has failed no further calls are started, and iteration ends after
+    the calls already started are done.
+
+    :param func: callable taking one item; its return value is discarded
+    :param items: items to process
+    :param int workers: maximum number of processes running at once
+    """
+    items = list(items)
+    results = {}
+    running = {}
+    started = 0
+    failed = False
+    try:
+        for index in range(len(items)):
+            while index not in results:
+                if (started < len(items) and len(running) < workers
+                        and not failed):
+                    pid, fds = _forkCall(func, items[started])
+                    running[pid] = (started,) + fds
+                    started += 1
+                    continue
+                if not running:
+                    return
+                pid, status = os.wait()
+                if pid not in running:
+                    continue
+                done, outFd, errorFd = running.pop(pid)
+                results[done] = _collectCall(status, outFd, errorFd)
+                if results[done][1] is not None:
+                    failed = True
+            yield results.pop(index)
+    finally:
+        # do not leave children behind, even if the caller stops early
+        for pid, (_, outFd, errorFd) in running.items():
+            os.waitpid(pid, 0)
+            os.close(outFd)
+            os.close(errorFd)
+
+
+def _forkCall(func, item):
+    """Start func(item) in a child process for iterForked
+
+    :returns: pid of the child, and the file descriptors of its output
+        and error message
+    """
+    outFd, errorFd = _tempFd(), _tempFd()
+    # output still buffered would otherwise be written by the child too
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid:
+        return pid, (outFd, errorFd)
+    status = 1
+    try:
+        try:
+            os.dup2(outFd, 1)
+            os.dup2(outFd, 2)
+            # unbuffered and appending, so that writes through sys.stdout
+            # and those made directly to the file descriptors keep their
+            # order
+            sys.stdout = sys.stderr = os.fdopen(os.dup(outFd), 'a', 0)
+            func(item)
+            status = 0
+        except Exception, err:
+            os.write(errorFd, str(err) or err.__class__.__name__)
+    finally:
+        os._exit(status)
+
+
+def _collectCall(status, outFd, errorFd):
+    """Read what a child started by _forkCall left behind
+
+    :returns: (output, error) pair as yielded by iterForked
+    """
+    output, error = _readFd(outFd), _readFd(errorFd)
+    if not status:
+        return output, None
+    if not error:
+        if os.WIFSIGNALED(status):
+            error = 'Process killed by signal %d' % os.WTERMSIG(status)
+        else:
+            error = 'Process exited with status %d' % os.WEXITSTATUS(status)
+    return output, error
+
+
+def _tempFd():
+    fd, path = tempfile.mkstemp(prefix='rbuild-')
+    os.unlink(path)
+    return fd
+
+
+def _readFd(fd):
+    try:
+        os.lseek(fd, 0, 0)
+        data = []
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return ''.join(data)
+            data.append(chunk)
+    finally:
+        os.close(fd)
@@ -16,8 +16,8 @@
 
 
 """
-command module.  Provides BaseCommand and CommandWithSubCommands superclasses
-for use by plugins.
+command module.  Provides BaseCommand, CommandWithSubCommands, ListCommand
+and BulkCommand superclasses for use by plugins.
 
 @var NO_PARAM: Command-line argument which takes no parameters; a flag
 in the form C{--flag}
@@ -38,10 +38,13 @@ any help messages
 from conary.lib import command
 from conary.lib import log
 from conary.lib import options
+import itertools
 import optparse
+import Queue
 import sys
 
 from rbuild import errors
+from rbuild.lib import util
 
 
 (NO_PARAM,  ONE_PARAM)  = (options.NO_PARAM, options.ONE_PARAM)
@@ -66,6 +69,9 @@ class BaseCommand(command.AbstractCommand):
                                     "Display more detailed information where"
                                     " available"),
             'stage'              : (VERBOSE_HELP, "Specify the stage to use"),
+            'no-cache'           : (VERBOSE_HELP,
+                                    "Fetch rBuilder data from the server"
+                                    " instead of the local cache"),
             'lsprof'             : SUPPRESS_HELP,
             }
 
@@ -93,6 +99,7 @@ class BaseCommand(command.AbstractCommand):
         d["quiet"] = NO_PARAM
         d["stage"] = ONE_PARAM
         d["lsprof"] = NO_PARAM
+        d["no-cache"] = NO_PARAM
         argDef[self.defaultGroup] = d
         self.addLocalParameters(argDef)
 
@@ -133,6 +140,8 @@ class BaseCommand(command.AbstractCommand):
         command.AbstractCommand.processConfigOptions(self, rbuildConfig,
                                                      cfgMap, argSet)
         rbuildConfig.quiet = argSet.get('quiet', False)
+        if argSet.get('no-cache', False):
+            rbuildConfig.useCache = False
         if argSet.get('verbose', False):
             log.setVerbosity(log.DEBUG)
         self.processLocalConfigOptions(rbuildConfig, argSet)
@@ -282,6 +291,35 @@ class CommandWithSubCommands(BaseCommand):
         return errNo
 
 
+class _ClientPool(object):
+    """
+    REST clients for worker threads.  An robj client holds a single
+    connection and is not thread-safe, so each concurrent call borrows a
+    client of its own, connected through the rBuilder facade when none is
+    free, and acts on a copy of its resource fetched by URL on that
+    client.
+    @param handle: rbuild handle
+    """
+
+    def __init__(self, handle):
+        self._handle = handle
+        self._clients = Queue.Queue()
+
+    def call(self, func, resource):
+        """
+        @return: C{func(copy)}, where C{copy} is C{resource} as fetched
+        on a borrowed client
+        """
+        try:
+            client = self._clients.get_nowait()
+        except Queue.Empty:
+            client = self._handle.facade.rbuilder._newClient()
+        try:
+            return func(client.do_GET(resource.id))
+        finally:
+            self._clients.put(client)
+
+
 class ListCommand(BaseCommand):
     """
         Inherit for commands/sub-commands that lists or show things. Must
@@ -294,6 +332,12 @@ class ListCommand(BaseCommand):
 
         Optional:
             showFieldMap: dictionary mapping fields to display options
+            paged: the plugin's list method accepts page_size and limit
+                keyword arguments and returns resources as they are fetched,
+                defaults to False
+            workers: number of resources whose full view is fetched at
+                once, each on a REST client of its own, when the listing
+                lacks a displayed field, defaults to 8
 
         Display options:
             display_name: alternative name to display for field, defaults to
@@ -317,13 +361,41 @@ class ListCommand(BaseCommand):
     """
     paramHelp = '[options] [id]*'
     listFieldMap = dict()
+    paged = False
+    defaultPageSize = 100
+    workers = 8
+
+    docs = {'limit': 'Show at most this many results',
+            'page-size': 'Fetch results from rBuilder in pages of this size',
+            }
+
+    def addLocalParameters(self, argDef):
+        argDef['limit'] = ONE_PARAM
+        argDef['page-size'] = ONE_PARAM
 
     def runCommand(self, handle, argSet, args):
         _, idList = self.requireParameters(args, allowExtra=True)
         if idList:
             self._show(handle, idList)
         else:
-            self._list(handle)
+            self._list(handle, **self._getPagingOptions(argSet))
+
+    def _getPagingOptions(self, argSet):
+        """
+        Convert the C{--limit} and C{--page-size} options to the keyword
+        arguments accepted by C{_list}.
+        """
+        pagingOptions = {}
+        for option, keyword in (('limit', 'limit'),
+                                ('page-size', 'page_size')):
+            value = argSet.pop(option, None)
+            if value is None:
+                continue
+            if not value.isdigit() or int(value) < 1:
+                raise errors.BadParameterError(
+                    "--%s must be a positive integer" % option)
+            pagingOptions[keyword] = int(value)
+        return pagingOptions
 
     def _fieldNameToDisplayName(self, field, mapping):
             fdict = mapping.get(field, dict())
@@ -334,12 +406,54 @@ class ListCommand(BaseCommand):
                     w[0].upper() + w[1:] for w in field.split('_'))
             return display_name.upper()
 
-    def _getResourceData(self, resource, fields, mapping, row_major=True):
+    def _getAccessors(self, fields, mapping):
+        """
+        Return a C{(field, accessor)} pair for each field that is displayed.
+        """
+        accessors = []
         for field in fields:
             fdict = mapping.get(field, dict())
             if fdict.get('hidden', False) or fdict.get('verbose', False):
                 continue
-            accessor = fdict.get('accessor', lambda i: getattr(i, field))
+            accessors.append((field, fdict.get('accessor',
+                lambda i, field=field: getattr(i, field))))
+        return accessors
+
+    def _loadDetails(self, resources, accessors, clients):
+        """
+        Fetch, concurrently, the full view of the resources in
+        C{resources} which lack any of the displayed fields, so that they
+        are not refreshed one at a time as their rows are written.  The
+        views are fetched on the clients of C{clients}, not on the client
+        shared with the rest of the command.
+        @param clients: clients for the worker threads
+        @type clients: _ClientPool
+        @return: C{resources}, with the full views in place of those
+        which lacked a field
+        @rtype: list
+        """
+        def incomplete(resource):
+            for _, accessor in accessors:
+                try:
+                    accessor(resource)
+                except AttributeError:
+                    return True
+            return False
+
+        resources = list(resources)
+        stale = [x for x in range(len(resources))
+                 if incomplete(resources[x])]
+        results = util.runConcurrently(
+            lambda index: clients.call(lambda copy: copy, resources[index]),
+            stale, self.workers)
+        for index, (resource, error) in zip(stale, results):
+            if error is not None:
+                raise error
+            resources[index] = resource
+        return resources
+
+    def _getResourceData(self, resource, fields, mapping, row_major=True):
+        for field, accessor in self._getAccessors(fields, mapping):
             try:
                 value = accessor(resource)
             except AttributeError:
@@ -354,17 +468,39 @@ class ListCommand(BaseCommand):
                 display_name = self._fieldNameToDisplayName(field, mapping)
                 yield (display_name, value)
 
+    def _iterResourceData(self, handle, resources, pageSize):
+        # work a page at a time so that the resources of each page which
+        # need their full view are fetched together
+        accessors = self._getAccessors(self.listFields, self.listFieldMap)
+        clients = _ClientPool(handle)
+        resources = iter(resources)
+        while True:
+            page = list(itertools.islice(resources, pageSize))
+            if not page:
+                return
+            page = self._loadDetails(page, accessors, clients)
+            for resource in page:
+                yield tuple(self._getResourceData(
+                    resource, self.listFields, self.listFieldMap))
+
     def _list(self, handle, *args, **kwargs):
         headers = tuple(self._fieldNameToDisplayName(field, self.listFieldMap)
                         for field in self.listFields)
 
+        limit = kwargs.pop('limit', None)
+        pageSize = kwargs.pop('page_size', None) or self.defaultPageSize
+        if self.paged:
+            kwargs['page_size'] = pageSize
+            if limit is not None:
+                kwargs['limit'] = limit
+
         resources = handle.getPlugin(self.resource).list(*args, **kwargs)
         if resources:
-            data = []
-            for resource in resources:
-                data.append(tuple(self._getResourceData(
-                    resource, self.listFields, self.listFieldMap)))
-            handle.ui.writeTable(data, headers)
+            # rows are written as they are produced, so a paged listing
+            # starts printing after the first page instead of the last
+            data = self._iterResourceData(handle,
+                itertools.islice(resources, limit), pageSize)
+            handle.ui.writeTable(data, headers, sampleSize=pageSize)
         else:
             handle.ui.warning('No %s found' % self.resource)
         return resources
@@ -391,3 +527,106 @@ class ListCommand(BaseCommand):
                 handle.ui.warning(
                     "No %s found with id '%s'", self.resource, resourceId)
 
+
+
+class BulkCommand(BaseCommand):
+    """
+        Inherit for commands that apply one action, such as delete, to
+        every resource named on the command line. The resources are looked
+        up in batches, the user is asked once to confirm, the action runs
+        on a bounded pool of threads, and the outcome for each resource is
+        reported when all of them are done. Each thread acts on a copy of
+        its resource fetched on a REST client of its own.
+
+        Required:
+            noun: name of one resource, used in messages. Eg. 'image'
+            _resolve(handle, ids): return the resources for a batch of ids,
+                warning about ids that do not match anything
+            _execute(handle, resource): apply the action to one resource
+
+        Optional:
+            action: verb used in messages, defaults to 'delete'
+            done: past tense of action, defaults to 'Deleted'
+            confirm: ask before acting unless --force is given, defaults
+                to True
+            batchSize: number of ids looked up at once, defaults to 100
+            workers: number of resources acted on at once, defaults to 8;
+                with 1, the action is applied to the resources themselves
+
+        Subclasses call C{_runBulk(handle, ids, force)} from C{runCommand}.
+    """
+    action = 'delete'
+    done = 'Deleted'
+    confirm = True
+    batchSize = 100
+    workers = 8
+
+    docs = {'force': 'Do not ask for confirmation',
+            }
+
+    def addLocalParameters(self, argDef):
+        if self.confirm:
+            argDef['force'] = '-f', NO_PARAM
+
+    def _resolve(self, handle, ids):
+        raise NotImplementedError
+
+    def _execute(self, handle, resource):
+        raise NotImplementedError
+
+    def _describe(self, resource):
+        return resource.name
+
+    def _runBulk(self, handle, ids, force=False):
+        """
+        Apply the action to the resources matching C{ids}.
+        @return: a (resource, result) tuple for each resource acted on
+        @rtype: list
+        @raise errors.PluginError: if the action failed for any resource;
+        the outcome for every resource is reported first
+        """
+        ids = util.unique(ids)
+        resources = []
+        for start in range(0, len(ids), self.batchSize):
+            resources.extend(
+                self._resolve(handle, ids[start:start + self.batchSize]))
+        if not resources or not self._confirm(handle, resources, force):
+            return []
+
+        results = [(resource, ) + result for resource, result in
+                   zip(resources, self._executeAll(handle, resources))]
+        self._report(handle, results)
+        failed = len([x for x in results if x[2] is not None])
+        if failed:
+            raise errors.PluginError('Unable to %s %ss: %d of %d failed'
+                % (self.action, self.noun, failed, len(results)))
+        return [(resource, result) for resource, result, _ in results]
+
+    def _confirm(self, handle, resources, force):
+        if force or not self.confirm:
+            return True
+        names = ', '.join(self._describe(x) for x in resources)
+        if len(resources) > 1:
+            names = '%d %ss: %s' % (len(resources), self.noun, names)
+        return handle.ui.getYn(
+            '%s %s?' % (self.action.capitalize(), names), default=False)
+
+    def _executeAll(self, handle, resources):
+        if self.workers < 2:
+            return util.runConcurrently(
+                lambda resource: self._execute(handle, resource),
+                resources, 1)
+        clients = _ClientPool(handle)
+        return util.runConcurrently(
+            lambda resource: clients.call(
+                lambda copy: self._execute(handle, copy), resource),
+            resources, self.workers)
+
+    def _report(self, handle, results):
+        for resource, _, error in results:
+            if error is None:
+                handle.ui.info("%s %s '%s'", self.done, self.noun,
+                               self._describe(resource))
+            else:
+                handle.ui.warning("Unable to %s %s '%s': %s", self.action,
+                                  self.noun, self._describe(resource), error)
@@ -15,8 +15,6 @@
 #
 
 
-from rpath_proddef import api1 as proddef
-
 from rbuild import errors
 from rbuild.internal.internal_types import WeakReference
 
@@ -37,7 +35,16 @@ class ProductStore(object):
     # Transparently weak-reference our handle so no dependency loop is
     # created.
     _handle = WeakReference()
-    proddef = proddef
+
+    @property
+    def proddef(self):
+        """
+        The C{rpath_proddef.api1} module.  It is imported on first use,
+        from L{getProduct} or when a plugin needs its classes, since
+        loading it is expensive and most commands never do.
+        """
+        from rpath_proddef import api1
+        return api1
 
     def __init__(self, handle=None):
         self._handle = handle
@@ -206,6 +213,18 @@ class ProductStore(object):
             jobIds = [jobIds]
         self.setStatus('imageJobIds', jobIds)
 
+    def getIdCachePath(self):
+        raise errors.IncompleteInterfaceError(
+            'rBuilder ID cache unsupported for this configuration')
+
+    def getStatCachePath(self):
+        raise errors.IncompleteInterfaceError(
+            'checkout status cache unsupported for this configuration')
+
+    def getLabelSnapshotPath(self, stageName=None):
+        raise errors.IncompleteInterfaceError(
+            'label snapshots unsupported for this configuration')
+
     def getStatus(self, key):
         raise errors.IncompleteInterfaceError(
             'rBuild status storage unsupported for this configuration')
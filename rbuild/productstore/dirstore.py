@@ -15,10 +15,14 @@
 #
 
 
+import json
 import os
+import time
 
 from conary.lib import cfg
 from conary.lib import cfgtypes
+from conary.lib import digestlib
+from conary.lib import util
 
 from rbuild import errors
 from rbuild.productstore.abstract import ProductStore
@@ -101,6 +105,7 @@ class CheckoutProductStore(ProductStore):
             # Cannot load product yet, so cannot validate
             self._currentStage = stageName
         self.statusStore = None            
+        self._packageIndex = None
 
     def getBaseDirectory(self):
         return self._baseDirectory
@@ -111,11 +116,47 @@ class CheckoutProductStore(ProductStore):
         return path
 
     def getProduct(self):
+        """
+        Get the product definition.  The version of the product definition
+        source trove is kept in C{.rbuild/productcache} while the product
+        definition checkout state is unchanged, so that loading the product
+        does not need a repository client.
+
+        The XML itself is parsed on every call; the handle keeps the
+        result for the rest of the command.  Only a pickle could store
+        the parsed object, and unpickling a file from the checkout could
+        run arbitrary code.
+        """
         path = self.getProductDefinitionXmlPath()
         pdef = self.proddef.ProductDefinition(fromStream=open(path))
-        pdef._sourceTrove = self._getSourceTroveVersion()
+        pdef._sourceTrove = self._getCachedSourceTroveVersion()
         return pdef
 
+    def _getCachedSourceTroveVersion(self):
+        statePath = self.getProductDefinitionDirectory() + '/CONARY'
+        try:
+            cacheKey = digestlib.sha1(open(statePath).read()).hexdigest()
+        except IOError:
+            return self._getSourceTroveVersion()
+        cachePath = self._baseDirectory + '/.rbuild/productcache'
+        try:
+            data = json.load(open(cachePath))
+            if data['key'] == cacheKey:
+                return str(data['sourceTrove'])
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            # an unreadable cache just means reading the state again
+            pass
+
+        sourceTrove = self._getSourceTroveVersion()
+        try:
+            f = util.AtomicFile(cachePath)
+            f.write(json.dumps(dict(key=cacheKey, sourceTrove=sourceTrove)))
+            f.commit()
+        except (IOError, OSError):
+            # failing to write the cache is not fatal
+            pass
+        return sourceTrove
+
     def _getSourceTroveVersion(self):
         return self._handle.facade.conary._getRepositoryStateFromDirectory(self.getProductDefinitionDirectory())[1].getNameVersionFlavor().asString()
 
@@ -226,16 +267,12 @@ class CheckoutProductStore(ProductStore):
         conaryFacade = self._handle.facade.conary
         stageDir = self.getStageDirectory(stageName)
         if stageDir is not None:
-            for dirName in os.listdir(stageDir):
-                packageDir = '%s/%s' % (stageDir, dirName)
-                if os.path.exists(packageDir + '/CONARY'):
-                    packageName = conaryFacade.getNameForCheckout(packageDir)
-                    recipePath = '%s/%s.recipe' % (packageDir,
-                                                   packageName)
-                    if conaryFacade.isGroupName(packageName):
-                        groupDict[packageName] = recipePath
-                    else:
-                        packageDict[packageName] =  recipePath
+            for packageDir, packageName in self._getCheckoutNames(stageDir):
+                recipePath = '%s/%s.recipe' % (packageDir, packageName)
+                if conaryFacade.isGroupName(packageName):
+                    groupDict[packageName] = recipePath
+                else:
+                    packageDict[packageName] =  recipePath
         return packageDict, groupDict
 
     def getPackagePath(self, packageName, stageName=None):
@@ -251,16 +288,28 @@ class CheckoutProductStore(ProductStore):
         found.
         @rtype: string
         """
-        conaryFacade = self._handle.facade.conary
         stageDir = self.getStageDirectory(stageName)
         if stageDir is not None:
-            for dirName in os.listdir(stageDir):
-                packageDir = '%s/%s' % (stageDir, dirName)
-                if os.path.exists(packageDir + '/CONARY'):
-                    if packageName == \
-                        conaryFacade.getNameForCheckout(packageDir):
-                        return packageDir
-        return None                        
+            for packageDir, name in self._getCheckoutNames(stageDir):
+                if name == packageName:
+                    return packageDir
+        return None
+
+    def _getCheckoutNames(self, stageDir):
+        """
+        List the checkouts in a stage directory along with the name of
+        the package checked out in each, using the package index to
+        avoid reading the CONARY file of every checkout.
+        @param stageDir: stage directory
+        @type stageDir: string
+        @return: C{(packageDir, packageName)} tuples
+        @rtype: list
+        """
+        if self._packageIndex is None:
+            self._packageIndex = _PackageIndex(self._baseDirectory
+                    + '/.rbuild/packageindex')
+        return self._packageIndex.getCheckoutNames(stageDir,
+                self._handle.facade.conary.getNameForCheckout)
 
     def getRbuildConfigData(self):
         return file(self.getRbuildConfigPath()).read()
@@ -274,6 +323,17 @@ class CheckoutProductStore(ProductStore):
     def getRmakeConfigPath(self):
         return self.getProductDefinitionDirectory() + '/rmakerc'
 
+    def getIdCachePath(self):
+        return self._baseDirectory + '/.rbuild/idcache'
+
+    def getStatCachePath(self):
+        return self._baseDirectory + '/.rbuild/statcache'
+
+    def getLabelSnapshotPath(self, stageName=None):
+        if stageName is None:
+            stageName = self.getActiveStageName()
+        return self._baseDirectory + '/.rbuild/labelsnapshots/' + stageName
+
     def getStatus(self, key):
         return self._getStatusStore()[key]
 
@@ -326,3 +386,93 @@ class _FileStatusStore(cfg.ConfigFile):
     def __setitem__(self, key, value):
 
         cfg.ConfigFile.__setitem__(self, key, value)
+
+
+class _PackageIndex(object):
+    """
+    Index of the package checked out in each directory of the stages of
+    a product checkout, stored as JSON.  The listing of a stage directory
+    is reused while the mtime of the stage directory is unchanged, and
+    the package name of a checkout while the inode, size and mtime of
+    its CONARY file are unchanged.  A file modified in the second it was
+    indexed could be modified again without changing its mtime, so it is
+    not indexed until later.
+    """
+
+    def __init__(self, indexFile):
+        self._indexFile = indexFile
+        self._stages = None
+
+    def getCheckoutNames(self, stageDir, getNameForCheckout):
+        """
+        @param getNameForCheckout: function returning the package name
+        for a checkout directory that is not indexed
+        @return: C{(packageDir, packageName)} tuples, sorted by directory
+        @rtype: list
+        """
+        stages = self._getStages()
+        now = int(time.time())
+        entry = stages.get(stageDir, {})
+        checkouts = entry.get('checkouts', {})
+        changed = False
+        stageMtime = os.stat(stageDir).st_mtime
+        if entry.get('mtime') == stageMtime:
+            dirNames = entry['dirNames']
+        else:
+            dirNames = sorted(os.listdir(stageDir))
+            if int(stageMtime) >= now:
+                stageMtime = None
+            entry = dict(mtime=stageMtime, dirNames=dirNames)
+            changed = True
+
+        newCheckouts = {}
+        result = []
+        for dirName in dirNames:
+            packageDir = '%s/%s' % (stageDir, dirName)
+            try:
+                sb = os.stat(packageDir + '/CONARY')
+            except OSError:
+                continue
+            key = [sb.st_ino, sb.st_size, sb.st_mtime]
+            if dirName in checkouts and checkouts[dirName][0] == key:
+                packageName = checkouts[dirName][1]
+            else:
+                packageName = getNameForCheckout(packageDir)
+            if int(sb.st_mtime) < now:
+                newCheckouts[dirName] = [key, packageName]
+            result.append((packageDir, packageName))
+        if newCheckouts != checkouts:
+            changed = True
+
+        if changed:
+            entry['checkouts'] = newCheckouts
+            stages[stageDir] = entry
+            self._write()
+        return result
+
+    def _getStages(self):
+        if self._stages is None:
+            try:
+                stages = json.load(open(self._indexFile))
+                # json hands back unicode strings
+                self._stages = dict(
+                    (str(stageDir), dict(mtime=x['mtime'],
+                        dirNames=[ str(y) for y in x['dirNames'] ],
+                        checkouts=dict((str(y), [z[0], str(z[1])])
+                                       for y, z in x['checkouts'].items())))
+                    for stageDir, x in stages.items())
+            except (IOError, OSError, ValueError, KeyError, TypeError,
+                    AttributeError, IndexError):
+                self._stages = {}
+        return self._stages
+
+    def _write(self):
+        # Failing to write the index is not fatal; the CONARY files are
+        # simply read again next time.
+        try:
+            util.mkdirChain(os.path.dirname(self._indexFile))
+            f = util.AtomicFile(self._indexFile)
+            f.write(json.dumps(self._stages))
+            f.commit()
+        except (IOError, OSError):
+            pass
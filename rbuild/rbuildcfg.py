@@ -24,7 +24,8 @@ import re
 
 from conary.lib import cfg
 from conary.lib import util
-from conary.lib.cfgtypes import CfgString, CfgPathList, CfgBool
+from conary.lib.cfgtypes import (CfgString, CfgPath, CfgPathList, CfgBool,
+                                 CfgDict, CfgInt)
 from conary.conarycfg import (CfgRepoMap, CfgFingerPrint, CfgFingerPrintMap,
                               CfgUserInfo)
 
@@ -81,6 +82,10 @@ class RbuildConfiguration(cfg.SectionedConfigFile):
     quiet                = (CfgBool, False)
     signatureKey         = CfgFingerPrint
     signatureKeyMap      = CfgFingerPrintMap
+    cacheDirectory       = (CfgPath, '~/.rbuild/cache')
+    cacheTimeouts        = CfgDict(CfgInt)
+    useCache             = (CfgBool, True)
+    jobTimeout           = (CfgInt, 0)
 
     recipeTemplate        =  (CfgString, 'default')
     groupTemplate         =  (CfgString, 'groupSet')
@@ -20,6 +20,7 @@ User interface module for rbuild.
 """
 import getpass
 import fcntl
+import itertools
 import os
 import struct
 import sys
@@ -433,28 +434,37 @@ class UserInterface(object):
             else:
                 self.progress(msg, *args)
 
-    def writeTable(self, rows, headers=None, padded=True):
+    def writeTable(self, rows, headers=None, padded=True, sampleSize=None):
         '''
         Writes a table; used to display data that is best displayed in rows and
         columns. If 'headers' is not provided, then we assume the first row is
         the header. Regardless, only the columns listed in the header will be
         displayed, any other elements in the rows will be ignored.
 
+        If C{sampleSize} is given, C{rows} may be any iterable, and rows are
+        written as they are produced instead of after all of them have been
+        read. Only the first C{sampleSize} rows are used to compute the
+        padding, so later rows with longer elements may not line up.
+
         @param rows: the data to be displayed
         @type rows: list of tuples
         @param headers: table headers
         @type headers: tuple of strings
         @param padded: pad each row element so columns are aligned
         @type padded: bool
+        @param sampleSize: number of rows used to compute the padding
+        @type sampleSize: int
         '''
+        rows = iter(rows)
         if headers is None:
-            headers = rows.pop(0)
+            headers = rows.next()
+        sample = list(itertools.islice(rows, sampleSize))
 
         columns = len(headers)
         padding = [''] * (columns - 1)
         if padded:
             padding = [len(h) for h in headers[:-1]]
-            for row in rows:
+            for row in sample:
                 for idx, elem in enumerate(row[:columns - 1]):
                     padding[idx] = max(padding[idx], len(elem))
 
@@ -467,11 +477,14 @@ class UserInterface(object):
         self.outStream.write('%s\n' % output)
         self._log(output)
 
-        for row in rows:
+        for count, row in enumerate(itertools.chain(sample, rows)):
             if len(row) < columns:
                 # extend row with empty strings
                 row = row + ('',) * (columns - len(row))
             output = format_string.format(*row[:columns])
             self.outStream.write('%s\n' % output)
             self._log(output)
+            if sampleSize and count % sampleSize == sampleSize - 1:
+                # show streamed rows as they arrive
+                self.outStream.flush()
         self.outStream.flush()
@@ -18,9 +18,11 @@
 
 
 from rbuild_test import rbuildhelp
+from testutils import mock
 
 from conary.lib import log
 
+from rbuild import errors
 from rbuild.pluginapi import command
 from rbuild.internal import main
 from rbuild.internal import helpcommand
@@ -32,7 +34,7 @@ class BaseCommandTest(rbuildhelp.RbuildHelper):
         d = {}
         cmd.addParameters(d)
         self.assertEquals(set(d['Common Options']),
-            set(['config', 'config-file', 'lsprof', 'quiet', 
+            set(['config', 'config-file', 'lsprof', 'no-cache', 'quiet',
             'skip-default-config', 'stage', 'verbose']))
 
     def testProcessConfigOptions(self):
@@ -44,6 +46,10 @@ class BaseCommandTest(rbuildhelp.RbuildHelper):
                                   'verbose' : True })
         self.assertEquals(self.rbuildCfg.user, ('newuser', None))
         self.assertEquals(log.getVerbosity(), log.DEBUG)
+        self.assertEquals(self.rbuildCfg.useCache, True)
+
+        cmd.processConfigOptions(self.rbuildCfg, {}, {'no-cache' : True})
+        self.assertEquals(self.rbuildCfg.useCache, False)
 
     def testRunCommand(self):
         cmd = command.BaseCommand()
@@ -260,3 +266,218 @@ general documentation about sub command
             helpCommand.runCommand, None, {}, ['rbuild', 'help', 'main'])
         self.assertEquals(txt, mainCommandUsage)
 
+
+
+class ListCommandTest(rbuildhelp.RbuildHelper):
+    def genCommand(self, paged):
+        class FooListCommand(command.ListCommand):
+            resource = 'foos'
+            listFields = ('name',)
+        FooListCommand.paged = paged
+        return FooListCommand
+
+    def _foos(self, *names):
+        foos = []
+        for name in names:
+            foo = mock.MockObject()
+            foo._mock.set(name=name)
+            foos.append(foo)
+        return foos
+
+    def testPagingOptions(self):
+        cmd = self.genCommand(False)()
+        argDef = {}
+        cmd.addLocalParameters(argDef)
+        self.assertEquals(sorted(argDef), ['limit', 'page-size'])
+
+        self.assertEquals(cmd._getPagingOptions({}), {})
+        self.assertEquals(
+            cmd._getPagingOptions({'limit': '5', 'page-size': '20'}),
+            {'limit': 5, 'page_size': 20})
+        for value in ('0', '-1', 'all'):
+            err = self.assertRaises(errors.BadParameterError,
+                cmd._getPagingOptions, {'limit': value})
+            self.assertIn('--limit', str(err))
+
+    def testList(self):
+        handle = mock.MockObject()
+        plugin = handle.getPlugin('foos')
+        plugin.list._mock.setDefaultReturn(self._foos('a', 'b', 'c'))
+
+        cmd = self.genCommand(False)()
+        cmd.runCommand(handle, {'limit': '2'}, ['rbuild', 'list', 'foos'])
+        # unpaged plugins are not given paging arguments; the limit is
+        # applied locally
+        plugin.list._mock.assertCalled()
+        rows, headers = handle.ui.writeTable._mock.calls[-1][0]
+        self.assertEquals(headers, ('NAME',))
+        self.assertEquals(list(rows), [('a',), ('b',)])
+
+        cmd = self.genCommand(True)()
+        cmd.runCommand(handle, {'limit': '2'}, ['rbuild', 'list', 'foos'])
+        plugin.list._mock.assertCalled(limit=2, page_size=100)
+        cmd.runCommand(handle, {'page-size': '10'}, ['rbuild', 'list', 'foos'])
+        plugin.list._mock.assertCalled(page_size=10)
+        self.assertEquals(
+            handle.ui.writeTable._mock.calls[-1][1], (('sampleSize', 10),))
+
+        plugin.list._mock.setDefaultReturn([])
+        cmd.runCommand(handle, {}, ['rbuild', 'list', 'foos'])
+        handle.ui.warning._mock.assertCalled('No foos found')
+
+    def testListLoadsDetails(self):
+        class Foo(object):
+            def __init__(self, name, summary=False):
+                self._name = name
+                self.summary = summary
+                self.id = 'http://localhost/foos/' + name
+
+            @property
+            def name(self):
+                if self.summary:
+                    raise AttributeError('name')
+                return self._name
+
+            def refresh(self):
+                raise AssertionError('refreshed on the shared client')
+
+        foos = [Foo('a'), Foo('b', True), Foo('c', True)]
+        handle = mock.MockObject()
+        handle.getPlugin('foos').list._mock.setDefaultReturn(foos)
+        fetched = []
+        class Client(object):
+            def do_GET(self, uri):
+                fetched.append(uri)
+                return Foo(uri.rsplit('/', 1)[-1])
+        handle.facade.rbuilder._mock.set(_newClient=Client)
+
+        cmd = self.genCommand(False)()
+        cmd.runCommand(handle, {'page-size': '2'}, ['rbuild', 'list', 'foos'])
+        rows = handle.ui.writeTable._mock.calls[-1][0][0]
+        self.assertEquals(list(rows), [('a',), ('b',), ('c',)])
+        # only summaries lacking a displayed field are fetched again, once
+        # each, on the clients of the worker threads
+        self.assertEquals(fetched, [foos[1].id, foos[2].id])
+
+
+class BulkCommandTest(rbuildhelp.RbuildHelper):
+    def genCommand(self):
+        class DeleteFoosCommand(command.BulkCommand):
+            noun = 'foo'
+            batchSize = 2
+            workers = 2
+
+            def runCommand(self, handle, argSet, args):
+                return self._runBulk(handle, args[3:],
+                                     argSet.pop('force', False))
+
+            def _resolve(self, handle, ids):
+                return handle.getPlugin('foos').find(ids)
+
+            def _execute(self, handle, foo):
+                if foo.name == 'bad':
+                    raise errors.PluginError('in use')
+                return foo.name.upper()
+        return DeleteFoosCommand
+
+    def _foos(self, *names):
+        return [mock.MockObject(name=x, id='http://localhost/foos/' + x)
+                for x in names]
+
+    def _mockClients(self, handle, foos):
+        """
+        Serve C{foos} by URL on REST clients made by the rBuilder facade.
+        @return: the clients made so far
+        """
+        clients = []
+        class Client(object):
+            def __init__(self):
+                self.fetched = []
+
+            def do_GET(self, uri):
+                self.fetched.append(uri)
+                return [x for x in foos if x.id == uri][0]
+
+        def newClient():
+            clients.append(Client())
+            return clients[-1]
+        handle.facade.rbuilder._mock.set(_newClient=newClient)
+        return clients
+
+    def testRunBulk(self):
+        handle = mock.MockObject()
+        plugin = handle.getPlugin('foos')
+        a, b, bad = self._foos('a', 'b', 'bad')
+        self._mockClients(handle, [a, b, bad])
+        plugin.find._mock.setReturn([a, b], ['a', 'b'])
+        plugin.find._mock.setReturn([bad], ['bad'])
+        handle.ui.getYn._mock.setDefaultReturn(True)
+
+        cmd = self.genCommand()()
+        argDef = {}
+        cmd.addLocalParameters(argDef)
+        self.assertEquals(argDef.keys(), ['force'])
+
+        results = cmd.runCommand(handle, {},
+            ['rbuild', 'delete', 'foos', 'a', 'b', 'a'])
+        handle.ui.getYn._mock.assertCalled('Delete 2 foos: a, b?',
+                                           default=False)
+        self.assertEquals([(x[0].name, x[1]) for x in results],
+                          [('a', 'A'), ('b', 'B')])
+
+        # failures are reported with the rest, then fail the command
+        err = self.assertRaises(errors.PluginError, cmd.runCommand, handle,
+            {}, ['rbuild', 'delete', 'foos', 'a', 'b', 'a', 'bad'])
+        self.assertEquals(str(err), 'Unable to delete foos: 1 of 3 failed')
+        # ids are looked up in batches and confirmed once
+        plugin.find._mock.assertCalled(['a', 'b'])
+        plugin.find._mock.assertCalled(['a', 'b'])
+        plugin.find._mock.assertCalled(['bad'])
+        handle.ui.getYn._mock.assertCalled('Delete 3 foos: a, b, bad?',
+                                           default=False)
+        for _ in range(2):
+            handle.ui.info._mock.assertCalled("%s %s '%s'", 'Deleted', 'foo',
+                                              'a')
+            handle.ui.info._mock.assertCalled("%s %s '%s'", 'Deleted', 'foo',
+                                              'b')
+        warning = handle.ui.warning._mock.popCall()[0]
+        self.assertEquals(warning[:4],
+            ("Unable to %s %s '%s': %s", 'delete', 'foo', 'bad'))
+        self.assertEquals(str(warning[4]), 'in use')
+
+        handle.ui.getYn._mock.setDefaultReturn(False)
+        self.assertEquals(cmd.runCommand(handle, {},
+            ['rbuild', 'delete', 'foos', 'bad']), [])
+        handle.ui.getYn._mock.assertCalled('Delete bad?', default=False)
+
+        self.assertRaises(errors.PluginError, cmd.runCommand, handle,
+            {'force': True}, ['rbuild', 'delete', 'foos', 'bad'])
+        handle.ui.getYn._mock.assertNotCalled()
+
+        plugin.find._mock.setDefaultReturn([])
+        self.assertEquals(cmd.runCommand(handle, {},
+            ['rbuild', 'delete', 'foos', 'missing']), [])
+        handle.ui.getYn._mock.assertNotCalled()
+
+    def testRunBulkClients(self):
+        handle = mock.MockObject()
+        foos = self._foos('a', 'b', 'c', 'd', 'e')
+        clients = self._mockClients(handle, foos)
+        handle.getPlugin('foos').find._mock.setDefaultReturn(foos)
+
+        # each worker acts on a copy fetched on a client of its own
+        cmd = self.genCommand()()
+        results = cmd.runCommand(handle, {'force': True},
+            ['rbuild', 'delete', 'foos', 'x'])
+        self.assertEquals([x[1] for x in results], list('ABCDE'))
+        self.assertTrue(1 <= len(clients) <= cmd.workers)
+        self.assertEquals(sorted(sum([x.fetched for x in clients], [])),
+                          [x.id for x in foos])
+
+        # a single worker acts on the resources themselves
+        cmd.workers = 1
+        del clients[:]
+        results = cmd.runCommand(handle, {'force': True},
+            ['rbuild', 'delete', 'foos', 'x'])
+        self.assertEquals([x[1] for x in results], list('ABCDE'))
+        self.assertEquals(clients, [])
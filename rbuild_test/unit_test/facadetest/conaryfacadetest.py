@@ -24,6 +24,7 @@ unit tests for conary facade
 from rbuild_test import rbuildhelp
 from testutils import mock
 import os
+import urllib2
 
 from rbuild.facade import conaryfacade
 from rbuild import errors
@@ -78,20 +79,26 @@ class MockConfig(object):
     def __init__(self, serverUrl=None):
         self.serverUrl = serverUrl
         self.includedConfigFile = None
+        self.readObjects = []
         self.repositoryMap = {}
         self.user = []
         self.name = None
         self.contact = None
         self.signatureKey = None
         self.signatureKeyMap = {}
+        self.cacheDirectory = None
+        self.useCache = False
     def includeConfigFile(self, path):
         self.includedConfigFile = path
+    def readObject(self, path, f):
+        self.readObjects.append((path, f.read()))
 
 class MockHandle(object):
     def __init__(self, serverUrl=None):
         self.serverUrl = serverUrl
         self._cfg = None
         self.ui = mock.MockObject()
+        self.productStore = None
 
     def _setServerUrl(self, serverUrl):
         self.serverUrl = serverUrl
@@ -170,6 +177,56 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
         facade._parseRBuilderConfigFile(cfg)
         assert cfg.includedConfigFile == 'http://conary.example.com/conaryrc'
 
+    def testParseRBuilderConfigFileCached(self):
+        handle, facade = self.prep()
+        handle._setServerUrl('http://conary.example.com')
+        rbuildCfg = handle.getConfig()
+        rbuildCfg.useCache = True
+        rbuildCfg.cacheDirectory = self.workDir + '/cache'
+        rbuildCfg.cacheTimeouts = {}
+        url = 'http://conary.example.com/conaryrc'
+        cache = facade._getResponseCache()
+        self.assertEquals(cache.getTimeout('conaryrc'),
+                          conaryfacade.CONARYRC_CACHE_TIMEOUT)
+        self.assertEquals(cache.requestTimeout,
+                          conaryfacade.CONARYRC_REQUEST_TIMEOUT)
+        mock.mockMethod(cache.get)
+        mock.mockMethod(cache.getStale)
+        mock.mockMethod(cache.touch)
+
+        cache.get._mock.setReturn('repositoryMap a http://a\n', url,
+                                  'conaryrc')
+        cfg = MockConfig()
+        facade._parseRBuilderConfigFile(cfg)
+        self.assertEquals(cfg.readObjects,
+                          [(url, 'repositoryMap a http://a\n')])
+        self.assertEquals(cfg.includedConfigFile, None)
+
+        # a server that does not respond in time falls back to the copy
+        # fetched earlier
+        cache.get._mock.raiseErrorOnAccess(urllib2.URLError('timed out'))
+        cache.getStale._mock.setReturn('repositoryMap b http://b\n', url)
+        cfg = MockConfig()
+        facade._parseRBuilderConfigFile(cfg)
+        self.assertEquals(cfg.readObjects,
+                          [(url, 'repositoryMap b http://b\n')])
+        self.assertEquals(handle.ui.warning._mock.popCall()[0][1], url)
+        # and keeps using it for a while without asking again
+        cache.touch._mock.assertCalled(url, 'conaryrc',
+            seconds=conaryfacade.CONARYRC_RETRY_TIMEOUT)
+
+        # without one, the conaryrc is included directly as before
+        cache.getStale._mock.setReturn(None, url)
+        cfg = MockConfig()
+        facade._parseRBuilderConfigFile(cfg)
+        self.assertEquals(cfg.readObjects, [])
+        self.assertEquals(cfg.includedConfigFile, url)
+
+        # creating a project drops the cached copy
+        mock.mockMethod(cache.invalidate)
+        facade._invalidateRBuilderConfigFile()
+        cache.invalidate._mock.assertCalled(url)
+
     def xtestParseRBuilderConfigFile(self):
         handle, facade = self.prep()
         cfg = MockConfig()
@@ -189,9 +246,22 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
         savedArgs = []
         self.mock(conaryclient, 'ConaryClient',
             lambda *args: mockedFunction(None, savedArgs, None, *args))
-        facade._getConaryClient()
+        client = facade._getConaryClient()
         self.assertEquals(savedArgs, [(('c',), {})])
 
+        # the client is reused until the configuration changes
+        self.assertTrue(facade._getConaryClient() is client)
+        self.assertEquals(len(savedArgs), 1)
+        facade.getConaryConfig._mock.setDefaultReturn('d')
+        facade._getConaryClient()
+        self.assertEquals(savedArgs[1:], [(('d',), {})])
+        facade.clearCachedConfig()
+        facade._getConaryClient()
+        self.assertEquals(savedArgs[2:], [(('d',), {})])
+        facade.clearCachedClient()
+        facade._getConaryClient()
+        self.assertEquals(savedArgs[3:], [(('d',), {})])
+
     def testGetRepositoryClient(self):
         _, facade = self.prep()
         mock.mock(facade, '_getConaryClient')
@@ -306,6 +376,78 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
         assert(results == [('foo',
                              VFS('/localhost@rpl:1/1.0-1-1'), Flavor('ssl'))])
 
+    def testQueueFindTroves(self):
+        _, facade = self.prep()
+        repos = MockRepositoryClient()
+        mock.mockMethod(facade._getRepositoryClient, repos)
+        calls = []
+        def findTroves(labelPath, troveSpecs, **kw):
+            calls.append((labelPath, list(troveSpecs), kw))
+            if ('bad', None, None) in troveSpecs:
+                raise conaryerrors.TroveNotFound('bad was not found')
+            return MockRepositoryClient.findTroves(repos, labelPath,
+                                                   troveSpecs, **kw)
+        repos.findTroves = findTroves
+
+        label1 = versions.Label('localhost@rpl:1')
+        label2 = versions.Label('localhost@rpl:2')
+        fooSpec = ('foo', None, None)
+        barSpec = ('bar', None, None)
+        query1 = facade._queueFindTroves([fooSpec], label1)
+        query2 = facade._queueFindTroves(['bar', fooSpec], label1)
+        query3 = facade._queueFindTroves([fooSpec], label2,
+                                         allowMissing=True)
+        self.assertEquals(calls, [])
+        self.assertFalse(query2.done())
+
+        # lookups on the same label path are sent together
+        self.assertEquals(query1.result().keys(), [fooSpec])
+        self.assertEquals(calls, [
+            (label1, [fooSpec, barSpec], {'allowMissing': False}),
+            (label2, [fooSpec], {'allowMissing': True})])
+        self.assertTrue(query2.done())
+        self.assertEquals(sorted(query2.result().keys()), ['bar', fooSpec])
+        self.assertEquals(query3.result()[fooSpec][0][1],
+                          VFS('/localhost@rpl:2/1.0-1-1'))
+
+        # a failing lookup does not fail the others queued with it
+        del calls[:]
+        query1 = facade._queueFindTroves([fooSpec], label1)
+        query2 = facade._queueFindTroves([('bad', None, None)], label1)
+        self.assertRaises(conaryerrors.TroveNotFound, query2.result)
+        self.assertEquals(query1.result().keys(), [fooSpec])
+        self.assertEquals(len(calls), 3)
+
+        # lookups that cannot be sent at all fail with the error
+        facade._getRepositoryClient._mock.raiseErrorOnAccess(
+            errors.RbuildError('no repository'))
+        query1 = facade._queueFindTroves([fooSpec], label1)
+        query2 = facade._queueFindTroves([barSpec], label2)
+        self.assertRaises(errors.RbuildError, query1.result)
+        self.assertTrue(query2.done())
+        self.assertRaises(errors.RbuildError, query2.result)
+
+    def testQueuedSearchPathLookup(self):
+        _, facade = self.prep()
+        repos = MockRepositoryClient()
+        mock.mockMethod(facade._getRepositoryClient, repos)
+        calls = []
+        def findTroves(labelPath, troveSpecs, **kw):
+            calls.append(list(troveSpecs))
+            return dict((x, [(x[0], VFS('/%s/1.0-1-1' % x[1]), Flavor(''))])
+                        for x in troveSpecs)
+        repos.findTroves = findTroves
+
+        # a lookup on a label queued before a search path lookup is sent
+        # with it
+        groupSpec = ('group-dist:source', 'localhost@rpl:1', None)
+        query = facade._queueFindTroves([groupSpec], allowMissing=True)
+        facade._findPackagesInSearchPaths(
+            [(None, 'localhost@rpl:2', None)], ['foo'])
+        self.assertEquals(calls, [[groupSpec,
+                                   ('foo', 'localhost@rpl:2', None)]])
+        self.assertEquals(query.result().keys(), [groupSpec])
+
     def testVersionToString(self):
         _, facade = self.prep()
         versionString = '/a@b:c/1.2-3-4'
@@ -510,6 +652,34 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
         mockedGenerateStatus._mock.assertCalled('r', dirName='targetDirName')
         assert ret == ['asdf']
 
+    def testGetCheckoutStatusCached(self):
+        handle, facade = self.prep()
+        handle.productStore = mock.MockObject()
+        handle.productStore.getStatCachePath._mock.setReturn(
+            self.workDir + '/statcache')
+        mock.mockMethod(facade._getRepositoryClient)
+        facade._getRepositoryClient._mock.setDefaultReturn('r')
+        checkoutDir = self.workDir + '/foo'
+        os.mkdir(checkoutDir)
+        self.writeFile(checkoutDir + '/foo.recipe', 'recipe\n')
+        self.writeFile(checkoutDir + '/CONARY', 'state\n')
+        mockedGenerateStatus = mock.MockObject()
+        mockedGenerateStatus._mock.setDefaultReturn([('M', 'foo.recipe')])
+        self.mock(checkin, 'generateStatus', mockedGenerateStatus)
+
+        self.assertEquals(facade.getCheckoutStatus(checkoutDir),
+                          [('M', 'foo.recipe')])
+        mockedGenerateStatus._mock.assertCalled('r', dirName=checkoutDir)
+        # nothing changed, so the status is not generated again
+        self.assertEquals(facade.getCheckoutStatus(checkoutDir),
+                          [('M', 'foo.recipe')])
+        mockedGenerateStatus._mock.assertNotCalled()
+
+        self.writeFile(checkoutDir + '/foo.recipe', 'changed recipe\n')
+        mockedGenerateStatus._mock.setDefaultReturn([])
+        self.assertEquals(facade.getCheckoutStatus(checkoutDir), [])
+        mockedGenerateStatus._mock.assertCalled('r', dirName=checkoutDir)
+
     def testGetCheckoutLog(self):
         _, facade = self.prep()
         repos, sourceState = self.prepReposState(facade)
@@ -522,26 +692,79 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
         flavor._mock.setDefaultReturn(flavor)
         self.mock(deps, 'Flavor', flavor)
         trove = mock.MockObject()
-        repos.getTroves._mock.setReturn(trove, [('name', '1', flavor)])
+        repos.getTroves._mock.setReturn([trove], [('name', '1', flavor)])
         mockedIterLogMessages = mock.MockObject()
         mockedIterLogMessages._mock.setDefaultReturn(['asdf'])
         self.mock(checkin, 'iterLogMessages', mockedIterLogMessages)
         ret = facade.getCheckoutLog('targetDirName')
-        mockedIterLogMessages._mock.assertCalled(trove)
+        mockedIterLogMessages._mock.assertCalled([trove])
         self.assertEquals(ret, ['asdf'])
 
         facade._getNewerRepositoryVersions._mock.setDefaultReturn(['1'])
         facade._getRepositoryVersions._mock.setDefaultReturn(['broken'])
         ret = facade.getCheckoutLog('dir2', newerOnly=True)
-        mockedIterLogMessages._mock.assertCalled(trove)
+        mockedIterLogMessages._mock.assertCalled([trove])
         self.assertEquals(ret, ['asdf'])
 
         mock.mock(facade, '_getVersion')
         facade._getVersion._mock.setReturn('1', 'string')
         ret = facade.getCheckoutLog('dir3', versionList=['string'])
-        mockedIterLogMessages._mock.assertCalled(trove)
+        mockedIterLogMessages._mock.assertCalled([trove])
         self.assertEquals(ret, ['asdf'])
 
+    def testHistoryCache(self):
+        handle, facade = self.prep()
+        cfg = handle.getConfig()
+        cfg.cacheDirectory = self.workDir + '/cache'
+        cfg.useCache = True
+        repos, sourceState = self.prepReposState(facade)
+        sourceState.getName._mock.setDefaultReturn('name')
+        flavor = mock.MockObject()
+        flavor._mock.setDefaultReturn(flavor)
+        self.mock(deps, 'Flavor', flavor)
+        trove1 = mock.MockObject()
+        trove2 = mock.MockObject()
+        repos.getTroves._mock.setReturn([trove1], [('name', '1', flavor)])
+        repos.getTroves._mock.setReturn([trove2], [('name', '2', flavor)])
+        mockedIterLogMessages = mock.MockObject()
+        mockedIterLogMessages._mock.setReturn(['one'], [trove1])
+        mockedIterLogMessages._mock.setReturn(['two'], [trove2])
+        self.mock(checkin, 'iterLogMessages', mockedIterLogMessages)
+        self.assertEquals(facade.getCheckoutLog('dir', versionList=['1']),
+                          ['one'])
+        repos.getTroves._mock.assertCalled([('name', '1', flavor)])
+
+        # only the versions not seen before are fetched
+        self.assertEquals(
+            facade.getCheckoutLog('dir', versionList=['1', '2']),
+            ['one', 'two'])
+        repos.getTroves._mock.assertCalled([('name', '2', flavor)])
+        facade = self.getFacade(handle)
+        repos, sourceState = self.prepReposState(facade)
+        sourceState.getName._mock.setDefaultReturn('name')
+        self.assertEquals(
+            facade.getCheckoutLog('dir', versionList=['2', '1']),
+            ['two', 'one'])
+        repos.getTroves._mock.assertNotCalled()
+
+        ver = mock.MockObject()
+        ver.asString._mock.setDefaultReturn('/localhost@rpl:1/1-1')
+        lastver = mock.MockObject()
+        lastver.asString._mock.setDefaultReturn('/localhost@rpl:1/2-1')
+        sourceState.getVersion._mock.setDefaultReturn(ver)
+        mock.mock(facade, '_getVersion')
+        facade._getVersion._mock.setReturn(lastver, lastver)
+        mockedGetIterRdiff = mock.MockObject()
+        mockedGetIterRdiff._mock.setDefaultReturn(['diff\n'])
+        self.mock(checkin, '_getIterRdiff', mockedGetIterRdiff)
+        self.assertEquals(list(facade.iterRepositoryDiff('dir', lastver)),
+                          ['diff\n'])
+        mockedGetIterRdiff._mock.assertCalled(repos, ver.branch().label(),
+            'name', '/localhost@rpl:1/1-1', '/localhost@rpl:1/2-1')
+        self.assertEquals(list(facade.iterRepositoryDiff('dir', lastver)),
+                          ['diff\n'])
+        mockedGetIterRdiff._mock.assertNotCalled()
+
     def testIterRepositoryDiff(self):
         _, facade = self.prep()
         repos, sourceState = self.prepReposState(facade)
@@ -617,6 +840,76 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
         output = facade._getNewerRepositoryVersions('.')
         self.assertEquals(output, [ver2])
 
+    def testTroveIndex(self):
+        handle, facade = self.prep()
+        cfg = handle.getConfig()
+        cfg.cacheDirectory = self.workDir + '/cache'
+        cfg.useCache = True
+        repos = mock.MockObject()
+        mock.mockMethod(facade._getRepositoryClient, repos)
+        mock.mockMethod(facade._getRepositoryStateFromDirectory)
+        mock.mockMethod(facade._getConaryClient)
+        foo1 = versions.ThawVersion('/localhost@rpl:1/10.0:1.0-1')
+        foo2 = versions.ThawVersion('/localhost@rpl:1/20.0:1.0-2')
+        fooBin = versions.ThawVersion('/localhost@rpl:1/21.0:1.0-2-1')
+        sourceState = mock.MockObject()
+        sourceState.getName._mock.setDefaultReturn('foo:source')
+        sourceState.getVersion._mock.setDefaultReturn(foo1)
+        sourceState.getBranch._mock.setDefaultReturn(foo1.branch())
+        facade._getRepositoryStateFromDirectory._mock.setDefaultReturn(
+            (repos, sourceState))
+        repos.getNewTroveList._mock.setReturn([
+            ('1', ('foo:source', foo1, Flavor('')), 0),
+            ('2', ('foo:source', foo2, Flavor('')), 0),
+            ('3', ('foo', fooBin, Flavor('is: x86')), 0)],
+            'localhost', '0')
+        repos.getNewTroveList._mock.setReturn([], 'localhost', '3.0')
+        repos.getTroveVersionsByBranch._mock.raiseErrorOnAccess(
+            AssertionError)
+        repos.getTroveLatestByLabel._mock.raiseErrorOnAccess(AssertionError)
+
+        self.assertEquals(facade._getRepositoryVersions('foo'), [foo2, foo1])
+        self.assertEquals(
+            facade._getNewerRepositoryVersionsByDirectory(['foo']),
+            {'foo': [foo2]})
+        self.assertEquals(facade.getLatestPackagesOnLabel('localhost@rpl:1'),
+                          [('foo', fooBin, Flavor('is: x86'))])
+        # the index is brought up to date once per command
+        repos.getNewTroveList._mock.assertCalled('localhost', '0')
+        repos.getNewTroveList._mock.assertCalled('localhost', '3.0')
+        repos.getNewTroveList._mock.assertNotCalled()
+
+        # and again after a commit
+        facade._repositoryChanged()
+        self.assertEquals(facade._getRepositoryVersions('foo'), [foo2, foo1])
+        repos.getNewTroveList._mock.assertCalled('localhost', '3.0')
+
+    def testLabelSnapshot(self):
+        _, facade = self.prep()
+        repos = mock.MockObject()
+        mock.mockMethod(facade._getRepositoryClient, repos)
+        mock.mockMethod(facade._getConaryClient)
+        snapshotPath = self.workDir + '/.rbuild/labelsnapshots/devel'
+        fooBin = versions.ThawVersion('/localhost@rpl:1/21.0:1.0-2-1')
+        repos.getTroveLatestByLabel._mock.setDefaultReturn(
+            {'foo': {fooBin: [Flavor('is: x86')]}})
+        repos.getNewTroveList._mock.setDefaultReturn([])
+
+        self.assertEquals(facade.getLatestPackagesOnLabel('localhost@rpl:1',
+                              snapshotPath=snapshotPath),
+                          [('foo', fooBin, Flavor('is: x86'))])
+        repos.getTroveLatestByLabel._mock.assertCalled(
+            {None: {versions.Label('localhost@rpl:1'): [None]}})
+        self.failUnless(os.path.exists(snapshotPath))
+
+        # later queries only ask for the troves changed since
+        self.assertEquals(facade.getLatestPackagesOnLabel('localhost@rpl:1',
+                              snapshotPath=snapshotPath),
+                          [('foo', fooBin, Flavor('is: x86'))])
+        repos.getTroveLatestByLabel._mock.assertNotCalled()
+        self.assertEquals(len(repos.getNewTroveList._mock.calls), 1)
+        facade._getConaryClient._mock.assertNotCalled()
+
     def testGetRepositoryVersions(self):
         _, facade = self.prep()
         repos, sourceState = self.prepReposState(facade)
@@ -632,6 +925,42 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
         output = facade._getRepositoryVersions('.')
         self.assertEquals(output, [])
 
+    def testGetNewerRepositoryVersionsByDirectory(self):
+        _, facade = self.prep()
+        repos = mock.MockObject()
+        mock.mockMethod(facade._getRepositoryClient, repos)
+        mock.mockMethod(facade._getRepositoryStateFromDirectory)
+        states = {}
+        for dirName, name, version in [
+                ('foo', 'foo:source', '/localhost@rpl:1/1.0-1'),
+                ('bar', 'bar:source', '/localhost@rpl:1/2.0-1'),
+                ('bar2', 'bar:source', '/localhost@rpl:2/2.0-1')]:
+            version = VFS(version)
+            sourceState = mock.MockObject()
+            sourceState.getName._mock.setDefaultReturn(name)
+            sourceState.getVersion._mock.setDefaultReturn(version)
+            sourceState.getBranch._mock.setDefaultReturn(version.branch())
+            facade._getRepositoryStateFromDirectory._mock.setReturn(
+                (repos, sourceState), dirName)
+            states[dirName] = sourceState
+        foo2 = VFS('/localhost@rpl:1/1.0-2')
+        foo3 = VFS('/localhost@rpl:1/1.0-3')
+        bar1 = VFS('/localhost@rpl:1/2.0-1')
+        bar3 = VFS('/localhost@rpl:2/2.0-3')
+        repos.getTroveVersionsByBranch._mock.setReturn(
+            {'foo:source': {foo2: None, foo3: None},
+             'bar:source': {bar1: None, bar3: None}},
+            {'foo:source': {foo2.branch(): None},
+             'bar:source': {bar1.branch(): None, bar3.branch(): None}})
+        self.assertEquals(
+            facade._getNewerRepositoryVersionsByDirectory(
+                ['foo', 'bar', 'bar2']),
+            {'foo': [foo3, foo2], 'bar': [], 'bar2': [bar3]})
+        self.assertEquals(len(repos.getTroveVersionsByBranch._mock.calls), 1)
+
+        self.assertEquals(facade._getNewerRepositoryVersionsByDirectory([]),
+                          {})
+
     def testGetRepositoryStateFromDirectory(self):
         _, facade = self.prep()
         repos = mock.MockObject()
@@ -643,6 +972,37 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
         output = facade._getRepositoryStateFromDirectory('.')
         self.assertEquals(output, (repos, sourceState))
 
+    def testGetConaryStateCached(self):
+        _, facade = self.prep()
+        repos = mock.MockObject()
+        mock.mockMethod(facade._getRepositoryClient, repos)
+        mock.mock(state, 'ConaryStateFromFile')
+        conaryState = mock.MockObject()
+        state.ConaryStateFromFile._mock.setDefaultReturn(conaryState)
+        statePath = self.workDir + '/foo/CONARY'
+        os.mkdir(self.workDir + '/foo')
+        self.writeFile(statePath, 'state\n')
+        os.utime(statePath, (1000, 1000))
+
+        self.assertEquals(facade._getConaryState(self.workDir + '/foo'),
+                          conaryState)
+        state.ConaryStateFromFile._mock.assertCalled(statePath, repos)
+        self.assertEquals(facade._getConaryState(self.workDir + '/foo/'),
+                          conaryState)
+        state.ConaryStateFromFile._mock.assertNotCalled()
+
+        # the CONARY file changed
+        os.utime(statePath, (2000, 2000))
+        facade._getConaryState(self.workDir + '/foo')
+        state.ConaryStateFromFile._mock.assertCalled(statePath, repos)
+
+        # just written, so it might change again unnoticed
+        self.writeFile(statePath, 'new state\n')
+        facade._getConaryState(self.workDir + '/foo')
+        state.ConaryStateFromFile._mock.assertCalled(statePath, repos)
+        facade._getConaryState(self.workDir + '/foo')
+        state.ConaryStateFromFile._mock.assertCalled(statePath, repos)
+
     def testIsConaryCheckoutDirectory(self):
         _, facade = self.prep()
         self.mock(os.path, 'exists', lambda *args: True)
@@ -819,6 +1179,49 @@ class ConaryFacadeTest(rbuildhelp.RbuildHelper):
         self.assertEquals(facade._findPackageInSearchPaths([groupSpecFoo], 'foo'),
                           [])
 
+    def testGroupIndex(self):
+        handle, facade = self.prep()
+        cfg = handle.getConfig()
+        cfg.cacheDirectory = self.workDir + '/cache'
+        cfg.useCache = True
+        repos = mock.MockObject()
+        mock.mockMethod(facade._getRepositoryClient, repos)
+        groupSpec = ('group-foo', 'localhost@rpl:1', None)
+        groupTup = self.makeTroveTuple(
+                            'group-foo=localhost@rpl:1/2:2.0-2-1[is:x86]')
+        fooTup = self.makeTroveTuple('foo=localhost@rpl:1/3:1.0-1-1')
+        fooRuntimeTup = self.makeTroveTuple(
+                            'foo:runtime=localhost@rpl:1/3:1.0-1-1')
+        blahTup = self.makeTroveTuple('blah=localhost@rpl:1/4:1.0-1-1')
+        groupTrv = mock.MockObject()
+        groupTrv.iterTroveList._mock.setReturn(
+            [fooTup, fooRuntimeTup, blahTup], weakRefs=True, strongRefs=True)
+        repos.findTroves._mock.setReturn({groupSpec: [groupTup]},
+                                         None, [groupSpec], allowMissing=True)
+        repos.getTroves._mock.setReturn([groupTrv], [groupTup],
+                                        withFiles=False)
+        self.assertEquals(facade._findPackageInSearchPaths([groupSpec], 'foo'),
+                          [fooTup])
+        repos.getTroves._mock.assertCalled([groupTup], withFiles=False)
+
+        # the group contents are not fetched again, even by a new facade
+        facade = self.getFacade(handle)
+        mock.mockMethod(facade._getRepositoryClient, repos)
+        self.assertEquals(facade._findPackageInSearchPaths([groupSpec], 'foo'),
+                          [fooTup])
+        repos.getTroves._mock.assertNotCalled()
+
+        # and the search path can be searched without the repository
+        repos.findTroves._mock.raiseErrorOnAccess(AssertionError)
+        self.assertEquals(
+            facade.searchPackagesInSearchPaths([groupSpec], 'f*'), [fooTup])
+        self.assertEquals(
+            facade.searchPackagesInSearchPaths([groupSpec], 'foo:*'),
+            [fooRuntimeTup])
+        self.assertEquals(
+            facade.searchPackagesInSearchPaths([groupSpec], 'baz'), [])
+        repos.getTroves._mock.assertNotCalled()
+
     def testFindPackageInSearchPathsWithLabels(self):
         _, facade = self.prep()
         repos = mock.MockObject()
@@ -71,6 +71,7 @@ class RbuilderFacadeTest(rbuildhelp.RbuildHelper):
                               user=('foo', 'bar'))
         handle.getConfig._mock.setReturn(cfg)
         handle.productStore.getActiveStageName._mock.setReturn('devel')
+        handle.productStore.getIdCachePath._mock.setReturn(None)
         facade = rbuilderfacade.RbuilderFacade(handle)
 
         return handle, facade
@@ -98,6 +99,18 @@ class RbuilderFacadeTest(rbuildhelp.RbuildHelper):
                                                          'foo', 'bar',
                                                          facade._handle)
 
+    def testRPCClientWithoutFacade(self):
+        # the backwards-compatible entry point accepts handles without an
+        # rbuilder facade
+        class OldHandle(object):
+            pass
+        for handle in (None, OldHandle()):
+            client = rbuilderfacade.RbuilderClient('https://localhost',
+                                                   'foo', 'bar', handle)
+            self.failUnless(isinstance(client._transport,
+                                       fac_mod.PooledTransport))
+            self.assertEqual(client._transport.secure, True)
+
     def test_getRbuilderRESTClient(self):
         _, facade = self.prep()
         mock.mock(rbuilderfacade, 'RbuilderRESTClient')
@@ -105,6 +118,32 @@ class RbuilderFacadeTest(rbuildhelp.RbuildHelper):
         rbuilderfacade.RbuilderRESTClient._mock.assertCalled(
             'http://localhost', 'foo', 'bar', facade._handle)
 
+    def test_newClient(self):
+        _, facade = self.prep()
+        mock.mockMethod(facade._getRbuilderRESTClient)
+        restClient = facade._getRbuilderRESTClient()
+        restClient._newClient._mock.setReturn('client')
+        self.assertEqual(facade._newClient(), 'client')
+
+    def test_getRbuilderClientCached(self):
+        handle, facade = self.prep()
+        client = facade._getRbuilderRESTClient()
+        self.assertTrue(facade._getRbuilderRESTClient() is client)
+        self.assertFalse(facade._getRbuilderRPCClient() is client)
+
+        # changing the server or the credentials requires a new client
+        handle.getConfig()._mock.set(serverUrl='http://otherhost')
+        client2 = facade._getRbuilderRESTClient()
+        self.assertFalse(client2 is client)
+        self.assertEqual(client2.rbuilderUrl, 'http://otherhost')
+        handle.getConfig()._mock.set(user=('foo', 'baz'))
+        client3 = facade._getRbuilderRESTClient()
+        self.assertFalse(client3 is client2)
+        self.assertTrue(facade._getRbuilderRESTClient() is client3)
+
+        facade.clearCachedClients()
+        self.assertFalse(facade._getRbuilderRESTClient() is client3)
+
     def test_getBaseServerUrl(self):
         _, facade = self.prep()
         rbcfg = mock.MockObject()
@@ -187,7 +226,10 @@ class RbuilderFacadeTest(rbuildhelp.RbuildHelper):
         mock.mockMethod(facade.getGroups)
         facade.getGroups._mock.appendReturn(
             [mock.MockObject(trailingVersion="1.0-1-1")], "shortname",
-            "shortname@rpath:shortname-1.0-devel")
+            "shortname@rpath:shortname-1.0-devel", trailingVersion="1.0-1-1")
+        facade.getGroups._mock.appendReturn(
+            [], "shortname", "shortname@rpath:shortname-1.0-devel",
+            trailingVersion="bad-version")
 
         client = facade._getRbuilderRPCClient()
 
@@ -315,6 +357,7 @@ class RbuilderFacadeTest(rbuildhelp.RbuildHelper):
         facade.isValidUrl._mock.appendReturn(False, None)
         # test valid non-external project
         facade.createProject('title', 'shortname', 'hostname', 'domain.name')
+        handle.facade.conary._invalidateRBuilderConfigFile._mock.assertCalled()
         # test valid external project, no upstream url
         facade.createProject('title', 'shortname', 'hostname', 'domain.name',
                              external=True, external_params=(["label"], None))
@@ -424,14 +467,25 @@ class RbuilderFacadeTest(rbuildhelp.RbuildHelper):
     def testGetPlatform(self):
         handle, facade = self.prep()
         mock.mockMethod(facade._getRbuilderRESTClient)
-        _platform1 = mock.MockObject()
-        _platform1._mock.set(label='label1')
-        _platform2 = mock.MockObject()
-        _platform2._mock.set(label='label2')
-        facade._getRbuilderRESTClient().api._mock.set(
-            platforms=[_platform1, _platform2])
-        self.assertEqual(facade.getPlatform('label2'), _platform2)
-        self.assertEqual(facade.getPlatform('no label'), None)
+        facade._getRbuilderRESTClient().getPlatform._mock.setReturn(
+            'platform', 'label2')
+        self.assertEqual(facade.getPlatform('label2'), 'platform')
+
+    def testGetPlatforms(self):
+        handle, facade = self.prep()
+        mock.mockMethod(facade._getRbuilderRESTClient)
+        facade._getRbuilderRESTClient().getPlatforms._mock.setReturn(
+            ['platform'])
+        self.assertEqual(facade.getPlatforms(), ['platform'])
+        facade.expirePlatforms()
+        facade._getRbuilderRESTClient().expirePlatforms._mock.assertCalled()
+
+    def testWaitForJobs(self):
+        handle, facade = self.prep()
+        mock.mockMethod(facade._getRbuilderRESTClient)
+        facade._getRbuilderRESTClient().waitForJobs._mock.setReturn(
+            ['job'], ['job'], callback=None, timeout=30, cancel=None)
+        self.assertEqual(facade.waitForJobs(['job'], timeout=30), ['job'])
 
     def testGetProjectBranches(self):
         handle, facade = self.prep()
@@ -607,21 +661,45 @@ class RbuilderFacadeTest(rbuildhelp.RbuildHelper):
 
 
 class RbuilderRPCClientTest(rbuildhelp.RbuildHelper):
-    def _getClient(self):
+    def _getClient(self, idCachePath=None):
         mock.mock(fac_mod, 'ServerProxy')
+        handle = mock.MockObject()
+        handle.productStore.getIdCachePath._mock.setReturn(idCachePath)
         return rbuilderfacade.RbuilderRPCClient('http://localhost', 'foo', 'bar',
-            mock.MockObject())
+            handle)
 
     def testRbuilderRPCClientInit(self):
         mock.mock(fac_mod, 'ServerProxy')
         rbuilderfacade.RbuilderRPCClient('http://localhost', 'foo', 'bar', None)
         fac_mod.ServerProxy._mock.assertCalled(
                 'http://localhost/xmlrpc-private',
-                username='foo', password='bar', allow_none=True)
+                username='foo', password='bar', allow_none=True,
+                transport=None)
         rbuilderfacade.RbuilderRPCClient('https://localhost2', 'foo2', 'bar', None)
         fac_mod.ServerProxy._mock.assertCalled(
                 'https://localhost2/xmlrpc-private',
-                username='foo2', password='bar', allow_none=True)
+                username='foo2', password='bar', allow_none=True,
+                transport=None)
+
+        # clients of a handle share its transport
+        handle = mock.MockObject()
+        facade = rbuilderfacade.RbuilderFacade(handle)
+        handle._mock.set(facade=mock.MockObject(rbuilder=facade))
+        rbuilderfacade.RbuilderRPCClient('http://localhost', 'foo', 'bar',
+            handle)
+        transport = facade._getRPCTransport('http://localhost')
+        self.assertFalse(transport.secure)
+        fac_mod.ServerProxy._mock.assertCalled(
+                'http://localhost/xmlrpc-private',
+                username='foo', password='bar', allow_none=True,
+                transport=transport)
+        rbuilderfacade.RbuilderRPCClient('http://localhost', 'foo2', 'bar',
+            handle)
+        fac_mod.ServerProxy._mock.assertCalled(
+                'http://localhost/xmlrpc-private',
+                username='foo2', password='bar', allow_none=True,
+                transport=transport)
+        self.assertTrue(facade._getRPCTransport('https://localhost2').secure)
 
     def testGetBranchIdFromName(self):
         client = self._getClient()
@@ -661,6 +739,100 @@ class RbuilderRPCClientTest(rbuildhelp.RbuildHelper):
         err = self.assertRaises(*assertRaiseArgs)
         self.assertEqual(str(err), "rBuilder error BazError: 1337")
 
+    def testIdCache(self):
+        idCachePath = self.workDir + '/.rbuild/idcache'
+        client = self._getClient(idCachePath)
+        server = client.server
+        server.getProjectIdByHostname._mock.setReturn((False, 32),
+                                                       'foo.rpath.org')
+        productVersionList = [(1, 32, 'rpl', '1.0', 'version 1.0'),
+                              (2, 32, 'rpl', '2.0', 'version 2.0')]
+        server.getProductVersionListForProduct._mock.setReturn(
+            (False, productVersionList), 32)
+        server.getProductDefinitionForVersion._mock.setReturn(
+            (False, 'stream'), 1)
+        mock.mock(proddef, 'ProductDefinition')
+        product = mock.MockObject()
+        proddef.ProductDefinition._mock.setReturn(product, 'stream')
+        product.getProductDefinitionLabel._mock.setReturn(
+            'foo.rpath.org@rpl:1')
+        self.assertEqual(client.getProductLabelFromNameAndVersion(
+            'foo.rpath.org', '1.0'), 'foo.rpath.org@rpl:1')
+        server.getProjectIdByHostname._mock.assertCalled('foo.rpath.org')
+        server.getProductVersionListForProduct._mock.assertCalled(32)
+        server.getProductDefinitionForVersion._mock.assertCalled(1)
+
+        # later commands in the checkout reuse the IDs and label
+        client = self._getClient(idCachePath)
+        server = client.server
+        self.assertEqual(client.getProductLabelFromNameAndVersion(
+            'foo.rpath.org', '1.0'), 'foo.rpath.org@rpl:1')
+        self.assertEqual(client.getBranchIdFromName('foo.rpath.org', '1.0'),
+                         1)
+        server.getProjectIdByHostname._mock.assertNotCalled()
+        server.getProductVersionListForProduct._mock.assertNotCalled()
+        server.getProductDefinitionForVersion._mock.assertNotCalled()
+
+        # the product ID is reused for other versions
+        server.getProductVersionListForProduct._mock.setReturn(
+            (False, productVersionList), 32)
+        self.assertEqual(client.getBranchIdFromName('foo.rpath.org', '2.0'),
+                         2)
+        server.getProjectIdByHostname._mock.assertNotCalled()
+        server.getProductVersionListForProduct._mock.assertCalled(32)
+
+        # a version ID that the server does not know is looked up again
+        server.newBuildsFromProductDefinition._mock.setReturn(
+            (True, ('ItemNotFound', '')), 2, 'devel', False, None)
+        server.newBuildsFromProductDefinition._mock.setReturn(
+            (False, [7]), 3, 'devel', False, None)
+        server.getProjectIdByHostname._mock.setReturn((False, 33),
+                                                       'foo.rpath.org')
+        server.getProductVersionListForProduct._mock.setReturn(
+            (False, [(3, 33, 'rpl', '2.0', 'version 2.0')]), 33)
+        self.assertEqual(client.startProductBuilds('foo.rpath.org', '2.0',
+            'devel'), [7])
+        server.getProjectIdByHostname._mock.assertCalled('foo.rpath.org')
+        server.getProductVersionListForProduct._mock.assertCalled(33)
+        self.assertEqual(client.getBranchIdFromName('foo.rpath.org', '2.0'),
+                         3)
+        # the label of another version was forgotten with the old IDs
+        self.assertEqual(client._getIdCache().get('labels',
+            'foo.rpath.org/1.0'), None)
+
+    def testIdCacheWithoutHandle(self):
+        # clients created through the RbuilderClient entry point may have
+        # no handle; IDs are then looked up without a cache
+        mock.mock(fac_mod, 'ServerProxy')
+        client = rbuilderfacade.RbuilderRPCClient('http://localhost', 'foo',
+            'bar', None)
+        self.assertEqual(client._getIdCachePath(), None)
+        server = client.server
+        server.getProjectIdByHostname._mock.setReturn((False, 32),
+                                                       'foo.rpath.org')
+        server.getProductVersionListForProduct._mock.setReturn(
+            (False, [(1, 32, 'rpl', '1.0', 'version 1.0')]), 32)
+        server.getProductDefinitionForVersion._mock.setReturn(
+            (False, 'stream'), 1)
+        mock.mock(proddef, 'ProductDefinition')
+        product = mock.MockObject()
+        proddef.ProductDefinition._mock.setReturn(product, 'stream')
+        product.getProductDefinitionLabel._mock.setReturn(
+            'foo.rpath.org@rpl:1')
+        self.assertEqual(client.getProductLabelFromNameAndVersion(
+            'foo.rpath.org', '1.0'), 'foo.rpath.org@rpl:1')
+        self.assertEqual(client.getBranchIdFromName('foo.rpath.org', '1.0'),
+                         1)
+        server.newBuildsFromProductDefinition._mock.setReturn(
+            (False, [7]), 1, 'devel', False, None)
+        self.assertEqual(client.startProductBuilds('foo.rpath.org', '1.0',
+            'devel'), [7])
+
+        # nor does a handle without a product store need a cache file
+        client = rbuilderfacade.RbuilderRPCClient('http://localhost', 'foo',
+            'bar', object())
+        self.assertEqual(client._getIdCachePath(), None)
+
     def testGetProductLabelFromNameAndVersion2(self):
         client = self._getClient()
         server = client.server
@@ -823,6 +995,28 @@ class RbuilderRPCClientTest(rbuildhelp.RbuildHelper):
             [x[0][0]%x[0][1:] for x in client._handle.ui.error._mock.calls],
             ['Timed out while waiting for build status to change (30 seconds)'])
 
+    def testWatchImagesBackoff(self):
+        client = self._getClient()
+        server = client.server
+        mock.mock(time, 'sleep')
+        running = (False, {'message' : 'foo', 'status' : 100})
+        server.getBuildStatus._mock.setReturns(
+            [running] * 6 + [(False, {'message' : 'bar', 'status' : 300})], 1)
+        server.getBuildStatus._mock.setReturns(
+            [(False, {'message' : 'bam', 'status' : 0})] + [running] * 6 +
+            [(False, {'message' : 'bar', 'status' : 300})], 2)
+        self.assertEqual(client.watchImages([1, 2], interval=5), True)
+        # polls are fast while builds change and back off when they do not
+        self.assertEqual([x[0][0] for x in time.sleep._mock.calls],
+            [1, 1, 2, 4, 5, 5, 1])
+        self.assertEquals(
+            [x[0][0]%x[0][1:] for x in client._handle.ui.write._mock.calls][:5],
+            ['1: Running "foo"',
+             '2: Waiting "bam"',
+             '2: Running "foo"',
+             '1: Finished "bar"',
+             '2: Finished "bar"'])
+
     def testGetBuildFiles(self):
         client = self._getClient()
         server = client.server
@@ -973,6 +1167,30 @@ class RbuilderRPCClientTest(rbuildhelp.RbuildHelper):
                           err.msg)
 
 
+API_VERSIONS_XML = '''\
+<?xml version='1.0' encoding='UTF-8'?>
+<api id="http://localhost/api">
+  <api_versions>
+    <api_version id="http://localhost/api/v1" name="v1"/>
+  </api_versions>
+</api>
+'''
+
+PLATFORMS_XML = '''\
+<?xml version='1.0' encoding='UTF-8'?>
+<platforms>
+  <platform id="http://localhost/api/v1/platforms/1">
+    <enabled>true</enabled>
+    <label>plat@1</label>
+  </platform>
+  <platform id="http://localhost/api/v1/platforms/2">
+    <enabled>false</enabled>
+    <label>plat@2</label>
+  </platform>
+</platforms>
+'''
+
+
 class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
     def setUp(self):
         rbuildhelp.RbuildHelper.setUp(self)
@@ -1035,6 +1253,18 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
         self.assertEqual(
             client.getGroups('test', 'test-1'), _groups)
 
+        _group1 = mock.MockObject(trailingVersion='1-1-1')
+        _group2 = mock.MockObject(trailingVersion='1-2-1')
+        client._api._client.do_GET._mock.setReturn(
+            [_group1, _group2],
+            '/products/%s/repos/search?type=group&amp;label=%s' %
+                ('test', 'test-2'))
+        self.assertEqual(
+            client.getGroups('test', 'test-2', trailingVersion='1-2-1'),
+            [_group2])
+        self.assertEqual(
+            client.getGroups('test', 'test-2', trailingVersion='2-1-1'), [])
+
         client._api._client.do_GET._mock.raiseErrorOnAccess(
             robj.errors.HTTPNotFoundError(uri=None, status=None, reason=None,
                     response=None))
@@ -1108,6 +1338,12 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
             client.getImageDefs('baz', '1', id='foo'), [_imageDef1])
         self.assertEqual(
             client.getImageDefs('baz', '1', name='eggs'), [_imageDef2])
+        # all filters must match
+        self.assertEqual(
+            client.getImageDefs('baz', '1', id='foo', name='eggs'), [])
+        self.assertEqual(
+            client.getImageDefs('baz', '1', id='foo', name='bar'),
+            [_imageDef1])
 
         client._api._client.do_GET._mock.raiseErrorOnAccess(
             robj.errors.HTTPNotFoundError(uri=None, status=None, reason=None,
@@ -1182,11 +1418,17 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
         self.failUnlessRaises(errors.RbuildError, client.getWindowsBuildService)
 
     def testConfigureTarget(self):
+        handle = mock.MockObject()
+        handle.getConfig()._mock.set(jobTimeout=0)
         client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
-            'bar', mock.MockObject())
+            'bar', handle)
         mock.mock(client, '_api')
+        mock.mock(time, 'sleep')
         job = mock.MockObject()
-        job.job_state._mock.set(name='Completed')
+        job.job_state._mock.set(name='Queued')
+        def _refresh():
+            job.job_state._mock.set(name='Completed')
+        job._mock.set(refresh=_refresh)
         _jobs = []
         def _append(x):
             _jobs.append(x)
@@ -1198,6 +1440,8 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
         results = client.configureTarget(target, ddata)
         self.assertEqual(results, target)
         self.assertTrue(len(_jobs) == 1)
+        # the job is polled with a pause, not in a busy loop
+        self.assertEqual(len(time.sleep._mock.calls), 1)
 
         job.job_state._mock.set(name='Failed')
         job._mock.set(status_text='failed for some reason')
@@ -1207,8 +1451,10 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
         self.assertTrue(len(_jobs) == 2)
 
     def testConfigureTargetCredentials(self):
+        handle = mock.MockObject()
+        handle.getConfig()._mock.set(jobTimeout=0)
         client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
-            'bar', mock.MockObject())
+            'bar', handle)
         mock.mock(client, '_api')
         job = mock.MockObject()
         job.job_state._mock.set(name='Completed')
@@ -1353,6 +1599,11 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
             TargetType('ec2', 'Amazon EC2'),
             ])
 
+        # a server ignoring the filter cannot make a lookup pick the
+        # wrong type
+        self.assertEqual(client.getTargetTypes(name='ec2'),
+            [TargetType('ec2', 'Amazon EC2')])
+
     def testCreateBranch(self):
         client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
             'bar', mock.MockObject())
@@ -1421,10 +1672,10 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
     def testListPlatforms(self):
         client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
             'bar', mock.MockObject())
-        mock.mock(client, '_api')
+        mock.mockMethod(client.getPlatforms)
         Platform = namedtuple('Platform',
                 'enabled hidden abstract platformName label')
-        client._api._mock.set(platforms=[
+        client.getPlatforms._mock.setReturn([
             Platform('true',  'false', 'false', 'plat1', 'plat@1'),
             Platform('false', 'false', 'false', 'plat2', 'plat@2'),
             Platform('true',  'true',  'false', 'plat3', 'plat@3'),
@@ -1433,6 +1684,102 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
         results = client.listPlatforms()
         self.assertEqual(results, [Platform('true', 'false', 'false', 'plat1', 'plat@1')])
 
+    def testGetPlatforms(self):
+        client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
+            'bar', mock.MockObject())
+        mock.mockMethod(client._getCachedContent)
+        client._getCachedContent._mock.setReturn(PLATFORMS_XML,
+            'platforms', '/platforms')
+        results = client.getPlatforms()
+        self.assertEqual([x.label for x in results], ['plat@1', 'plat@2'])
+        self.assertEqual(results[1].enabled, 'false')
+
+        # a single platform is still returned as a list
+        client._getCachedContent._mock.setReturn(
+            '<platforms><platform><label>plat@1</label></platform>'
+            '</platforms>', 'platforms', '/platforms')
+        self.assertEqual([x.label for x in client.getPlatforms()], ['plat@1'])
+
+        client._getCachedContent._mock.setReturn('<platforms/>',
+            'platforms', '/platforms')
+        self.assertEqual(client.getPlatforms(), [])
+
+    def testGetPlatform(self):
+        client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
+            'bar', mock.MockObject())
+        mock.mock(client, '_api')
+        _platform1 = mock.MockObject()
+        _platform1._mock.set(label='label1')
+        _platform2 = mock.MockObject()
+        _platform2._mock.set(label='label2')
+        client._api._mock.set(platforms=[_platform1, _platform2],
+                              _uri='http://localhost/api/v1')
+        self.assertEqual(client.getPlatform('label2'), _platform2)
+        self.assertEqual(client.getPlatform('no label'), None)
+
+        # the collection is only fetched once per client
+        client._api._mock.set(platforms=[])
+        self.assertEqual(client.getPlatform('label1'), _platform1)
+
+        mock.mock(client, '_cache')
+        client.expirePlatforms()
+        client._cache.invalidate._mock.assertCalled(
+            'http://localhost/api/v1/platforms', 'foo')
+        self.assertEqual(client.getPlatform('label1'), None)
+
+    def testGetCachedContent(self):
+        handle = mock.MockObject()
+        handle.getConfig()._mock.set(cacheDirectory=self.workDir + '/cache',
+            cacheTimeouts={'platforms': 60}, useCache=True)
+        client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
+            'bar', handle)
+        self.assertEqual(client.cache.cacheDir, self.workDir + '/cache')
+        self.assertEqual(client.cache.getTimeout('platforms'), 60)
+        self.assertEqual(client.cache.enabled, True)
+
+        mock.mock(client, '_cache')
+        # the API root is discovered through the cache too
+        client._cache.get._mock.setReturn(API_VERSIONS_XML,
+            'http://localhost/api', 'api_versions', 'foo', 'bar')
+        client._cache.get._mock.setReturn('<foo/>',
+            'http://localhost/api/v1/foo', 'foo', 'foo', 'bar')
+        self.assertEqual(client._getCachedContent('foo', '/foo'), '<foo/>')
+        self.assertEqual(client._getApiRoot(), 'http://localhost/api/v1')
+
+        client._cache.get._mock.raiseErrorOnAccess(
+            urllib2.URLError('connection refused'))
+        err = self.assertRaises(errors.RbuildError, client._getCachedContent,
+            'foo', '/foo')
+        self.assertIn("Unable to fetch resource 'foo'", str(err))
+
+    def testGetApiRoot(self):
+        client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
+            'bar', mock.MockObject())
+        mock.mockMethod(client._fetchCachedContent)
+        client._fetchCachedContent._mock.setReturn(
+            API_VERSIONS_XML.replace('"v1"', '"v2"'),
+            'api_versions', 'http://localhost/api')
+        err = self.assertRaises(errors.RbuildError, client._getApiRoot)
+        self.assertIn('No compatible REST API', str(err))
+        client._fetchCachedContent._mock.assertCalled('api_versions',
+            'http://localhost/api')
+
+        # an API already discovered through robj is used as-is
+        mock.mock(client, '_api')
+        client._api._mock.set(_uri='http://localhost/api/v1/')
+        self.assertEqual(client._getApiRoot(), 'http://localhost/api/v1')
+        client._fetchCachedContent._mock.assertNotCalled()
+
+    def testGetImageDefDescriptor(self):
+        client = rbuilderfacade.RbuilderRESTClient('http://localhost', 'foo',
+            'bar', mock.MockObject())
+        mock.mockMethod(client._getCachedContent)
+        client._getCachedContent._mock.setReturn('<descriptor/>',
+            'image_def_descriptors',
+            '/platforms/image_type_definition_descriptors/vmware')
+        self.assertEqual(client.getImageDefDescriptor('vmware'),
+            '<descriptor/>')
+
     def testGetTarget(self):
         client = rbuilderfacade.RbuilderRESTClient(
             'http://localhost', 'foo', 'bar', mock.MockObject())
@@ -1453,12 +1800,25 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
     def testGetTargets(self):
         client = rbuilderfacade.RbuilderRESTClient(
             'http://localhost', 'foo', 'bar', mock.MockObject())
+        Target = namedtuple('Target', 'target_id name')
+        foo, bar = Target('1', 'foo'), Target('2', 'bar')
         mock.mock(client, '_getResources')
-        client._getResources._mock.setReturn(['foo', 'bar'], 'targets')
-        client._getResources._mock.setReturn(['foo'], 'targets', name='foo')
-        client._getResources._mock.setReturn(['foo'], 'targets', name='foo')
-        self.assertEqual(client.getTargets(), ['foo', 'bar'])
-        self.assertEqual(client.getTargets(name='foo'), ['foo'])
+        client._getResources._mock.setReturn([foo, bar], 'targets')
+        client._getResources._mock.setReturn([foo], 'targets', name='foo')
+        self.assertEqual(client.getTargets(), [foo, bar])
+        self.assertEqual(client.getTargets(name='foo'), [foo])
+
+        # results are checked against the filters, in case the server
+        # ignored them
+        client._getResources._mock.setReturn([foo, bar], 'targets',
+                                             name='bar')
+        self.assertEqual(client.getTargets(name='bar'), [bar])
+        client._getResources._mock.setReturn([foo, bar], 'targets',
+                                             target_id=['2', '3'])
+        self.assertEqual(client.getTargets(target_id=['2', '3']), [bar])
+        client._getResources._mock.setReturn([foo, bar], 'targets',
+                                             name='baz', order_by='name')
+        self.assertEqual(client.getTargets(name='baz', order_by='name'), [])
 
     def testGetImages(self):
         client = rbuilderfacade.RbuilderRESTClient(
@@ -1587,9 +1947,156 @@ class RbuilderRESTClientTest(rbuildhelp.RbuildHelper):
             'custom_uri',
             )
 
+        client._api._client.do_GET._mock.setReturn(
+            'projects_any',
+            "http://localhost/projects"
+                ';filter_by=AND(OR(EQUAL(name,"foo"),EQUAL(name,"bar")))',
+            )
+        self.assertEquals(
+            client._getResources('projects', name=['foo', 'bar']),
+            'projects_any',
+            )
+
         client._api._client.do_GET._mock.raiseErrorOnAccess(
             robj.errors.HTTPNotFoundError(uri='foo', status='404',
                                           reason='', response=''))
         err = self.assertRaises(
             errors.RbuildError, client._getResources, 'projects')
         self.assertIn('Unable to fetch', str(err))
+
+    def test_getResourcesPaged(self):
+        client = rbuilderfacade.RbuilderRESTClient(
+            'http://localhost', 'foo', 'bar', mock.MockObject())
+        mock.mock(client, '_api')
+        client._api._mock.set(_uri='http://localhost')
+        # pages fetched in the background use a client of their own
+        prefetchClient = mock.MockObject()
+        mock.mockMethod(client._newClient, prefetchClient)
+
+        pageUri = ('http://localhost/projects;order_by=name'
+                   ';start_index=%d;limit=%d')
+        client._api._client.do_GET._mock.setReturn(
+            ['p1', 'p2'], pageUri % (0, 2))
+        prefetchClient.do_GET._mock.setReturn(['p3', 'p4'], pageUri % (2, 2))
+        prefetchClient.do_GET._mock.setReturn(['p5'], pageUri % (4, 2))
+        prefetchClient.do_GET._mock.setReturn(['p3'], pageUri % (2, 1))
+
+        results = client._getResources('projects', order_by='name',
+                                       page_size=2)
+        self.assertFalse(isinstance(results, list))
+        self.assertTrue(results)
+        self.assertEqual(list(results), ['p1', 'p2', 'p3', 'p4', 'p5'])
+        client._api._client.do_GET._mock.assertCalled(pageUri % (0, 2))
+        client._api._client.do_GET._mock.assertNotCalled()
+        # one client serves all the later pages of a collection
+        client._newClient._mock.assertCalled()
+        client._newClient._mock.assertNotCalled()
+
+        results = client._getResources('projects', order_by='name',
+                                       page_size=2, limit=3)
+        self.assertEqual(list(results), ['p1', 'p2', 'p3'])
+
+        # a server that ignores paging returns everything at once
+        client._api._client.do_GET._mock.setReturn(
+            ['p1', 'p2', 'p3'], pageUri % (0, 2))
+        results = client._getResources('projects', order_by='name',
+                                       page_size=2)
+        self.assertEqual(list(results), ['p1', 'p2', 'p3'])
+
+        client._api._client.do_GET._mock.setReturn([], pageUri % (0, 2))
+        self.assertFalse(client._getResources('projects', order_by='name',
+                                              page_size=2))
+
+        # errors fetching later pages are raised to the caller
+        client._api._client.do_GET._mock.setReturn(
+            ['p1', 'p2'], pageUri % (0, 2))
+        results = client._getResources('projects', order_by='name',
+                                       page_size=2)
+        prefetchClient.do_GET._mock.raiseErrorOnAccess(
+            robj.errors.HTTPNotFoundError(uri='foo', status='404',
+                                          reason='', response=''))
+        err = self.assertRaises(errors.RbuildError, list, results)
+        self.assertIn('Unable to fetch', str(err))
+
+
+class JobWaiterTest(rbuildhelp.RbuildHelper):
+    def _job(self, states, status='status'):
+        job = mock.MockObject()
+        job.job_state._mock.set(name=states.pop(0))
+        job._mock.set(status_text=status)
+        def _refresh():
+            job._mock.set(refreshed=getattr(job, 'refreshed', 0) + 1)
+            if states:
+                job.job_state._mock.set(name=states.pop(0))
+        job._mock.set(refresh=_refresh, refreshed=0)
+        return job
+
+    def testWait(self):
+        mock.mock(time, 'sleep')
+        mock.mock(rbuilderfacade.random, 'uniform', 0)
+        job1 = self._job(['Queued', 'Running', 'Running', 'Running',
+                          'Running', 'Completed'], 'one')
+        job2 = self._job(['Running', 'Failed'], 'two')
+        seen = []
+        waiter = rbuilderfacade.JobWaiter(interval=1, maxInterval=3,
+                                          backoff=2)
+        rv = waiter.wait([job1, job2],
+            callback=lambda x: seen.append((x.status_text, x.job_state.name)))
+        self.assertEqual(len(rv), 2)
+
+        # both jobs share one schedule, which backs off while nothing
+        # changes and is reset by a change
+        self.assertEqual([x[0][0] for x in time.sleep._mock.calls],
+                         [1, 1, 2, 3, 3])
+        self.assertEqual(job1.refreshed, 5)
+        self.assertEqual(job2.refreshed, 1)
+        self.assertEqual(seen, [('one', 'Queued'), ('two', 'Running'),
+            ('one', 'Running'), ('two', 'Failed'), ('one', 'Completed')])
+
+        # finished jobs are not polled
+        time.sleep._mock.calls = []
+        job = self._job(['Completed'])
+        waiter.wait([job])
+        self.assertEqual(time.sleep._mock.calls, [])
+        self.assertEqual(job.refreshed, 0)
+
+    def testWaitJitter(self):
+        mock.mock(time, 'sleep')
+        mock.mock(rbuilderfacade.random, 'uniform')
+        rbuilderfacade.random.uniform._mock.setReturn(0.1, -0.1, 0.1)
+        waiter = rbuilderfacade.JobWaiter(interval=2)
+        waiter.wait([self._job(['Running', 'Completed'])])
+        time.sleep._mock.assertCalled(2.2)
+
+    def testWaitTimeout(self):
+        mock.mock(time, 'sleep')
+        mock.mock(time, 'time')
+        time.time._mock.setReturns([100, 100, 105, 110])
+        waiter = rbuilderfacade.JobWaiter(interval=10, jitter=0, timeout=10)
+        job = self._job(['Running'] * 5)
+        err = self.assertRaises(errors.JobTimeoutError, waiter.wait, [job])
+        self.assertEqual(str(err),
+            'Timed out after 10 seconds waiting for rBuilder jobs')
+        # the last sleep is cut short at the deadline
+        time.sleep._mock.assertCalled(10)
+        time.sleep._mock.assertCalled(5)
+        time.sleep._mock.assertNotCalled()
+
+    def testWaitCancel(self):
+        cancel = mock.MockObject()
+        cancel.isSet._mock.setReturns([False, True])
+        waiter = rbuilderfacade.JobWaiter(interval=1, jitter=0)
+        job = self._job(['Running'] * 5)
+        self.assertEqual(waiter.wait([job], cancel=cancel), [job])
+        cancel.wait._mock.assertCalled(1)
+        self.assertEqual(job.refreshed, 0)
+
+    def testFromConfig(self):
+        cfg = mock.MockObject(jobTimeout=0)
+        self.assertEqual(
+            rbuilderfacade.JobWaiter.fromConfig(cfg).timeout, None)
+        cfg = mock.MockObject(jobTimeout=60)
+        self.assertEqual(
+            rbuilderfacade.JobWaiter.fromConfig(cfg).timeout, 60)
+        self.assertEqual(
+            rbuilderfacade.JobWaiter.fromConfig(cfg, timeout=5).timeout, 5)
@@ -380,9 +380,11 @@ class RmakeFacadeTest(rbuildhelp.RbuildHelper):
             [osPathItem, dynPathItem])
 
         friendTup = ('friend', 'localhost@foo:bar/4-5-6', None)
+        snapshotPath = self.workDir + '/.rbuild/labelsnapshots/QA'
+        handle.productStore.getLabelSnapshotPath._mock.setReturn(snapshotPath)
         mock.mockMethod(handle.facade.conary.getLatestPackagesOnLabel)
         handle.facade.conary.getLatestPackagesOnLabel._mock.setReturn(
-            [friendTup], 'localhost@foo:bar')
+            [friendTup], 'localhost@foo:bar', snapshotPath=snapshotPath)
 
         def createBuildJob(itemList, rebuild=False, recurseGroups=False,
                            limitToLabels=None, buildConfig=None, **kwargs):
@@ -429,13 +431,21 @@ class RmakeFacadeTest(rbuildhelp.RbuildHelper):
         client.buildJob._mock.assertCalled(1)
 
     def testWatchAndCommitJob(self):
-        _, facade = self.prep()
+        handle, facade = self.prep()
         mock.mockMethod(facade._getRmakeHelper)
+        mock.mockMethod(handle.facade.conary._repositoryChanged)
         client = mock.MockObject()
         facade._getRmakeHelper._mock.setDefaultReturn(client)
-        facade.watchAndCommitJob(1, '')
+        client.watch._mock.setDefaultReturn(True)
+        self.assertEquals(facade.watchAndCommitJob(1, ''), True)
         client.watch._mock.assertCalled(1, commit=True, showTroveLogs=True,
             showBuildLogs=True, message='Automatic commit by rbuild')
+        # the trove index is brought up to date with the commit
+        handle.facade.conary._repositoryChanged._mock.assertCalled()
+
+        client.watch._mock.setDefaultReturn(False)
+        self.assertEquals(facade.watchAndCommitJob(1, ''), False)
+        handle.facade.conary._repositoryChanged._mock.assertNotCalled()
 
     def testWatchJob(self):
         _, facade = self.prep()
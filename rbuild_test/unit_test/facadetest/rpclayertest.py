@@ -23,7 +23,13 @@ and the error handling and scrubbing it provides.
 
 
 from rbuild_test import rbuildhelp
+import base64
+import errno
+import httplib
+import socket
+import threading
 import xmlrpclib
+from StringIO import StringIO
 
 from conary.lib import util
 from rbuild import facade
@@ -69,6 +75,46 @@ class MockTransport(object):
                 "%r (actual) != %r (expected)" % (calls, self.calls))
 
 
+class MockResponse(object):
+    status = 200
+
+    def __init__(self, body):
+        self.body = StringIO(body)
+
+    def getheader(self, name, default=None):
+        return default
+
+    def read(self, amt=None):
+        return self.body.read(amt)
+
+
+class MockConnection(object):
+    instances = []
+    stale = False
+
+    def __init__(self, host):
+        self.host = host
+        self.closed = False
+        self.headers = []
+        self.instances.append(self)
+
+    def putrequest(self, *args, **kwargs):
+        pass
+
+    def putheader(self, *args):
+        self.headers.append(args)
+
+    def endheaders(self, body=None):
+        if self.stale:
+            raise socket.error(errno.EPIPE, 'Broken pipe')
+
+    def getresponse(self, buffering=False):
+        return MockResponse(xmlrpclib.dumps(('ok',), methodresponse=True))
+
+    def close(self):
+        self.closed = True
+
+
 class RPCLayerTest(rbuildhelp.RbuildHelper):
     def testProtectedCall(self):
         """
@@ -119,4 +165,58 @@ class RPCLayerTest(rbuildhelp.RbuildHelper):
         transport.assertCalled('foo', 'bar', 'www.example.foo', '/',
             'doStuff')
 
+    def testPooledTransport(self):
+        """
+        Ensure that connections are kept open across calls and proxies,
+        and that a connection closed by the server is replaced.
+        """
+        self.mock(MockConnection, 'instances', [])
+        self.mock(httplib, 'HTTPConnection', MockConnection)
+        transport = facade.PooledTransport()
+        server = facade.ServerProxy('http://www.example.foo/',
+            username='foo', password='bar', transport=transport)
+        other = facade.ServerProxy('http://www.example.foo/',
+            username='baz', password='bar', transport=transport)
+        self.failUnlessEqual(server.doStuff(), 'ok')
+        self.failUnlessEqual(other.doStuff(), 'ok')
+        self.failUnlessEqual(len(MockConnection.instances), 1)
+        connection = MockConnection.instances[0]
+        self.failUnlessEqual(connection.host, 'www.example.foo')
+        self.failIf(connection.closed)
+
+        connection.stale = True
+        self.failUnlessEqual(server.doStuff(), 'ok')
+        self.failUnlessEqual(len(MockConnection.instances), 2)
+        self.failUnless(connection.closed)
+
+        # a new connection that fails is not retried
+        self.mock(MockConnection, 'stale', True)
+        transport = facade.PooledTransport()
+        server = facade.ServerProxy('http://www.example.foo/',
+            transport=transport)
+        self.assertRaises(socket.error, server.doStuff)
+        self.failUnlessEqual(len(MockConnection.instances), 3)
 
+    def testPooledTransportCredentials(self):
+        """
+        Ensure that a request sends the credentials of its own proxy, even
+        when another thread uses the transport meanwhile.
+        """
+        self.mock(MockConnection, 'instances', [])
+        self.mock(httplib, 'HTTPConnection', MockConnection)
+        transport = facade.PooledTransport()
+        connection = transport.make_connection('foo:bar@www.example.foo')
+        other = threading.Thread(target=transport.make_connection,
+                                 args=('baz:qux@www.example.foo',))
+        other.start()
+        other.join()
+        transport.send_host(connection, 'foo:bar@www.example.foo')
+        self.failUnlessEqual(connection.headers, [('Authorization',
+            'Basic ' + base64.b64encode('foo:bar'))])
+
+    def testDefaultTransport(self):
+        server = facade.ServerProxy('https://www.example.foo/',
+            username='foo', password='bar')
+        transport = server._ServerProxy__transport
+        self.failUnless(isinstance(transport, facade.PooledTransport))
+        self.failUnless(transport.secure)
@@ -24,6 +24,7 @@ from rbuild import errors
 from rbuild import handle
 from rbuild import rbuildcfg
 from rbuild import ui
+from rbuild.facade import conaryfacade
 
 class HandleTest(rbuildhelp.RbuildHelper):
 
@@ -89,6 +90,35 @@ class HandleTest(rbuildhelp.RbuildHelper):
         self.assertEquals(handle.product, 'product')
         cfg.readObject._mock.assertCalled('INTERNAL', 'rbuildConfigData')
 
+    def testProductLoadedOnDemand(self):
+        productStore = mock.MockObject()
+        productStore.getProduct._mock.setDefaultReturn('product')
+        handle = self.getRbuildHandle(pluginManager=mock.MockObject(),
+                                      productStore=productStore)
+        productStore.getProduct._mock.assertNotCalled()
+        self.assertEquals(handle.product, 'product')
+        self.assertEquals(handle.product, 'product')
+        productStore.getProduct._mock.assertCalled()
+        productStore.getProduct._mock.assertNotCalled()
+
+        handle.product = 'other'
+        self.assertEquals(handle.product, 'other')
+        productStore.getProduct._mock.assertNotCalled()
+
+    def testFacadesLoadedOnDemand(self):
+        mock.mock(conaryfacade, 'ConaryFacade')
+        h = self.getRbuildHandle(pluginManager=mock.MockObject(),
+                                 productStore=mock.MockObject())
+        conaryfacade.ConaryFacade._mock.assertNotCalled()
+        self.failIf(h.facade.isLoaded('conary'))
+
+        facade = h.facade.conary
+        conaryfacade.ConaryFacade._mock.assertCalled(h)
+        self.failUnless(h.facade.conary is facade)
+        conaryfacade.ConaryFacade._mock.assertNotCalled()
+        self.failUnless(h.facade.isLoaded('conary'))
+        self.failIf(h.facade.isLoaded('rmake'))
+
     def testProxyMissingPlugin(self):
         """
         Handle should raise a KeyError when a missing plugin is accessed
@@ -0,0 +1,132 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import json
+import mimetools
+import os
+import urllib2
+from StringIO import StringIO
+
+from conary.lib import digestlib
+
+from rbuild_test import rbuildhelp
+
+from rbuild import errors
+from rbuild.internal import download
+
+
+URL = 'http://localhost/downloadImage?fileId=1'
+BODY = ''.join(chr(x) for x in range(100))
+SHA1 = digestlib.sha1(BODY).hexdigest()
+
+
+class DownloaderTest(rbuildhelp.RbuildHelper):
+    def getDownloader(self, ranges=True, fail=None):
+        self.requests = []
+        downloader = download.Downloader(workers=3, chunkSize=16)
+
+        def _open(request):
+            rangeHeader = request.get_header('Range')
+            self.requests.append(rangeHeader)
+            if fail and rangeHeader == fail:
+                raise urllib2.URLError('connection reset')
+            headers = mimetools.Message(StringIO(''))
+            if ranges and rangeHeader:
+                start, end = [int(x) for x in rangeHeader[6:].split('-')]
+                return urllib2.addinfourl(StringIO(BODY[start:end + 1]),
+                    headers, URL, 206)
+            return urllib2.addinfourl(StringIO(BODY), headers, URL, 200)
+        self.mock(downloader, '_open', _open)
+        return downloader
+
+    def getFile(self, **kwargs):
+        kwargs.setdefault('size', len(BODY))
+        kwargs.setdefault('sha1', SHA1)
+        return download.FileDownload(URL, self.workDir + '/image.iso',
+                                     **kwargs)
+
+    def testFetchRanges(self):
+        downloader = self.getDownloader()
+        fileDownload = self.getFile()
+        self.assertEqual(downloader.fetch([fileDownload]),
+                         [(fileDownload, None)])
+        self.assertEqual(sorted(self.requests),
+            sorted('bytes=%d-%d' % (x, min(x + 15, 99))
+                   for x in range(0, 100, 16)))
+        self.assertEqual(open(fileDownload.path).read(), BODY)
+        self.assertFalse(os.path.exists(fileDownload.partPath))
+        self.assertFalse(os.path.exists(fileDownload.statePath))
+        self.assertFalse(fileDownload.skipped)
+
+        # a file that is already present is not fetched again
+        downloader = self.getDownloader()
+        self.assertEqual(downloader.fetch([fileDownload]),
+                         [(fileDownload, None)])
+        self.assertEqual(self.requests, [])
+        self.assertTrue(fileDownload.skipped)
+
+    def testResume(self):
+        downloader = self.getDownloader(fail='bytes=32-47')
+        fileDownload = self.getFile()
+        (_, err), = downloader.fetch([fileDownload])
+        self.assertEqual(str(err), '<urlopen error connection reset>')
+        self.assertFalse(os.path.exists(fileDownload.path))
+        state = json.load(open(fileDownload.statePath))
+        self.assertNotIn(2, state['done'])
+
+        # only the missing ranges are fetched
+        downloader = self.getDownloader()
+        self.assertEqual(downloader.fetch([fileDownload]),
+                         [(fileDownload, None)])
+        self.assertEqual(sorted(self.requests),
+            sorted('bytes=%d-%d' % (x * 16, min(x * 16 + 15, 99))
+                   for x in range(7) if x not in state['done']))
+        self.assertEqual(open(fileDownload.path).read(), BODY)
+        self.assertFalse(os.path.exists(fileDownload.statePath))
+
+    def testMismatch(self):
+        downloader = self.getDownloader()
+        fileDownload = self.getFile(sha1='0' * 40)
+        (_, err), = downloader.fetch([fileDownload])
+        self.assertEqual(err.__class__, errors.DownloadError)
+        self.assertEqual(str(err), 'Download of %s failed: expected SHA-1 %s,'
+            ' received %s' % (fileDownload.path, '0' * 40, SHA1))
+        self.assertFalse(os.path.exists(fileDownload.path))
+        self.assertFalse(os.path.exists(fileDownload.partPath))
+        self.assertFalse(os.path.exists(fileDownload.statePath))
+
+        fileDownload = self.getFile(size=101, sha1=None)
+        (_, err), = downloader.fetch([fileDownload])
+        self.assertEqual(err.__class__, errors.DownloadError)
+
+    def testFetchStream(self):
+        # servers that ignore ranges send the whole file at once
+        downloader = self.getDownloader(ranges=False)
+        fileDownload = self.getFile()
+        self.assertEqual(downloader.fetch([fileDownload]),
+                         [(fileDownload, None)])
+        self.assertEqual(open(fileDownload.path).read(), BODY)
+        self.assertFalse(os.path.exists(fileDownload.statePath))
+
+        # as are files of unknown size
+        os.remove(fileDownload.path)
+        downloader = self.getDownloader()
+        fileDownload = self.getFile(size=None)
+        self.assertEqual(downloader.fetch([fileDownload]),
+                         [(fileDownload, None)])
+        self.assertEqual(self.requests, [None])
+        self.assertEqual(open(fileDownload.path).read(), BODY)
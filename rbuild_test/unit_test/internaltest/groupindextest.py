@@ -0,0 +1,77 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from conary.deps.deps import parseFlavor as Flavor
+from conary.versions import ThawVersion
+
+from rbuild_test import rbuildhelp
+
+from rbuild.internal import groupindex
+
+
+GROUP = ('group-os', ThawVersion('/localhost@rpl:1/1:1.0-1-1'), Flavor(''))
+FOO = ('foo', ThawVersion('/localhost@rpl:1/2:1.0-1-1'), Flavor('is: x86'))
+FOO64 = ('foo', ThawVersion('/localhost@rpl:1/2:1.0-1-1'),
+         Flavor('is: x86_64'))
+BAR = ('bar:runtime', ThawVersion('/localhost@rpl:1/3:2.0-1-1'), Flavor(''))
+
+
+class GroupIndexTest(rbuildhelp.RbuildHelper):
+    def testAddAndGet(self):
+        indexDir = self.workDir + '/groups'
+        index = groupindex.GroupIndex(indexDir)
+        self.assertEqual(index.get(GROUP), None)
+        contents = index.add(GROUP, iter([FOO, BAR, FOO64]))
+        self.assertEqual(contents.find('foo'), [FOO, FOO64])
+        self.assertEqual(list(contents.iterNames()), ['bar:runtime', 'foo'])
+        self.assertEqual(index.get(GROUP).find('foo'), [FOO, FOO64])
+
+        # a new index reads the group back from disk
+        index = groupindex.GroupIndex(indexDir)
+        contents = index.get(GROUP)
+        self.assertEqual(contents.find('foo'), [FOO, FOO64])
+        self.assertEqual(contents.find('bar:runtime'), [BAR])
+        self.assertEqual(contents.find('baz'), [])
+        # timestamps survive the round trip
+        self.assertEqual(contents.find('foo')[0][1].freeze(), FOO[1].freeze())
+
+        # other versions of the group are not indexed
+        otherGroup = ('group-os', ThawVersion('/localhost@rpl:1/4:1.0-2-1'),
+                      Flavor(''))
+        self.assertEqual(index.get(otherGroup), None)
+
+    def testSearchPaths(self):
+        indexDir = self.workDir + '/groups'
+        index = groupindex.GroupIndex(indexDir)
+        searchPath = ('group-os', 'localhost@rpl:1', None)
+        self.assertEqual(index.getResolved(searchPath), None)
+        index.setResolved(searchPath, [GROUP])
+        self.assertEqual(index.getResolved(searchPath), [GROUP])
+
+        index = groupindex.GroupIndex(indexDir)
+        self.assertEqual(index.getResolved(searchPath), [GROUP])
+        self.assertEqual(
+            index.getResolved(('group-os', 'localhost@rpl:2', None)), None)
+
+    def testMemoryOnly(self):
+        index = groupindex.GroupIndex(None)
+        index.add(GROUP, [FOO])
+        index.setResolved(('group-os', 'localhost@rpl:1', None), [GROUP])
+        self.assertEqual(index.get(GROUP).find('foo'), [FOO])
+        self.assertEqual(
+            index.getResolved(('group-os', 'localhost@rpl:1', None)), [GROUP])
+        self.assertEqual(groupindex.GroupIndex(None).get(GROUP), None)
@@ -0,0 +1,83 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import os
+import time
+
+from rbuild_test import rbuildhelp
+
+from rbuild.internal import historycache
+
+
+class HistoryCacheTest(rbuildhelp.RbuildHelper):
+    def testGetSet(self):
+        cacheDir = self.workDir + '/history'
+        cache = historycache.HistoryCache(cacheDir)
+        self.assertEquals(cache.getLog('foo:source', '/a@b:c/1-1'), None)
+        cache.setLog('foo:source', '/a@b:c/1-1', ['log\n'])
+        cache.setDiff('foo:source', '/a@b:c/1-1', '/a@b:c/2-1',
+                      ['diff\xff\n'])
+        self.assertEquals(cache.getLog('foo:source', '/a@b:c/1-1'),
+                          ['log\n'])
+
+        cache = historycache.HistoryCache(cacheDir)
+        self.assertEquals(cache.getLog('foo:source', '/a@b:c/1-1'),
+                          ['log\n'])
+        self.assertEquals(cache.getLog('foo:source', '/a@b:c/2-1'), None)
+        self.assertEquals(cache.getDiff('foo:source', '/a@b:c/1-1',
+                                        '/a@b:c/2-1'), ['diff\xff\n'])
+        self.assertEquals(cache.getDiff('foo:source', '/a@b:c/2-1',
+                                        '/a@b:c/1-1'), None)
+
+        # damaged entries, or those left by older versions, are misses
+        path = cache._getPath(('log', 'foo:source', '/a@b:c/1-1'))
+        for data in ('(lp0\n.', '{}', '[["log"], "x"]'):
+            open(path, 'w').write(data)
+            self.assertEquals(cache.getLog('foo:source', '/a@b:c/1-1'),
+                              None)
+
+    def testEviction(self):
+        cacheDir = self.workDir + '/history'
+        cache = historycache.HistoryCache(cacheDir)
+        cache.setLog('foo:source', '1', ['x' * 100])
+        entrySize = sum(os.stat(os.path.join(cacheDir, x)).st_size
+                        for x in os.listdir(cacheDir))
+
+        cache = historycache.HistoryCache(cacheDir, maxSize=entrySize * 3)
+        cache.setLog('foo:source', '2', ['y' * 100])
+        cache.setLog('foo:source', '3', ['z' * 100])
+        # make the entries look used in order, then use the oldest again
+        for n, version in enumerate(('1', '2', '3')):
+            path = cache._getPath(('log', 'foo:source', version))
+            then = time.time() - 100 + n
+            os.utime(path, (then, then))
+        self.assertEquals(cache.getLog('foo:source', '1'), ['x' * 100])
+
+        # the least recently used entries go first
+        cache.setLog('foo:source', '4', ['w' * 100])
+        self.assertEquals(cache.getLog('foo:source', '2'), None)
+        self.assertEquals(cache.getLog('foo:source', '1'), ['x' * 100])
+        self.assertEquals(cache.getLog('foo:source', '4'), ['w' * 100])
+
+        # entries larger than the whole cache are not kept
+        cache.setLog('foo:source', '5', ['v' * entrySize * 4])
+        self.assertEquals(cache.getLog('foo:source', '5'), None)
+
+    def testDisabled(self):
+        cache = historycache.HistoryCache(None)
+        cache.setLog('foo:source', '1', ['log\n'])
+        self.assertEquals(cache.getLog('foo:source', '1'), None)
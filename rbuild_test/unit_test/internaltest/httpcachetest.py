@@ -0,0 +1,156 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import mimetools
+import os
+import time
+import urllib2
+from StringIO import StringIO
+
+from rbuild_test import rbuildhelp
+
+from rbuild.internal import httpcache
+from testutils import mock
+
+
+URL = 'http://localhost/api/v1/platforms'
+
+
+class ResponseCacheTest(rbuildhelp.RbuildHelper):
+    def getCache(self, **kwargs):
+        self.cacheDir = self.workDir + '/cache'
+        cache = httpcache.ResponseCache(self.cacheDir, **kwargs)
+        mock.mockMethod(cache._open)
+        return cache
+
+    def _response(self, body, **headers):
+        return urllib2.addinfourl(StringIO(body), mimetools.Message(
+            StringIO(''.join('%s: %s\n' % x for x in headers.items()))), URL)
+
+    def _notModifiedError(self):
+        return urllib2.HTTPError(URL, 304, 'Not Modified', None, None)
+
+    def testGetStoresAndReuses(self):
+        cache = self.getCache(timeouts={'platforms': 3600})
+        cache._open._mock.setDefaultReturn(
+            self._response('<platforms/>', ETag='"abc"'))
+        self.assertEqual(cache.get(URL, 'platforms', 'foo', 'bar'),
+            '<platforms/>')
+        cache._open._mock.assertCalled(URL, {}, 'foo', 'bar')
+
+        # fresh entries are returned without contacting the server
+        self.assertEqual(cache.get(URL, 'platforms', 'foo', 'bar'),
+            '<platforms/>')
+        cache._open._mock.assertNotCalled()
+
+        # entries are private to the user
+        cache.get(URL, 'platforms', 'other', 'pass')
+        cache._open._mock.assertCalled(URL, {}, 'other', 'pass')
+        for name in os.listdir(self.cacheDir):
+            self.assertEqual(
+                os.stat(os.path.join(self.cacheDir, name)).st_mode & 0777,
+                0600)
+
+    def testRevalidate(self):
+        cache = self.getCache(timeouts={'platforms': 0})
+        cache._open._mock.setDefaultReturn(self._response('<platforms/>',
+            ETag='"abc"', **{'Last-Modified': 'Mon, 01 Jan 2018 00:00:00 GMT'}))
+        cache.get(URL, 'platforms', 'foo', 'bar')
+
+        cache = self.getCache(timeouts={'platforms': 0})
+        cache._open._mock.raiseErrorOnAccess(self._notModifiedError())
+        self.assertEqual(cache.get(URL, 'platforms', 'foo', 'bar'),
+            '<platforms/>')
+        cache._open._mock.assertCalled(URL, {'If-None-Match': '"abc"',
+            'If-Modified-Since': 'Mon, 01 Jan 2018 00:00:00 GMT'},
+            'foo', 'bar')
+
+        # a changed resource replaces the cached body
+        cache = self.getCache(timeouts={'platforms': 0})
+        cache._open._mock.setDefaultReturn(self._response('<new/>'))
+        self.assertEqual(cache.get(URL, 'platforms', 'foo', 'bar'), '<new/>')
+
+    def testErrors(self):
+        cache = self.getCache()
+        cache._open._mock.raiseErrorOnAccess(self._notModifiedError())
+        # a 304 without a cached copy is passed to the caller
+        self.assertRaises(urllib2.HTTPError, cache.get, URL, 'platforms')
+
+    def testDisabled(self):
+        cache = self.getCache(enabled=False)
+        cache._open._mock.setDefaultReturn(self._response('<platforms/>'))
+        cache.get(URL, 'platforms')
+        cache.get(URL, 'platforms')
+        cache._open._mock.assertCalled(URL, {}, None, None)
+        cache._open._mock.assertCalled(URL, {}, None, None)
+        self.assertFalse(os.path.exists(self.cacheDir))
+
+    def testInvalidate(self):
+        cache = self.getCache()
+        cache._open._mock.setDefaultReturn(self._response('<platforms/>'))
+        cache.get(URL, 'platforms', 'foo')
+        cache._open._mock.assertCalled(URL, {}, 'foo', None)
+        cache.invalidate(URL, 'foo')
+        self.assertEqual(os.listdir(self.cacheDir), [])
+        cache.get(URL, 'platforms', 'foo')
+        cache._open._mock.assertCalled(URL, {}, 'foo', None)
+
+    def testGetStale(self):
+        cache = self.getCache(timeouts={'platforms': 0})
+        self.assertEqual(cache.getStale(URL), None)
+        cache._open._mock.setDefaultReturn(self._response('<platforms/>'))
+        cache.get(URL, 'platforms')
+        cache._open._mock.raiseErrorOnAccess(
+            urllib2.URLError('timed out'))
+        self.assertRaises(urllib2.URLError, cache.get, URL, 'platforms')
+        # the expired copy is still there to fall back to
+        self.assertEqual(cache.getStale(URL), '<platforms/>')
+        self.assertEqual(cache.getStale(URL, 'foo'), None)
+
+        cache = self.getCache(enabled=False)
+        self.assertEqual(cache.getStale(URL), None)
+
+    def testTouch(self):
+        cache = self.getCache(timeouts={'platforms': 3600})
+        # nothing to touch
+        cache.touch(URL, 'platforms')
+        self.assertFalse(os.path.exists(self.cacheDir))
+
+        cache._open._mock.setDefaultReturn(self._response('<platforms/>'))
+        cache.get(URL, 'platforms')
+        cache._open._mock.assertCalled(URL, {}, None, None)
+        now = time.time() + 7200
+        self.mock(time, 'time', lambda: now)
+        cache.touch(URL, 'platforms', seconds=60)
+        self.assertEqual(cache.get(URL, 'platforms'), '<platforms/>')
+        cache._open._mock.assertNotCalled()
+
+        # the copy is revalidated once the given time is up
+        now += 61
+        cache.get(URL, 'platforms')
+        cache._open._mock.assertCalled(URL, {}, None, None)
+
+    def testRequestTimeout(self):
+        cache = httpcache.ResponseCache(self.workDir + '/cache',
+                                        requestTimeout=5)
+        response = self._response('<platforms/>')
+        self.mock(urllib2, 'urlopen', mock.MockObject())
+        urllib2.urlopen._mock.setDefaultReturn(response)
+        self.assertEqual(cache.get(URL, 'platforms'), '<platforms/>')
+        args, kwargs = urllib2.urlopen._mock.popCall()
+        self.assertEqual(args[0].get_full_url(), URL)
+        self.assertEqual(kwargs, (('timeout', 5),))
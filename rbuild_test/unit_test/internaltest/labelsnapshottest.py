@@ -0,0 +1,119 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import json
+
+from rbuild_test import rbuildhelp
+from rbuild_test.unit_test.internaltest.troveindextest import FakeRepos
+
+from conary import errors as conaryerrors
+from conary import trove
+from conary import versions
+
+from rbuild.internal import labelsnapshot
+
+
+class LabelSnapshotTest(rbuildhelp.RbuildHelper):
+    def _flavors(self, latest, name, version):
+        return sorted(str(x)
+                      for x in latest[name][versions.ThawVersion(version)])
+
+    def _setMark(self, path, mark):
+        data = json.load(open(path))
+        data['mark'] = mark
+        json.dump(data, open(path, 'w'))
+
+    def testIncremental(self):
+        path = self.workDir + '/labelsnapshots/devel'
+        label = versions.Label('localhost@rpl:1')
+        repos = FakeRepos()
+        repos.setLatest('foo', '/localhost@rpl:1/21.0:1.0-2-1',
+                        'is: x86', 'is: x86_64')
+        snapshot = labelsnapshot.LabelSnapshot(path)
+        latest = snapshot.getTroveLatestByLabel(repos, label)
+        self.assertEquals(repos.fetches, 1)
+        self.assertEquals(self._flavors(latest, 'foo',
+                                        '/localhost@rpl:1/21.0:1.0-2-1'),
+                          ['is: x86', 'is: x86_64'])
+
+        # only the troves changed on the label since are merged in
+        self._setMark(path, '10')
+        repos.add(11, 'foo', '/localhost@rpl:1/30.0:1.0-3-1', 'is: x86')
+        repos.add(12, 'foo', '/localhost@rpl:2/31.0:1.0-1-1', 'is: x86')
+        repos.add(13, 'bar', '/localhost@rpl:1/32.0:1.0-1-1')
+        latest = labelsnapshot.LabelSnapshot(path).getTroveLatestByLabel(
+            repos, label)
+        self.assertEquals(repos.fetches, 1)
+        self.assertEquals(repos.marks, ['10', '12.0', '13.0'])
+        self.assertEquals(sorted(latest), ['bar', 'foo'])
+        self.assertEquals(latest['foo'].keys(),
+            [versions.ThawVersion('/localhost@rpl:1/30.0:1.0-3-1')])
+        self.assertEquals(self._flavors(latest, 'foo',
+                                        '/localhost@rpl:1/30.0:1.0-3-1'),
+                          ['is: x86'])
+
+        # removing an older version changes nothing
+        repos.marks = []
+        repos.add(14, 'foo', '/localhost@rpl:1/21.0:1.0-2-1', 'is: x86',
+                  troveType=trove.TROVE_TYPE_REMOVED)
+        latest = labelsnapshot.LabelSnapshot(path).getTroveLatestByLabel(
+            repos, label)
+        self.assertEquals(repos.fetches, 1)
+        self.assertEquals(repos.marks, ['13.0', '14.0'])
+        self.assertEquals(latest['foo'].keys(),
+            [versions.ThawVersion('/localhost@rpl:1/30.0:1.0-3-1')])
+
+        # removing the latest version means taking the snapshot again
+        repos.add(15, 'bar', '/localhost@rpl:1/32.0:1.0-1-1',
+                  troveType=trove.TROVE_TYPE_REMOVED)
+        latest = labelsnapshot.LabelSnapshot(path).getTroveLatestByLabel(
+            repos, label)
+        self.assertEquals(repos.fetches, 2)
+        self.assertEquals(latest['foo'].keys(),
+            [versions.ThawVersion('/localhost@rpl:1/21.0:1.0-2-1')])
+
+    def testRefused(self):
+        path = self.workDir + '/labelsnapshots/devel'
+        label = versions.Label('localhost@rpl:1')
+        repos = FakeRepos()
+        repos.setLatest('foo', '/localhost@rpl:1/21.0:1.0-2-1', 'is: x86')
+        repos.error = conaryerrors.InsufficientPermission()
+        labelsnapshot.LabelSnapshot(path).getTroveLatestByLabel(repos, label)
+        labelsnapshot.LabelSnapshot(path).getTroveLatestByLabel(repos, label)
+        self.assertEquals(repos.fetches, 2)
+        self.assertEquals(len(repos.marks), 1)
+
+        # repositories refusing mirror access are not asked again for a
+        # while
+        latest = labelsnapshot.LabelSnapshot(path).getTroveLatestByLabel(
+            repos, label)
+        self.assertEquals(repos.fetches, 3)
+        self.assertEquals(len(repos.marks), 1)
+        self.assertEquals(latest['foo'].keys(),
+            [versions.ThawVersion('/localhost@rpl:1/21.0:1.0-2-1')])
+
+    def testOtherLabel(self):
+        path = self.workDir + '/labelsnapshots/devel'
+        repos = FakeRepos()
+        repos.setLatest('foo', '/localhost@rpl:1/21.0:1.0-2-1', 'is: x86')
+        labelsnapshot.LabelSnapshot(path).getTroveLatestByLabel(
+            repos, versions.Label('localhost@rpl:1'))
+        # a snapshot of another label is not reused
+        labelsnapshot.LabelSnapshot(path).getTroveLatestByLabel(
+            repos, versions.Label('localhost@rpl:2'))
+        self.assertEquals(repos.fetches, 2)
+        self.assertEquals(repos.marks, [])
@@ -101,6 +101,27 @@ class MainTest(rbuildhelp.RbuildHelper):
         cmd = mainHandler.getCommand(['rbuild', 'build'], self.rbuildCfg)
         self.assertEquals(cmd.__class__.__name__, 'BuildCommand')
 
+    def testGetCommandLoadsNeededPlugins(self):
+        self.rbuildCfg.cacheDirectory = self.workDir + '/cache'
+        self.rbuildCfg.useCache = True
+        # the first run loads all plugins and writes the manifest
+        mainHandler = main.RbuildMain()
+        mainHandler.getCommand(['rbuild', 'help'], self.rbuildCfg)
+        self.assertTrue('Promote' in mainHandler.handle)
+
+        mainHandler = main.RbuildMain()
+        cmd = mainHandler.getCommand(['rbuild', 'build', 'packages'],
+                                     self.rbuildCfg)
+        self.assertEquals(cmd.__class__.__name__, 'BuildCommand')
+        h = mainHandler.handle
+        self.assertTrue('Build' in h)
+        self.assertTrue('BuildPackages' in h)
+        self.assertFalse('Promote' in h)
+        # other plugins are loaded when first used
+        self.assertEquals(h.Promote.__class__.__name__, 'Promote')
+        self.assertTrue('Promote' in h)
+        self.assertRaises(errors.MissingPluginError, getattr, h, 'Bogus')
+
     def testRunCommand(self):
         mainHandler = main.RbuildMain()
 
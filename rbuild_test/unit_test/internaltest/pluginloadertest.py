@@ -0,0 +1,85 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import os
+
+from rbuild_test import rbuildhelp
+
+from rbuild.internal import pluginloader
+
+
+PLUGINS = {
+    'build': dict(className='Build', commands=['build'], extends=[],
+                  eager=False),
+    'buildimages': dict(className='BuildImages', commands=[],
+                        extends=['build'], eager=False),
+    'create': dict(className='Create', commands=['create'], extends=[],
+                   eager=False),
+    'delete': dict(className='Delete', commands=['delete'], extends=[],
+                   eager=False),
+    'users': dict(className='Users', commands=[],
+                  extends=['create', 'delete'], eager=False),
+    'hooks': dict(className='Hooks', commands=[], extends=[], eager=True),
+    }
+
+
+class PluginManifestTest(rbuildhelp.RbuildHelper):
+    def _getManifest(self):
+        return pluginloader.PluginManifest(self.workDir + '/cache/plugins',
+                                           [self.workDir + '/plugins'])
+
+    def testSaveAndLoad(self):
+        os.mkdir(self.workDir + '/plugins')
+        self.writeFile(self.workDir + '/plugins/build.py', '')
+        manifest = self._getManifest()
+        self.assertFalse(manifest.isValid())
+        self.assertEquals(manifest.getPluginsForArgs(['rbuild', 'build']),
+                          None)
+        manifest.save(PLUGINS)
+
+        manifest = self._getManifest()
+        self.assertTrue(manifest.isValid())
+        self.assertEquals(manifest.getPluginNames(), sorted(PLUGINS))
+        self.assertEquals(manifest.getPluginName('BuildImages'),
+                          'buildimages')
+        self.assertEquals(manifest.getClassName('users'), 'Users')
+        self.assertEquals(manifest.getRequiredPlugins('users'),
+                          ['create', 'delete'])
+
+        # changing the plugin directories invalidates the manifest
+        self.writeFile(self.workDir + '/plugins/users.py', '')
+        self.assertFalse(self._getManifest().isValid())
+
+    def testGetPluginsForArgs(self):
+        manifest = self._getManifest()
+        manifest.save(PLUGINS)
+        self.assertEquals(
+            manifest.getPluginsForArgs(['rbuild', 'build', 'images']),
+            set(['build', 'buildimages', 'hooks']))
+        self.assertEquals(
+            manifest.getPluginsForArgs(['rbuild', 'help', 'build']),
+            set(['build', 'buildimages', 'hooks']))
+        # plugins extending other commands need those commands too
+        self.assertEquals(
+            manifest.getPluginsForArgs(['rbuild', 'create', 'user']),
+            set(['create', 'delete', 'users', 'hooks']))
+        # listing all commands needs all plugins
+        self.assertEquals(manifest.getPluginsForArgs(['rbuild']), None)
+        self.assertEquals(manifest.getPluginsForArgs(['rbuild', 'help']),
+                          None)
+        self.assertEquals(manifest.getPluginsForArgs(['rbuild', 'bogus']),
+                          None)
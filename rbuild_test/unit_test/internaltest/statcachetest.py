@@ -0,0 +1,110 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import os
+import time
+
+from testutils import mock
+
+from rbuild_test import rbuildhelp
+
+from rbuild.internal import statcache
+
+
+class StatCacheTest(rbuildhelp.RbuildHelper):
+    def _makeCheckout(self):
+        checkoutDir = self.workDir + '/foo'
+        os.mkdir(checkoutDir)
+        self.writeFile(checkoutDir + '/foo.recipe', 'recipe\n')
+        self.writeFile(checkoutDir + '/CONARY', 'state\n')
+        self._age(checkoutDir + '/foo.recipe')
+        self._age(checkoutDir + '/CONARY')
+        return checkoutDir
+
+    def _age(self, path, seconds=100):
+        then = time.time() - seconds
+        os.utime(path, (then, then))
+
+    def _record(self, cache, checkoutDir, status):
+        snapshot = cache.snapshot(checkoutDir)
+        cache.setStatus(checkoutDir, snapshot, status)
+
+    def testGetStatus(self):
+        checkoutDir = self._makeCheckout()
+        cache = statcache.StatCache(self.workDir + '/statcache')
+        self.assertEquals(cache.getStatus(checkoutDir), None)
+        self._record(cache, checkoutDir, [('M', 'foo.recipe')])
+
+        # unchanged files are not read again
+        mock.mock(statcache.StatCache, '_hash')
+        self.assertEquals(cache.getStatus(checkoutDir),
+                          [('M', 'foo.recipe')])
+        statcache.StatCache._hash._mock.assertNotCalled()
+        self.assertEquals(
+            statcache.StatCache(self.workDir + '/statcache').getStatus(
+                checkoutDir), [('M', 'foo.recipe')])
+        self.unmock()
+
+        # touched files with the same contents keep the status
+        self._age(checkoutDir + '/foo.recipe', 50)
+        self.assertEquals(cache.getStatus(checkoutDir),
+                          [('M', 'foo.recipe')])
+
+        # changed contents, added and removed files do not
+        self.writeFile(checkoutDir + '/foo.recipe', 'other\n')
+        self.assertEquals(cache.getStatus(checkoutDir), None)
+        self._record(cache, checkoutDir, [])
+        self.writeFile(checkoutDir + '/bar', 'bar\n')
+        self.assertEquals(cache.getStatus(checkoutDir), None)
+        self._record(cache, checkoutDir, [('?', 'bar')])
+        os.unlink(checkoutDir + '/bar')
+        self.assertEquals(cache.getStatus(checkoutDir), None)
+
+    def testRacyFiles(self):
+        checkoutDir = self._makeCheckout()
+        cache = statcache.StatCache(self.workDir + '/statcache')
+        # modified in the second the entry is recorded
+        now = time.time() + 1
+        os.utime(checkoutDir + '/foo.recipe', (now, now))
+        self._record(cache, checkoutDir, [])
+
+        self.mock(statcache.StatCache, '_hash', lambda *args: 'changed')
+        self.assertEquals(cache.getStatus(checkoutDir), None)
+
+    def testSnapshot(self):
+        checkoutDir = self._makeCheckout()
+        cache = statcache.StatCache(self.workDir + '/statcache')
+        now = time.time() + 1
+        os.utime(checkoutDir + '/CONARY', (now, now))
+        self._record(cache, checkoutDir, [])
+
+        # only new, changed and racy files are hashed again
+        hashed = []
+        def _hash(checkoutDir, path):
+            hashed.append(path)
+            return 'digest'
+        self.mock(statcache.StatCache, '_hash', staticmethod(_hash))
+        self.writeFile(checkoutDir + '/bar', 'bar\n')
+        snapshot = cache.snapshot(checkoutDir)
+        self.assertEquals(sorted(hashed), ['CONARY', 'bar'])
+        self.assertNotEquals(snapshot['files']['foo.recipe'][4], 'digest')
+
+    def testDisabled(self):
+        checkoutDir = self._makeCheckout()
+        cache = statcache.StatCache(None)
+        self._record(cache, checkoutDir, [])
+        self.assertEquals(cache.getStatus(checkoutDir), None)
@@ -0,0 +1,126 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from rbuild_test import rbuildhelp
+
+from conary import errors as conaryerrors
+from conary import trove
+from conary import versions
+from conary.deps import deps
+
+from rbuild.internal import troveindex
+
+
+class FakeRepos(object):
+    """
+    Serves C{getNewTroveList} two troves at a time, like a repository
+    with a very small reply limit, and the latest troves on a label.
+    """
+    def __init__(self):
+        self.troves = []
+        self.marks = []
+        self.error = None
+        self.latest = {}
+        self.fetches = 0
+
+    def setLatest(self, name, version, *flavors):
+        self.latest.setdefault(name, {})[versions.ThawVersion(version)] = [
+            deps.parseFlavor(x) for x in flavors ]
+
+    def getTroveLatestByLabel(self, query):
+        self.fetches += 1
+        return self.latest
+
+    def add(self, mark, name, version, flavor='',
+            troveType=trove.TROVE_TYPE_NORMAL):
+        self.troves.append((mark, (name, versions.ThawVersion(version),
+                                   deps.parseFlavor(flavor)), troveType))
+
+    def getNewTroveList(self, host, mark):
+        self.marks.append(mark)
+        if self.error:
+            raise self.error
+        return [ x for x in self.troves if x[0] > float(mark) ][:2]
+
+
+class TroveIndexTest(rbuildhelp.RbuildHelper):
+    def testSync(self):
+        path = self.workDir + '/troves.db'
+        repos = FakeRepos()
+        repos.add(1, 'foo:source', '/localhost@rpl:1/10.0:1.0-1')
+        repos.add(2, 'foo:source', '/localhost@rpl:1/20.0:1.0-2')
+        repos.add(3, 'foo', '/localhost@rpl:1/21.0:1.0-2-1', 'is: x86')
+        repos.add(3, 'foo', '/localhost@rpl:1/21.0:1.0-2-1', 'is: x86_64')
+        repos.add(4, 'foo', '/localhost@rpl:1/11.0:1.0-1-1', 'is: x86')
+        repos.add(5, 'foo:source', '/localhost@rpl:2/30.0:1.0-1')
+        index = troveindex.TroveIndex(path)
+        self.failUnless(index.sync(repos, 'localhost'))
+        self.assertEquals(repos.marks, ['0', '2.0', '3.0', '5.0'])
+
+        branch = versions.VersionFromString('/localhost@rpl:1')
+        self.assertEquals(
+            sorted(index.getTroveVersionsByBranch('foo:source', branch)[
+                'foo:source']),
+            [versions.ThawVersion('/localhost@rpl:1/10.0:1.0-1'),
+             versions.ThawVersion('/localhost@rpl:1/20.0:1.0-2')])
+        latest = index.getTroveLatestByLabel(
+            versions.Label('localhost@rpl:1'))
+        self.assertEquals(sorted(latest), ['foo', 'foo:source'])
+        self.assertEquals(latest['foo:source'].keys(),
+            [versions.ThawVersion('/localhost@rpl:1/20.0:1.0-2')])
+        self.assertEquals(latest['foo'].keys(),
+            [versions.ThawVersion('/localhost@rpl:1/21.0:1.0-2-1')])
+        self.assertEquals(
+            sorted(str(x) for x in latest['foo'].values()[0]),
+            ['is: x86', 'is: x86_64'])
+
+        # a new index picks up from the last mark, and drops removed troves
+        repos.marks = []
+        repos.add(6, 'foo:source', '/localhost@rpl:1/20.0:1.0-2',
+                  troveType=trove.TROVE_TYPE_REMOVED)
+        index = troveindex.TroveIndex(path)
+        self.failUnless(index.sync(repos, 'localhost'))
+        self.assertEquals(repos.marks, ['5.0', '6.0'])
+        self.assertEquals(
+            index.getTroveVersionsByBranch('foo:source', branch)[
+                'foo:source'].keys(),
+            [versions.ThawVersion('/localhost@rpl:1/10.0:1.0-1')])
+        self.assertEquals(index.getTroveVersionsByBranch('bar', branch), {})
+
+    def testRefused(self):
+        path = self.workDir + '/troves.db'
+        repos = FakeRepos()
+        repos.error = conaryerrors.InsufficientPermission()
+        index = troveindex.TroveIndex(path)
+        self.failIf(index.sync(repos, 'localhost'))
+        # hosts refusing to sync are not asked again for a while
+        self.failIf(index.sync(repos, 'localhost'))
+        self.assertEquals(repos.marks, ['0'])
+
+        # other errors are retried on the next sync
+        repos = FakeRepos()
+        repos.error = IOError('connection refused')
+        self.failIf(index.sync(repos, 'otherhost'))
+        repos.error = None
+        self.failUnless(index.sync(repos, 'otherhost'))
+        self.assertEquals(repos.marks, ['0', '0'])
+
+    def testDisabled(self):
+        repos = FakeRepos()
+        index = troveindex.TroveIndex(None)
+        self.failIf(index.sync(repos, 'localhost'))
+        self.assertEquals(repos.marks, [])
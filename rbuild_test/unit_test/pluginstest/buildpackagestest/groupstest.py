@@ -41,13 +41,20 @@ class BuildGroupsTest(rbuildhelp.RbuildHelper):
         handle.productStore.getActiveStageLabel._mock.setReturn(label)
         handle.product.getLabelForStage._mock.setReturn(label)
         handle.product.getBaseFlavor._mock.setReturn('')
-        mock.mockMethod(handle.facade.conary._findTroves)
-        groupSpec = ('group-dist:source', None, None)
+        calls = []
+        query = mock.MockObject()
+        def queueFindTroves(specList, allowMissing=False):
+            calls.append(('queue', specList, allowMissing))
+            return query
+        self.mock(handle.facade.conary, '_queueFindTroves', queueFindTroves)
+        realGetContexts = handle.facade.rmake._getRmakeContexts
+        def getRmakeContexts():
+            calls.append('contexts')
+            return realGetContexts()
+        self.mock(handle.facade.rmake, '_getRmakeContexts', getRmakeContexts)
+        groupSpec = ('group-dist:source', label, None)
         groupTup = self.makeTroveTuple('group-dist:source=@rpl:linux/1.0-1')
-        handle.facade.conary._findTroves._mock.setReturn(
-                                                    {groupSpec : [groupTup]},
-                                                    [groupSpec],
-                                                    label, allowMissing=True)
+        query.result._mock.setReturn({groupSpec : [groupTup]})
         groupsToBuild = ['group-dist{x86}', 'group-dist{x86_64}']
         mock.mockMethod(handle.facade.rmake.createBuildJobForStage)
         handle.facade.rmake.createBuildJobForStage._mock.setReturn('r1',
@@ -56,11 +63,13 @@ class BuildGroupsTest(rbuildhelp.RbuildHelper):
         # test1
         job = groups._getJobBasedOnProductGroups(handle, {}, recurse=True)
         assert(job == 'r1')
+        # the group lookup is queued before the contexts look up the
+        # autoload recipes, so both are sent in one query
+        self.assertEquals(calls,
+            [('queue', [groupSpec], True), 'contexts'])
 
         # test2: test to see what it does when there are no groups.
-        handle.facade.conary._findTroves._mock.setReturn({},
-                                                    [groupSpec],
-                                                    label, allowMissing=True)
+        query.result._mock.setReturn({})
         job = groups._getJobBasedOnProductGroups(handle, {}, recurse=True)
         assert(job is None)
 
@@ -70,13 +79,12 @@ class BuildGroupsTest(rbuildhelp.RbuildHelper):
         groupsToBuild = [ groupRecipe + '{x86}', groupRecipe + '{x86_64}']
         handle.facade.rmake.createBuildJobForStage._mock.setReturn('r2',
                                                 groupsToBuild, recurse=True)
-        handle.facade.conary._findTroves._mock.setReturn({},
-                                                    [], label,
-                                                    allowMissing=True)
+        del calls[:]
         job = groups._getJobBasedOnProductGroups(handle, 
                                                    {'group-dist' : groupRecipe},
                                                    recurse=True)
         assert(job == 'r2')
+        self.assertEquals(calls, [('queue', [], True), 'contexts'])
         # test 3 -  no groups.
         handle.productStore.getGroupFlavors._mock.setReturn([])
         job = groups._getJobBasedOnProductGroups(handle, {}, recurse=True)
@@ -50,9 +50,11 @@ class ConfigTest(rbuildhelp.RbuildHelper):
         _, txt = self.captureOutput(handle.Config.displayConfig)
         expectedText = '''\
 applianceTemplate         groupSetAppliance
+cacheDirectory            ~/.rbuild/cache
 contact                   http://bugzilla.rpath.com/
 factoryTemplate           factory
 groupTemplate             groupSet
+jobTimeout                0
 name                      Test
 pluginDirs                %s
 quiet                     False
@@ -63,6 +65,7 @@ repositoryUser            []
 rmakePluginDirs           %s
 serverUrl                 http://example.com
 signatureKeyMap           []
+useCache                  True
 user                      test <password>
 ''' % (resources.get_plugin_dirs()[0],
         resources.get_test_path('config', 'recipeTemplates'),
@@ -73,9 +76,11 @@ user                      test <password>
                                     hidePasswords=False)
         expectedPasswordText = '''\
 applianceTemplate         groupSetAppliance
+cacheDirectory            ~/.rbuild/cache
 contact                   http://bugzilla.rpath.com/
 factoryTemplate           factory
 groupTemplate             groupSet
+jobTimeout                0
 name                      Test
 pluginDirs                %s
 quiet                     False
@@ -86,6 +91,7 @@ repositoryUser            []
 rmakePluginDirs           %s
 serverUrl                 http://example.com
 signatureKeyMap           []
+useCache                  True
 user                      test foo
 ''' % (resources.get_plugin_dirs()[0],
         resources.get_test_path('config', 'recipeTemplates'),
@@ -196,12 +202,17 @@ You should now begin working with a product by running 'rbuild init <short name>
 # This file will be overwritten by the "rbuild config --ask" command
 # applianceTemplate (Default: groupSetAppliance)
 applianceTemplate         groupSetAppliance
+# cacheDirectory (Default: ~/.rbuild/cache)
+cacheDirectory            ~/.rbuild/cache
+# cacheTimeouts (Default: )
 # contact (Default: None)
 contact                   Display Name
 # factoryTemplate (Default: factory)
 factoryTemplate           factory
 # groupTemplate (Default: groupSet)
 groupTemplate             groupSet
+# jobTimeout (Default: 0)
+jobTimeout                0
 # name (Default: None)
 name                      Contact
 # pluginDirs (Default: /usr/share/rbuild/plugins:~/.rbuild/plugins.d)
@@ -226,6 +237,8 @@ serverUrl                 http://localhost
 # signatureKey (Default: None)
 # signatureKeyMap (Default: [])
 signatureKeyMap           []
+# useCache (Default: True)
+useCache                  True
 # user (Default: None)
 user                      testuser testpass
 ''' % (resources.get_plugin_dirs()[0],
@@ -344,12 +357,17 @@ You should now begin working with a product by running 'rbuild init <short name>
 # This file will be overwritten by the "rbuild config --ask" command
 # applianceTemplate (Default: groupSetAppliance)
 applianceTemplate         groupSetAppliance
+# cacheDirectory (Default: ~/.rbuild/cache)
+cacheDirectory            ~/.rbuild/cache
+# cacheTimeouts (Default: )
 # contact (Default: None)
 contact                   Contact
 # factoryTemplate (Default: factory)
 factoryTemplate           factory
 # groupTemplate (Default: groupSet)
 groupTemplate             groupSet
+# jobTimeout (Default: 0)
+jobTimeout                0
 # name (Default: None)
 name                      Display Name
 # pluginDirs (Default: /usr/share/rbuild/plugins:~/.rbuild/plugins.d)
@@ -374,6 +392,8 @@ serverUrl                 http://localhost
 # signatureKey (Default: None)
 # signatureKeyMap (Default: [])
 signatureKeyMap           []
+# useCache (Default: True)
+useCache                  True
 # user (Default: None)
 user                      testuser
 ''' % (resources.get_plugin_dirs()[0],
@@ -429,12 +449,17 @@ user                      testuser
 # This file will be overwritten by the "rbuild config --ask" command
 # applianceTemplate (Default: groupSetAppliance)
 applianceTemplate         groupSetAppliance
+# cacheDirectory (Default: ~/.rbuild/cache)
+cacheDirectory            ~/.rbuild/cache
+# cacheTimeouts (Default: )
 # contact (Default: None)
 contact                   Display Name
 # factoryTemplate (Default: factory)
 factoryTemplate           factory
 # groupTemplate (Default: groupSet)
 groupTemplate             groupSet
+# jobTimeout (Default: 0)
+jobTimeout                0
 # name (Default: None)
 name                      Contact
 # pluginDirs (Default: /usr/share/rbuild/plugins:~/.rbuild/plugins.d)
@@ -459,6 +484,8 @@ serverUrl                 http://localhost
 # signatureKey (Default: None)
 # signatureKeyMap (Default: [])
 signatureKeyMap           []
+# useCache (Default: True)
+useCache                  True
 # user (Default: None)
 user                      testuser
 ''' % (resources.get_plugin_dirs()[0],
@@ -498,12 +525,17 @@ user                      testuser
 # This file will be overwritten by the "rbuild config --ask" command
 # applianceTemplate (Default: groupSetAppliance)
 applianceTemplate         groupSetAppliance
+# cacheDirectory (Default: ~/.rbuild/cache)
+cacheDirectory            ~/.rbuild/cache
+# cacheTimeouts (Default: )
 # contact (Default: None)
 contact                   Display Name
 # factoryTemplate (Default: factory)
 factoryTemplate           factory
 # groupTemplate (Default: groupSet)
 groupTemplate             groupSet
+# jobTimeout (Default: 0)
+jobTimeout                0
 # name (Default: None)
 name                      Contact
 # pluginDirs (Default: /usr/share/rbuild/plugins:~/.rbuild/plugins.d)
@@ -528,6 +560,8 @@ serverUrl                 http://localhost
 # signatureKey (Default: None)
 # signatureKeyMap (Default: [])
 signatureKeyMap           []
+# useCache (Default: True)
+useCache                  True
 # user (Default: None)
 user                      testuser
 ''' % (resources.get_plugin_dirs()[0],
@@ -710,12 +744,17 @@ You should now begin working with a product by running 'rbuild init <short name>
 # This file will be overwritten by the "rbuild config --ask" command
 # applianceTemplate (Default: groupSetAppliance)
 applianceTemplate         groupSetAppliance
+# cacheDirectory (Default: ~/.rbuild/cache)
+cacheDirectory            ~/.rbuild/cache
+# cacheTimeouts (Default: )
 # contact (Default: None)
 contact                   Display Name
 # factoryTemplate (Default: factory)
 factoryTemplate           factory
 # groupTemplate (Default: groupSet)
 groupTemplate             groupSet
+# jobTimeout (Default: 0)
+jobTimeout                0
 # name (Default: None)
 name                      Contact
 # pluginDirs (Default: /usr/share/rbuild/plugins:~/.rbuild/plugins.d)
@@ -740,6 +779,8 @@ serverUrl                 http://localhost
 # signatureKey (Default: None)
 # signatureKeyMap (Default: [])
 signatureKeyMap           []
+# useCache (Default: True)
+useCache                  True
 # user (Default: None)
 user                      testuser
 ''' % (resources.get_plugin_dirs()[0],
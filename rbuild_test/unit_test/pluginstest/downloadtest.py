@@ -0,0 +1,101 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from testutils import mock
+
+from rbuild import errors
+from rbuild.internal import download
+from rbuild_test import rbuildhelp
+
+
+class DownloadTest(rbuildhelp.RbuildHelper):
+    def testCommandParsing(self):
+        handle = self.getRbuildHandle(mock.MockObject())
+        handle.Download.registerCommands()
+        handle.Download.initialize()
+        cmd = handle.Commands.getCommandClass('download')()
+        mock.mockMethod(handle.Download.downloadImages, True)
+
+        cmd.runCommand(handle, {}, ['rbuild', 'download', 'images', '1', '2'])
+        handle.Download.downloadImages._mock.assertCalled([1, 2], None)
+
+        cmd.runCommand(handle, {'dir': '/tmp'},
+                       ['rbuild', 'download', 'images', '1'])
+        handle.Download.downloadImages._mock.assertCalled([1], '/tmp')
+
+        err = self.assertRaises(errors.BadParameterError, cmd.runCommand,
+            handle, {}, ['rbuild', 'download', 'images', 'foo'])
+        self.assertEqual(str(err), "Cannot parse build id 'foo'")
+
+        # default to the images last built in this checkout
+        handle.productStore.getImageJobIds._mock.setReturn([3])
+        cmd.runCommand(handle, {}, ['rbuild', 'download', 'images'])
+        handle.Download.downloadImages._mock.assertCalled([3], None)
+
+        handle.productStore.getImageJobIds._mock.setReturn(None)
+        self.assertRaises(errors.PluginError, cmd.runCommand,
+            handle, {}, ['rbuild', 'download', 'images'])
+
+        handle.Download.downloadImages._mock.setReturn(False, [1], None)
+        rv = cmd.runCommand(handle, {}, ['rbuild', 'download', 'images', '1'])
+        self.assertEqual(rv, 1)
+
+    def testCommand(self):
+        self.getRbuildHandle()
+        self.checkRbuild('download images --dir=/tmp 1',
+            'rbuild_plugins.download.DownloadImagesCommand.runCommand',
+            [None, None, {'dir': '/tmp'}, ['download', 'images', '1']])
+
+    def testDownloadImages(self):
+        handle = self.getRbuildHandle(mock.MockObject())
+        mock.mockMethod(handle.ui.info)
+        mock.mockMethod(handle.ui.warning)
+        mock.mockMethod(handle.ui.error)
+        mock.mockMethod(handle.facade.rbuilder.getBuildFiles)
+        handle.facade.rbuilder.getBuildFiles._mock.setReturn([
+            {'downloadUrl': 'http://foo/downloadImage?fileId=1',
+             'baseFileName': 'foo.iso', 'size': 10, 'sha1': 'ABC'},
+            {'downloadUrl': 'http://foo/downloadImage?fileId=2',
+             'baseFileName': 'foo.ova'},
+            {'torrentUrl': 'http://foo/downloadTorrent?fileId=3',
+             'baseFileName': 'foo.torrent'},
+            ], 1)
+
+        def fetch(downloads):
+            self.assertEqual(
+                [(x.url, x.path, x.size, x.sha1) for x in downloads],
+                [('http://foo/downloadImage?fileId=1', '/dest/foo.iso', 10,
+                  'abc'),
+                 ('http://foo/downloadImage?fileId=2', '/dest/foo.ova', None,
+                  None)])
+            downloads[0].skipped = True
+            return [(downloads[0], None),
+                    (downloads[1], errors.DownloadError(path='/dest/foo.ova',
+                        reason='boom'))]
+        self.mock(download.Downloader, 'fetch', lambda self, x: fetch(x))
+
+        self.assertEqual(handle.Download.downloadImages([1], '/dest'), False)
+        self.assertEqual(
+            [x[0][0] % x[0][1:] for x in handle.ui.warning._mock.calls],
+            ['Build 1: no download URL for foo.torrent'])
+        self.assertEqual(
+            [x[0][0] % x[0][1:] for x in handle.ui.info._mock.calls],
+            ['/dest/foo.iso is up to date'])
+        self.assertEqual(
+            [x[0][0] % x[0][1:] for x in handle.ui.error._mock.calls],
+            ['Unable to download /dest/foo.ova: Download of /dest/foo.ova'
+             ' failed: boom'])
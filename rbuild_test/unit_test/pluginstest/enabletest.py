@@ -74,6 +74,7 @@ class EnableTest(rbuildhelp.RbuildHelper):
         handle = self.handle
 
         mock.mockMethod(handle.facade.rbuilder.getPlatform)
+        mock.mockMethod(handle.facade.rbuilder.expirePlatforms)
         handle.facade.rbuilder.getPlatform._mock.setReturn(None, 'no label')
         self.assertRaises(
             errors.PluginError,
@@ -87,6 +88,7 @@ class EnableTest(rbuildhelp.RbuildHelper):
         handle.facade.rbuilder.getPlatform._mock.setReturn(_platform, 'label')
         handle.EnablePlatform._updatePlatform('label', True)
         self.assertEqual(_platform.enabled, True)
+        handle.facade.rbuilder.expirePlatforms._mock.assertCalled()
 
         _platform._mock.set(enabled=None)
         handle.EnablePlatform._updatePlatform('label', False)
@@ -97,6 +99,7 @@ class EnableTest(rbuildhelp.RbuildHelper):
         handle = self.handle
 
         mock.mockMethod(handle.facade.rbuilder.getPlatform)
+        mock.mockMethod(handle.facade.rbuilder.expirePlatforms)
         handle.facade.rbuilder.getPlatform._mock.setReturn(None, 'no label')
         self.assertRaises(
             errors.PluginError,
@@ -122,3 +125,4 @@ class EnableTest(rbuildhelp.RbuildHelper):
             True,
             )
         self.assertIn('not authorized', str(err))
+        handle.facade.rbuilder.expirePlatforms._mock.assertNotCalled()
@@ -56,7 +56,10 @@ class CreateImageDefTest(AbstractImageDefsTest):
         _amiImage = mock.MockObject(name="amiImage")
         _vmwareImage = mock.MockObject(name="vmwareImage")
         handle.facade.rbuilder.getImageTypes._mock.setReturn(
-            [_amiImage, _vmwareImage])
+            [_amiImage], name='amiImage')
+        handle.facade.rbuilder.getImageTypes._mock.setReturn(
+            [_vmwareImage], name='vmwareImage')
+        handle.facade.rbuilder.getImageTypes._mock.setReturn([], name='foo')
 
         cmd = handle.Commands.getCommandClass('create')()
 
@@ -116,6 +119,34 @@ class CreateImageDefTest(AbstractImageDefsTest):
         handle.DescriptorConfig.writeConfig._mock.assertCalled('outFile')
 
 
+class DeleteImageDefsTest(AbstractImageDefsTest):
+    def testCmdLine(self):
+        handle = self.handle
+        cmd = handle.Commands.getCommandClass('delete')()
+
+        _one = mock.MockObject(name='one')
+        _two = mock.MockObject(name='two')
+        mock.mockMethod(handle.ImageDefs.getImageDefsById)
+        handle.ImageDefs.getImageDefsById._mock.setReturn([_one, _two],
+                                                          ['1', '2'])
+        mock.mockMethod(handle.ImageDefs.deleteImageDefs)
+        mock.mockMethod(handle.ui.getYn, False)
+        mock.mockMethod(handle.ui.info)
+
+        cmd.runCommand(handle, {}, ['rbuild', 'delete', 'imagedefs', '1', '2'])
+        handle.ui.getYn._mock.assertCalled(
+            'Delete 2 image definitions: one, two?', default=False)
+        handle.ImageDefs.deleteImageDefs._mock.assertNotCalled()
+
+        # the image definitions are removed together
+        cmd.runCommand(handle, {'force': True},
+                       ['rbuild', 'delete', 'imagedefs', '1', '2'])
+        handle.ui.getYn._mock.assertNotCalled()
+        handle.ImageDefs.deleteImageDefs._mock.assertCalled([_one, _two])
+        handle.ui.info._mock.assertCalled("%s %s '%s'", 'Deleted',
+                                          'image definition', 'one')
+
+
 class ListImageDefsTest(AbstractImageDefsTest):
     def testCommand(self):
         self.checkRbuild('list imagedefs',
@@ -176,6 +207,47 @@ class ImageDefsPluginTest(AbstractImageDefsTest):
         handle.productStore.commit._mock.assertCalled(message="Remove image def one")
         handle.productStore.update._mock.assertCalled()
 
+    def testDeleteImageDefs(self):
+        handle = self.handle
+        mock.mockMethod(handle.facade.rbuilder.getImageDefs)
+        mock.mock(handle, 'product')
+        mock.mock(handle, 'productStore')
+        mock.mockMethod(handle.ui.warning)
+        handle.product.getProductShortname._mock.setReturn('project')
+        handle.product.getProductVersion._mock.setReturn('branch')
+
+        class MockBuildDefinition(object):
+            def __init__(self, name):
+                self.name = name
+            def export(self, f, level=0, namespace_=''):
+                f.write(self.name)
+        buildDefinitions = [MockBuildDefinition('one'),
+                            MockBuildDefinition('two'),
+                            MockBuildDefinition('three')]
+        handle.product._mock.set(buildDefinition=buildDefinitions)
+        _one = mock.MockObject(name='one',
+            id='http://localhost/api/f97c5d29941bfb1b2fdab0874906ab82')
+        _three = mock.MockObject(name='three',
+            id='http://localhost/api/35d6d33467aae9a2e3dccb4b6b027878')
+        handle.facade.rbuilder.getImageDefs._mock.setReturn([_one, _three],
+            product='project', version='branch')
+        handle.productStore.getProductDefinitionXmlPath._mock.setReturn(
+                '%s/productstore.xml' % self.workDir)
+
+        imageDefs = handle.ImageDefs.getImageDefsById([
+            '35d6d33467aae9a2e3dccb4b6b027878', 'missing',
+            'f97c5d29941bfb1b2fdab0874906ab82'])
+        self.assertEquals(imageDefs, [_three, _one])
+        handle.ui.warning._mock.assertCalled("Unable to find imagedef with"
+            " id 'missing' on branch version of project project")
+
+        handle.ImageDefs.deleteImageDefs(imageDefs)
+        self.assertEquals([x.name for x in buildDefinitions], ['two'])
+        handle.productStore.commit._mock.assertCalled(
+            message="Remove image def three, one")
+        handle.productStore.update._mock.assertCalled()
+        handle.productStore.commit._mock.assertNotCalled()
+
     def testDeleteNoImageDefs(self):
         from rbuild_plugins import imagedefs
 
@@ -97,9 +97,11 @@ class CancelImagesTest(AbstractImagesTest):
     def testCommandParsing(self):
         handle = self.handle
 
+        _image = mock.MockObject(image_id='10')
         mock.mockMethod(handle.Images.cancel)
         mock.mockMethod(handle.ui.warning)
-        mock.mockMethod(handle.facade.rbuilder.getImages, ['image'])
+        mock.mockMethod(handle.facade.rbuilder.getImages, [_image])
+        mock.mockMethod(handle.facade.rbuilder.waitForJobs)
 
         err = self.assertRaises(
             errors.ParseError, self.cmd.runCommand, handle, {},
@@ -107,13 +109,51 @@ class CancelImagesTest(AbstractImagesTest):
         self.assertIn(': id', str(err))
 
         self.cmd.runCommand(handle, {}, ['rbuild', 'cancel', 'images', '10'])
-        handle.Images.cancel._mock.assertCalled('image')
+        handle.Images.cancel._mock.assertCalled(_image)
 
         err = self.assertRaises(errors.BadParameterError,
             self.cmd.runCommand, handle, {},
             ['rbuild', 'cancel', 'images', '&^%&*%$^&$'])
         self.assertIn('Cannot parse', str(err))
 
+    def testWaitForCancel(self):
+        from rbuild_plugins import images
+        handle = self.handle
+
+        _image1 = mock.MockObject(image_id='1')
+        _image2 = mock.MockObject(image_id='2')
+        _image3 = mock.MockObject(image_id='3')
+        _job1 = mock.MockObject(status_text='Done')
+        _job1.job_state._mock.set(name='Completed')
+        _job2 = mock.MockObject(status_text='Too late')
+        _job2.job_state._mock.set(name='Failed')
+        mock.mockMethod(handle.Images.getImagesById)
+        handle.Images.getImagesById._mock.setReturn(
+            [_image1, _image2, _image3], ['1', '2', '3'])
+        def _cancel(image):
+            if image is _image1:
+                return _job1
+            if image is _image2:
+                return _job2
+            raise images.CancelImageError(msg='not building')
+        self.mock(handle.Images, 'cancel', _cancel)
+        mock.mockMethod(handle.facade.rbuilder.waitForJobs)
+        mock.mockMethod(handle.ui.warning)
+        mock.mockMethod(handle.ui.info)
+
+        err = self.assertRaises(errors.PluginError, self.cmd.runCommand,
+            handle, {}, ['rbuild', 'cancel', 'images', '1', '2', '3'])
+        self.assertEqual(str(err), 'Unable to cancel images: 2 of 3 failed')
+        # the cancel jobs are waited for together
+        handle.facade.rbuilder.waitForJobs._mock.assertCalled([_job1, _job2])
+        handle.ui.info._mock.assertCalled("%s %s '%s'", 'Cancelled', 'image',
+                                          '1')
+        warnings = [x[0] for x in handle.ui.warning._mock.calls]
+        self.assertEqual([x[1:4] for x in warnings],
+                         [('cancel', 'image', '2'), ('cancel', 'image', '3')])
+        self.assertEqual([str(x[4]) for x in warnings],
+                         ['Too late', 'not building'])
+
     def testLaunchArgParse(self):
         self.checkRbuild('cancel images 10',
             'rbuild_plugins.images.CancelImagesCommand.runCommand',
@@ -127,7 +167,7 @@ class CancelImagesTest(AbstractImagesTest):
             ('project', 'branch', 'stage'))
         mock.mockMethod(self.handle.ui.warning)
         mock.mockMethod(self.handle.ui.getYn, True)
-        mock.mockMethod(self.handle.facade.rbuilder.getImages, None)
+        mock.mockMethod(self.handle.facade.rbuilder.getImages, [])
 
         self.cmd.runCommand(self.handle, {},
             ['rbuild', 'cancel', 'images', '10'])
@@ -141,25 +181,49 @@ class DeleteImagesTest(AbstractImagesTest):
         handle = self.handle
         cmd = handle.Commands.getCommandClass('delete')()
 
-        mock.mockMethod(handle.Images.delete)
+        _image1 = mock.MockObject(image_id='10', name='foo')
+        _image2 = mock.MockObject(image_id='11', name='bar')
+        mock.mockMethod(handle.Images.getImagesById)
+        handle.Images.getImagesById._mock.setReturn([_image1, _image2],
+                                                    ['10', '11'])
+        handle.Images.getImagesById._mock.setReturn([_image1], ['10'])
         mock.mockMethod(handle.ui.warning)
+        mock.mockMethod(handle.ui.info)
+        mock.mockMethod(handle.ui.getYn, True)
 
         err = self.assertRaises(
             errors.ParseError, cmd.runCommand, handle, {},
             ['rbuild', 'delete', 'images'])
         self.assertIn('IMAGEID', str(err))
 
-        cmd.runCommand(handle, {}, ['rbuild', 'delete', 'images', '10', '11'])
-        handle.Images.delete._mock.assertCalled('10', False)
-        handle.Images.delete._mock.assertCalled('11', False)
+        # one confirmation covers all of the images
+        cmd.runCommand(handle, {},
+                       ['rbuild', 'delete', 'images', '10', '11', '10'])
+        handle.ui.getYn._mock.assertCalled("Delete 2 images: foo, bar?",
+                                           default=False)
+        handle.Images.getImagesById._mock.assertCalled(['10', '11'])
+        _image1.delete._mock.assertCalled()
+        _image2.delete._mock.assertCalled()
+        handle.ui.info._mock.assertCalled("%s %s '%s'", 'Deleted', 'image',
+                                          'foo')
+        handle.ui.info._mock.assertCalled("%s %s '%s'", 'Deleted', 'image',
+                                          'bar')
 
         cmd.runCommand(handle, {"force": True},
                        ['rbuild', 'delete', 'images', '10'])
-        handle.Images.delete._mock.assertCalled('10', True)
+        handle.ui.getYn._mock.assertNotCalled()
+        _image1.delete._mock.assertCalled()
+        handle.Images.getImagesById._mock.assertCalled(['10'])
+
+        handle.ui.getYn._mock.setDefaultReturn(False)
+        cmd.runCommand(handle, {}, ['rbuild', 'delete', 'images', '10'])
+        handle.ui.getYn._mock.assertCalled("Delete foo?", default=False)
+        _image1.delete._mock.assertNotCalled()
+        handle.Images.getImagesById._mock.assertCalled(['10'])
 
         cmd.runCommand(handle, {},
             ['rbuild', 'delete', 'images', '&^%&*%$^&$'])
-        handle.Images.delete._mock.assertNotCalled()
+        handle.Images.getImagesById._mock.assertNotCalled()
         handle.ui.warning._mock.assertCalled(
             "Cannot parse image id '&^%&*%$^&$'")
 
@@ -694,7 +758,7 @@ class ImagesPluginTest(AbstractImagesTest):
         handle.facade.rbuilder.getImages._mock.assertNotCalled()
 
     def testWatchJob(self):
-        from rbuild_plugins.images import time
+        import time
         handle = self.handle
 
         mock.mock(handle.ui, 'outStream')
@@ -784,6 +848,25 @@ class ImagesPluginTest(AbstractImagesTest):
         self.assertEqual([_image1, _image2], handle.Images.getImages("foo"))
         self.assertEqual([_image2], handle.Images.getImages("foo=2-2-2"))
 
+    def testGetImagesById(self):
+        handle = self.handle
+
+        _image1 = mock.MockObject(name="foo", image_id=1)
+        _image2 = mock.MockObject(name="bar", image_id=2)
+
+        rb = handle.facade.rbuilder
+        mock.mockMethod(rb.getImages)
+        mock.mockMethod(handle.Images._getProductStage,
+                        ("project", "branch", "stage"))
+        mock.mockMethod(handle.ui.warning)
+        rb.getImages._mock.setReturn([_image2, _image1], project="project",
+            branch="branch", stage="stage", image_id=["1", "2", "3"])
+
+        self.assertEqual([_image1, _image2],
+                         handle.Images.getImagesById(["1", "2", "3"]))
+        handle.ui.warning._mock.assertCalled("Unable to find image with id"
+            " '3' on stage stage of project project")
+
     def testGetImagesMissing(self):
         from rbuild_plugins import images
         handle = self.handle
@@ -142,7 +142,7 @@ class ListProjectsTest(ProjectTest):
         mock.mockMethod(handle.Projects.list)
 
         cmd.runCommand(handle, {}, ['rbuild', 'list', 'projects'])
-        handle.Projects.list._mock.assertCalled()
+        handle.Projects.list._mock.assertCalled(page_size=100)
 
     def testCommand(self):
         self.getRbuildHandle()
@@ -0,0 +1,60 @@
+#
+# Copyright (c) SAS Institute Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from testutils import mock
+
+from rbuild import errors
+from rbuild_test import rbuildhelp
+
+
+class SearchTest(rbuildhelp.RbuildHelper):
+    def testCommand(self):
+        self.getRbuildHandle()
+        self.checkRbuild('search python*',
+            'rbuild_plugins.search.SearchCommand.runCommand',
+            [None, None, {}, ['search', 'python*']])
+
+    def testCommandParsing(self):
+        handle = self.getRbuildHandle(mock.MockObject())
+        cmd = handle.Commands.getCommandClass('search')()
+        mock.mockMethod(handle.Search.searchPackages)
+        cmd.runCommand(handle, {}, ['rbuild', 'search', 'python*'])
+        handle.Search.searchPackages._mock.assertCalled('python*')
+        self.assertRaises(errors.ParseError, cmd.runCommand, handle, {},
+                          ['rbuild', 'search'])
+
+    def testSearchPackages(self):
+        handle = self.getRbuildHandle(mock.MockObject())
+        mock.mockMethod(handle.ui.write)
+        mock.mockMethod(handle.ui.info)
+        searchPath = mock.MockObject(troveName='group-os',
+                                     label='localhost@rpl:1')
+        handle.product.getSearchPaths._mock.setReturn([searchPath])
+        mock.mockMethod(handle.facade.conary.searchPackagesInSearchPaths)
+        handle.facade.conary.searchPackagesInSearchPaths._mock.setReturn(
+            [('python', '/localhost@rpl:1/2.6-1-1', 'is: x86')],
+            [('group-os', 'localhost@rpl:1', None)], 'python*')
+        handle.Search.searchPackages('python*')
+        handle.ui.write._mock.assertCalled('%s=%s[%s]', 'python',
+            '/localhost@rpl:1/2.6-1-1', 'is: x86')
+        handle.ui.info._mock.assertNotCalled()
+
+        handle.facade.conary.searchPackagesInSearchPaths._mock.setReturn(
+            [], [('group-os', 'localhost@rpl:1', None)], 'perl*')
+        handle.Search.searchPackages('perl*')
+        handle.ui.info._mock.assertCalled('No packages matching %s found',
+                                          'perl*')
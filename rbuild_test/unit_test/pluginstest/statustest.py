@@ -141,6 +141,56 @@ class StatusTest(rbuildhelp.RbuildHelper):
         self.assertRaises(ValueError, handle.Status.printDirectoryStatus,
             'bogus', product=True, local=False, repository=False)
 
+    def testPrintDirectoryStatusBatched(self):
+        handle = self.getRbuildHandle()
+        from rbuild_plugins import status
+        base = self.workDir + '/product'
+        for path in ('.rbuild/product-definition', 'devel/foo/foo-1.0/src',
+                     'devel/bar', 'qa/foo'):
+            os.makedirs(os.path.join(base, path))
+        checkouts = [base + '/devel/bar', base + '/devel/foo', base + '/qa/foo']
+
+        mock.mock(dirstore, 'CheckoutProductStore')
+        dirstore.CheckoutProductStore().getProductDefinitionDirectory._mock.setDefaultReturn(base + '/.rbuild/product-definition')
+        dirstore.CheckoutProductStore().getBaseDirectory._mock.setDefaultReturn(base)
+        conary = handle.facade.conary
+        mock.mock(conary, 'isConaryCheckoutDirectory')
+        conary.isConaryCheckoutDirectory._mock.setDefaultReturn(False)
+        for dirName in checkouts:
+            conary.isConaryCheckoutDirectory._mock.setReturn(True, dirName)
+        mock.mockMethod(conary._getNewerRepositoryVersionsByDirectory)
+        conary._getNewerRepositoryVersionsByDirectory._mock.setDefaultReturn(
+            dict((x, [x + '-newer']) for x in checkouts))
+        self.mock(conary, 'getCheckoutStatus', lambda x: [('M', x)])
+        mock.mockMethod(handle.Status._printOneDirectoryStatus)
+        handle.Status._printOneDirectoryStatus._mock.setDefaultReturn('devel')
+
+        handle.Status.printDirectoryStatus(base)
+        # checkouts are not descended into, and are printed in order with
+        # the results of the batched lookups
+        calls = handle.Status._printOneDirectoryStatus._mock.calls
+        self.assertEquals([x[0] for x in calls], [
+            (base, base, status.DEFAULT, ''),
+            (base + '/devel', 'devel', status.DEFAULT, 'devel'),
+            (base + '/devel/bar', 'devel/bar', status.DEFAULT, 'devel'),
+            (base + '/devel/foo', 'devel/foo', status.DEFAULT, 'devel'),
+            (base + '/qa', 'qa', status.DEFAULT, 'devel'),
+            (base + '/qa/foo', 'qa/foo', status.DEFAULT, 'devel')])
+        self.assertEquals(dict(calls[3][1]), dict(local=True, repository=True,
+            newerVersions=[base + '/devel/foo-newer'],
+            checkoutStatus=[('M', base + '/devel/foo')]))
+        self.assertEquals(dict(calls[4][1]),
+                          dict(local=True, repository=True))
+        conary._getNewerRepositoryVersionsByDirectory._mock.assertCalled(
+            set(checkouts))
+
+        # nothing is asked of the repository for local changes only
+        del calls[:]
+        handle.Status.printDirectoryStatus(base, repository=False)
+        self.assertEquals(dict(calls[2][1]), dict(local=True,
+            repository=False, checkoutStatus=[('M', base + '/devel/bar')]))
+        conary._getNewerRepositoryVersionsByDirectory._mock.assertNotCalled()
+
     def testPrintOneDirectoryStatus(self):
         self.initProductDirectory(self.workDir)
         os.chdir(self.workDir)
@@ -128,12 +128,26 @@ class DeleteTargetTest(AbstractTargetTest):
         self.assertEqual(
             str(err), "'targets' missing 1 command parameter(s): TARGET")
 
+        _target1 = mock.MockObject(name="foo")
+        _target2 = mock.MockObject(name="bar")
+        mock.mockMethod(handle.Targets.getTargetsByIdOrName)
+        handle.Targets.getTargetsByIdOrName._mock.setReturn([_target1],
+                                                            ['foo'])
+        handle.Targets.getTargetsByIdOrName._mock.setReturn(
+            [_target1, _target2], ['foo', '2'])
+        mock.mockMethod(handle.ui.getYn, True)
+        mock.mockMethod(handle.ui.info)
+
         cmd.runCommand(handle, {"force": True},
                        ['rbuild', 'delete', 'targets', 'foo'])
-        handle.Targets.delete._mock.assertCalled("foo", True)
+        handle.ui.getYn._mock.assertNotCalled()
+        _target1.delete._mock.assertCalled()
 
-        cmd.runCommand(handle, {}, ['rbuild', 'delete', 'targets', 'foo'])
-        handle.Targets.delete._mock.assertCalled("foo", False)
+        cmd.runCommand(handle, {}, ['rbuild', 'delete', 'targets', 'foo', '2'])
+        handle.ui.getYn._mock.assertCalled("Delete 2 targets: foo, bar?",
+                                           default=False)
+        _target1.delete._mock.assertCalled()
+        _target2.delete._mock.assertCalled()
 
 
 class EditTargetTest(AbstractTargetTest):
@@ -209,7 +223,7 @@ class ListTargetsTest(AbstractTargetTest):
         mock.mockMethod(handle.Targets.list)
 
         cmd.runCommand(handle, {}, ['rbuild', 'list', 'targets'])
-        handle.Targets.list._mock.assertCalled()
+        handle.Targets.list._mock.assertCalled(page_size=100)
 
     def testCommand(self):
         self.checkRbuild('list targets',
@@ -243,7 +257,7 @@ class TargetsPluginTest(AbstractTargetTest):
             )
 
         rb.getTargets._mock.setReturn([_target], name='foo')
-        rb.getTargetTypes._mock.setReturn([_ttype])
+        rb.getTargetTypes._mock.setReturn([_ttype], name='type')
         h.DescriptorConfig.createDescriptorData._mock.setReturn(_ddata,
             fromStream="descriptor xml", defaults={})
         rb.configureTarget._mock.setReturn(_target, _target, _ddata)
@@ -293,7 +307,10 @@ class TargetsPluginTest(AbstractTargetTest):
             _ddata, fromStream="descriptor", defaults=dict())
 
         mock.mock(handle.facade, "rbuilder")
-        handle.facade.rbuilder.getTargetTypes._mock.setReturn([_ttype])
+        handle.facade.rbuilder.getTargetTypes._mock.setReturn(
+            [_ttype], name='type')
+        handle.facade.rbuilder.getTargetTypes._mock.setReturn(
+            [], name='notype')
         handle.facade.rbuilder.createTarget._mock.setReturn(
             "target", _ttype.name, _ddata)
 
@@ -325,7 +342,10 @@ class TargetsPluginTest(AbstractTargetTest):
             _ddata, fromStream="descriptor", defaults=dict())
 
         mock.mock(handle.facade, "rbuilder")
-        handle.facade.rbuilder.getTargetTypes._mock.setReturn([_ttype])
+        handle.facade.rbuilder.getTargetTypes._mock.setReturn(
+            [_ttype], name='type')
+        handle.facade.rbuilder.getTargetTypes._mock.setReturn(
+            [], name='notype')
         handle.facade.rbuilder.createTarget._mock.setReturn(
             _target, _ttype.name, _ddata)
         def raisesRbuildError(self, target):
@@ -364,6 +384,8 @@ class TargetsPluginTest(AbstractTargetTest):
             [_target1], target_id="1")
         handle.facade.rbuilder.getTargets._mock.appendReturn(
             [], target_id="bar")
+        handle.facade.rbuilder.getTargets._mock.appendReturn(
+            [_target2], name="bar")
 
         mock.mock(handle, "ui")
         handle.ui.getYn._mock.setDefaultReturn(False)
@@ -383,6 +405,39 @@ class TargetsPluginTest(AbstractTargetTest):
 
         handle.Targets.delete("bar")
         handle.facade.rbuilder.getTargets._mock.assertCalled(target_id="bar")
-        handle.facade.rbuilder.getTargets._mock.assertCalled()
+        handle.facade.rbuilder.getTargets._mock.assertCalled(name="bar")
         handle.ui.getYn._mock.assertCalled("Delete bar?", default=False)
         _target2.delete._mock.assertCalled()
+
+    def testGetTargetsByIdOrName(self):
+        handle = self.handle
+
+        _target1 = mock.MockObject(name="foo", target_id=1)
+        _target2 = mock.MockObject(name="bar", target_id=2)
+        _target3 = mock.MockObject(name="12", target_id=3)
+        rb = handle.facade.rbuilder
+        mock.mockMethod(rb.getTargets)
+        rb.getTargets._mock.setReturn([_target1], target_id=["1", "12"])
+        rb.getTargets._mock.setReturn([_target2, _target3],
+                                      name=["bar", "12", "baz"])
+        mock.mockMethod(handle.ui.write)
+
+        # ids are looked up in one query, and the rest as names in another
+        self.assertEqual(
+            handle.Targets.getTargetsByIdOrName(["bar", "1", "12", "baz"]),
+            [_target2, _target1, _target3])
+        rb.getTargets._mock.assertCalled(target_id=["1", "12"])
+        rb.getTargets._mock.assertCalled(name=["bar", "12", "baz"])
+        rb.getTargets._mock.assertNotCalled()
+        handle.ui.write._mock.assertCalled(
+            "No target found with id or name 'baz'")
+
+        # results the server should have filtered out are ignored
+        rb.getTargets._mock.setReturn([_target1, _target2, _target3],
+                                      target_id=["2"])
+        rb.getTargets._mock.setReturn([_target1, _target2, _target3],
+                                      name=["baz"])
+        self.assertEqual(
+            handle.Targets.getTargetsByIdOrName(["2", "baz"]), [_target2])
+        handle.ui.write._mock.assertCalled(
+            "No target found with id or name 'baz'")
@@ -18,6 +18,7 @@
 
 
 import os
+import time
 
 from rbuild_test import rbuildhelp
 from testutils import mock
@@ -175,13 +176,30 @@ class UpdateTest(rbuildhelp.RbuildHelper):
         handle = self._getHandle()
         maps = ({'bar': './bar/bar.recipe', 'baz': './baz/baz.recipe'}, {'group-foo': './group-foo/group-foo.recipe'})
         handle.productStore.getEditedRecipeDicts._mock.setDefaultReturn(maps)
+        # update in this process, where the mock can see the calls
+        handle.Update.updateWorkers = 1
         mock.mockMethod(handle.facade.conary.updateCheckout)
+        mock.mockMethod(
+            handle.facade.conary._getNewerRepositoryVersionsByDirectory)
+        handle.facade.conary._getNewerRepositoryVersionsByDirectory._mock.\
+            setDefaultReturn({'./bar': ['1'], './baz': ['2'],
+                              './group-foo': ['3']})
         handle.Update.updateStages(['foo'])
+        handle.facade.conary._getNewerRepositoryVersionsByDirectory._mock.\
+            assertCalled(['./bar', './baz', './group-foo'])
         # inverse order
         handle.facade.conary.updateCheckout._mock.assertCalled('./baz')
         handle.facade.conary.updateCheckout._mock.assertCalled('./bar')
         handle.facade.conary.updateCheckout._mock.assertCalled('./group-foo')
 
+        # checkouts at the head of their branch are not updated
+        handle.facade.conary._getNewerRepositoryVersionsByDirectory._mock.\
+            setDefaultReturn({'./bar': [], './baz': ['2'],
+                              './group-foo': []})
+        handle.Update.updateStages(['foo'])
+        handle.facade.conary.updateCheckout._mock.assertCalled('./baz')
+        handle.facade.conary.updateCheckout._mock.assertNotCalled()
+
         # no product store
         handle.productStore = None
         self.assertRaises(errors.MissingProductStoreError,
@@ -190,5 +208,53 @@ class UpdateTest(rbuildhelp.RbuildHelper):
     def testUpdateCurrentDirectory(self):
         handle = self._getHandle()
         mock.mockMethod(handle.facade.conary.updateCheckout)
+        mock.mockMethod(
+            handle.facade.conary._getNewerRepositoryVersionsByDirectory)
+        handle.facade.conary._getNewerRepositoryVersionsByDirectory._mock.\
+            setDefaultReturn({os.getcwd(): ['1']})
         handle.Update.updateCurrentDirectory()
         handle.facade.conary.updateCheckout._mock.assertCalled(os.getcwd())
+
+    def testUpdateOutputGrouped(self):
+        handle = self._getHandle()
+        packageDirs = [ 'pkg%d' % x for x in range(6) ]
+        mock.mockMethod(
+            handle.facade.conary._getNewerRepositoryVersionsByDirectory)
+        handle.facade.conary._getNewerRepositoryVersionsByDirectory._mock.\
+            setDefaultReturn(dict((x, ['1']) for x in packageDirs))
+        def updateCheckout(packageDir):
+            print 'updating %s' % packageDir
+            time.sleep(0.01 * (6 - int(packageDir[3:])))
+            # output written to the file descriptors is captured as well
+            os.write(2, 'updated %s\n' % packageDir)
+        self.mock(handle.facade.conary, 'updateCheckout', updateCheckout)
+        _, output = self.captureOutput(handle.Update._updateCheckouts,
+                                       packageDirs)
+        self.assertEquals(output, ''.join(
+            'updating %s\nupdated %s\n' % (x, x) for x in packageDirs))
+
+    def testUpdateCheckoutsStopsOnFailure(self):
+        handle = self._getHandle()
+        handle.Update.updateWorkers = 2
+        packageDirs = [ 'pkg%d' % x for x in range(3) ]
+        mock.mockMethod(
+            handle.facade.conary._getNewerRepositoryVersionsByDirectory)
+        handle.facade.conary._getNewerRepositoryVersionsByDirectory._mock.\
+            setDefaultReturn(dict((x, ['1']) for x in packageDirs))
+        def updateCheckout(packageDir):
+            print 'updating %s' % packageDir
+            if packageDir == 'pkg0':
+                raise errors.RbuildError('failed')
+            time.sleep(0.2)
+        self.mock(handle.facade.conary, 'updateCheckout', updateCheckout)
+        # the update already running finishes and shows its output, and
+        # no further update is started
+        output = []
+        def run():
+            try:
+                handle.Update._updateCheckouts(packageDirs)
+            except errors.RbuildError, err:
+                output.append(str(err))
+        _, text = self.captureOutput(run)
+        self.assertEquals(text, 'updating pkg0\nupdating pkg1\n')
+        self.assertEquals(output, ['failed'])
@@ -150,22 +150,31 @@ class DeleteUsersTest(AbstractUsersTest):
     def testDeleteUserCmdline(self):
         handle = self.handle
 
-        mock.mockMethod(handle.Users.delete)
+        _foo = mock.MockObject(user_name='foo')
+        _bar = mock.MockObject(user_name='bar')
+        mock.mockMethod(handle.Users.getUsersByName)
+        handle.Users.getUsersByName._mock.setReturn([_foo], ['foo'])
+        handle.Users.getUsersByName._mock.setReturn([_foo, _bar],
+                                                    ['foo', 'bar'])
         mock.mockMethod(handle.ui.getYn)
-        mock.mockMethod(handle.ui.warning)
+        mock.mockMethod(handle.ui.info)
 
-        handle.ui.getYn._mock.setReturn(False, "Really delete user 'foo'",
-            False)
-        handle.ui.getYn._mock.setReturn(True, "Really delete user 'bar'",
-            False)
+        handle.ui.getYn._mock.setReturn(False, "Delete foo?", default=False)
+        handle.ui.getYn._mock.setReturn(True, "Delete 2 users: foo, bar?",
+            default=False)
 
         cmd = handle.Commands.getCommandClass('delete')()
 
         cmd.runCommand(handle, {}, ['rbuild', 'delete', 'users', 'foo'])
-        handle.Users.delete._mock.assertNotCalled()
+        _foo.delete._mock.assertNotCalled()
 
         cmd.runCommand(handle, {}, ['rbuild', 'delete', 'users', 'foo', 'bar'])
-        handle.Users.delete._mock.assertCalled('bar')
+        _foo.delete._mock.assertCalled()
+        _bar.delete._mock.assertCalled()
+
+        cmd.runCommand(handle, {'force': True},
+                       ['rbuild', 'delete', 'users', 'foo'])
+        _foo.delete._mock.assertCalled()
 
 
 class EditUserTest(AbstractUsersTest):
@@ -500,6 +509,20 @@ class UsersTest(rbuildhelp.RbuildHelper):
         handle.Users.delete('bar')
         handle.ui.warning._mock.assertCalled("No user 'bar' found")
 
+    def testGetUsersByName(self):
+        handle = self.getRbuildHandle()
+
+        _foo = mock.MockObject(user_name='foo')
+        _bar = mock.MockObject(user_name='bar')
+        mock.mockMethod(handle.facade.rbuilder.getUsers)
+        mock.mockMethod(handle.ui.warning)
+        handle.facade.rbuilder.getUsers._mock.setReturn([_bar, _foo],
+            user_name=['foo', 'baz', 'bar'])
+
+        self.assertEqual(handle.Users.getUsersByName(['foo', 'baz', 'bar']),
+                         [_foo, _bar])
+        handle.ui.warning._mock.assertCalled("No user 'baz' found")
+
     def testEdit(self):
         handle = self.getRbuildHandle()
         _user = mock.MockObject()
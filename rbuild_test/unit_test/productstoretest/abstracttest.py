@@ -54,9 +54,15 @@ class AbstractProductTest(rbuildhelp.RbuildHelper):
         _, kw = productClass._mock.popCall()
         kw = dict(kw)
         self.assertEquals(kw, {}) # no fromStream=
+        # rpath_proddef is imported on first use
+        self.assertTrue(p.proddef is proddef)
 
         # get trivial errors out of the way first
         self.assertRaises(errors.IncompleteInterfaceError, p.getStatus, 'asdf')
+        self.assertRaises(errors.IncompleteInterfaceError, p.getIdCachePath)
+        self.assertRaises(errors.IncompleteInterfaceError, p.getStatCachePath)
+        self.assertRaises(errors.IncompleteInterfaceError,
+                          p.getLabelSnapshotPath)
         self.assertRaises(errors.IncompleteInterfaceError, p.getPackageJobId)
         self.assertRaises(errors.IncompleteInterfaceError, p.getGroupJobId)
         self.assertRaises(errors.IncompleteInterfaceError, p.getImageJobIds)
@@ -23,7 +23,6 @@ from rbuild_test import rbuildhelp
 from testutils import mock
 
 from conary.lib import util
-from conary import state
 
 from rbuild import errors
 
@@ -69,6 +68,10 @@ class DirStoreTest(rbuildhelp.RbuildHelper):
         self.assertEquals(productStore.getBaseDirectory(),
             self.workDir + '/foo')
         self.assertEquals(productStore.getActiveStageName(), 'stable')
+        self.assertEquals(productStore.getLabelSnapshotPath(),
+            self.workDir + '/foo/.rbuild/labelsnapshots/stable')
+        self.assertEquals(productStore.getLabelSnapshotPath('devel'),
+            self.workDir + '/foo/.rbuild/labelsnapshots/devel')
         productStore = dirstore.CheckoutProductStore(handle,
             baseDirectory=self.workDir + '/foo')
         self.assertEquals(productStore.getBaseDirectory(),
@@ -171,54 +174,75 @@ class DirStoreTest(rbuildhelp.RbuildHelper):
         assert(str(err) == "No product directory at %r" %self.workDir)
 
 
-    def testGetEditedRecipeDicts(self):
-        realListDir = os.listdir
-        realExists = os.path.exists
-        def mockListDir(path):
-            if path.endswith('/qa'):
-                return ['asdf' ]
-            return realListDir(path)
-        def mockExists(path):
-            if path.endswith('CONARY'):
-                return True
-            if path.startswith('/PROD'):
-                return True
-            return realExists(path)
-
-        self.mock(os, 'listdir', lambda *args: mockListDir(*args))
-        self.mock(os.path, 'exists', lambda *args: mockExists(*args))
+    def _prepCheckouts(self):
+        stageDir = self.workDir + '/PROD/qa'
+        util.mkdirChain(stageDir + '/asdf')
+        util.mkdirChain(stageDir + '/notacheckout')
+        self.writeFile(stageDir + '/asdf/CONARY', 'state\n')
         productStore = mock.MockInstance(dirstore.CheckoutProductStore)
-        productStore._mock.enableMethod('getEditedRecipeDicts')
+        productStore._mock.set(_baseDirectory=self.workDir + '/PROD',
+                               _packageIndex=None)
+        productStore._mock.enableMethod('_getCheckoutNames')
         productStore.getRbuildConfigPath._mock.setReturn(
                                                 self.workDir + '/rbuildrc')
-
-        handle = self.getRbuildHandle(productStore=productStore)
+        self.getRbuildHandle(productStore=productStore)
         productStore._handle.facade.conary = mock.MockObject()
-        stateObj = mock.MockObject()
-        stateObj.getSourceState().getName._mock.setDefaultReturn('asdf:source')
-        mock.mock(state, 'ConaryStateFromFile')
-        state.ConaryStateFromFile._mock.setDefaultReturn(stateObj)
+        productStore.getStageDirectory._mock.setDefaultReturn(stageDir)
+        return productStore, stageDir
 
+    def testGetEditedRecipeDicts(self):
+        productStore, stageDir = self._prepCheckouts()
+        productStore._mock.enableMethod('getEditedRecipeDicts')
         productStore._handle.facade.conary.getNameForCheckout._mock.setDefaultReturn('asdf')
         productStore._handle.facade.conary.isGroupName._mock.setDefaultReturn(False)
-        productStore.getActiveStageName._mock.setDefaultReturn(None)
-        productStore.getStageDirectory._mock.setDefaultReturn('/PROD/qa')
         packageDict, groupDict = productStore.getEditedRecipeDicts('qa')
-        assert packageDict == {'asdf' : '/PROD/qa/asdf/asdf.recipe'}
+        assert packageDict == {'asdf' : stageDir + '/asdf/asdf.recipe'}
         assert groupDict == {}
-        productStore.getActiveStageName._mock.setDefaultReturn('qa')
         packageDict, groupDict = productStore.getEditedRecipeDicts()
-        assert packageDict == {'asdf' : '/PROD/qa/asdf/asdf.recipe'}
+        assert packageDict == {'asdf' : stageDir + '/asdf/asdf.recipe'}
         assert groupDict == {}
 
         productStore._handle.facade.conary.getNameForCheckout._mock.setDefaultReturn('group-asdf')
         productStore._handle.facade.conary.isGroupName._mock.setDefaultReturn(True)
-        stateObj.getSourceState().getName._mock.setDefaultReturn(
-                                                          'group-asdf:source')
+        # the CONARY file changed, so the package is named again
+        self.writeFile(stageDir + '/asdf/CONARY', 'group state\n')
         packageDict, groupDict = productStore.getEditedRecipeDicts('qa')
 
         assert packageDict == {}
-        assert groupDict == {'group-asdf' : '/PROD/qa/asdf/group-asdf.recipe'}
+        assert groupDict == {'group-asdf' : stageDir + '/asdf/group-asdf.recipe'}
+
+    def testPackageIndex(self):
+        productStore, stageDir = self._prepCheckouts()
+        getNameForCheckout = productStore._handle.facade.conary.getNameForCheckout
+        getNameForCheckout._mock.setDefaultReturn('asdf')
+        statePath = stageDir + '/asdf/CONARY'
+        os.utime(statePath, (1000, 1000))
+        os.utime(stageDir, (1000, 1000))
+        self.assertEquals(productStore._getCheckoutNames(stageDir),
+                          [(stageDir + '/asdf', 'asdf')])
+        getNameForCheckout._mock.assertCalled(stageDir + '/asdf')
+
+        # a new product store reads the index back from disk
+        productStore._mock.set(_packageIndex=None)
+        self.assertEquals(productStore._getCheckoutNames(stageDir),
+                          [(stageDir + '/asdf', 'asdf')])
+        getNameForCheckout._mock.assertNotCalled()
+
+        # the CONARY file changed
+        getNameForCheckout._mock.setDefaultReturn('blah')
+        self.writeFile(statePath, 'other state\n')
+        os.utime(statePath, (2000, 2000))
+        self.assertEquals(productStore._getCheckoutNames(stageDir),
+                          [(stageDir + '/asdf', 'blah')])
+        getNameForCheckout._mock.assertCalled(stageDir + '/asdf')
+
+        # a new checkout in the stage
+        util.mkdirChain(stageDir + '/bar')
+        self.writeFile(stageDir + '/bar/CONARY', 'state\n')
+        self.assertEquals(productStore._getCheckoutNames(stageDir),
+                          [(stageDir + '/asdf', 'blah'),
+                           (stageDir + '/bar', 'blah')])
+        getNameForCheckout._mock.assertCalled(stageDir + '/bar')
 
     def testStatusStore(self):
         productStore = mock.MockInstance(dirstore.CheckoutProductStore)
@@ -321,41 +345,47 @@ class DirStoreTest(rbuildhelp.RbuildHelper):
                           '/PROD/qa/foo')
 
     def testGetPackagePath(self):
-        realListDir = os.listdir
-        realExists = os.path.exists
-        def mockListDir(path):
-            if path.endswith('/qa'):
-                return ['asdf' ]
-            return realListDir(path)
-        def mockExists(path):
-            if path.endswith('CONARY'):
-                return True
-            if path.startswith('/PROD'):
-                return True
-            return realExists(path)
-
-        self.mock(os, 'listdir', lambda *args: mockListDir(*args))
-        self.mock(os.path, 'exists', lambda *args: mockExists(*args))
-
-        productStore = mock.MockInstance(dirstore.CheckoutProductStore)
+        productStore, stageDir = self._prepCheckouts()
         productStore._mock.enableMethod('getPackagePath')
-        productStore.getStageDirectory._mock.setDefaultReturn('/PROD/qa')
-
-        handle = self.getRbuildHandle(productStore=productStore)
-        productStore._handle.facade.conary = mock.MockObject()
-        stateObj = mock.MockObject()
-        stateObj.getSourceState().getName._mock.setDefaultReturn('asdf:source')
-        mock.mock(state, 'ConaryStateFromFile')
-        state.ConaryStateFromFile._mock.setDefaultReturn(stateObj)
-
         productStore._handle.facade.conary.getNameForCheckout._mock.setDefaultReturn('asdf')
         productStore._handle.facade.conary.isGroupName._mock.setDefaultReturn(False)
 
         packagePath = productStore.getPackagePath('asdf')
-        assert(packagePath == '/PROD/qa/asdf')
+        assert(packagePath == stageDir + '/asdf')
         packagePath = productStore.getPackagePath('blah')
         assert(packagePath is None)
 
+    def testProductCache(self):
+        self._prepProductStore()
+        self.writeFile(self.workDir
+                       + '/foo/.rbuild/product-definition/CONARY', 'state\n')
+        os.chdir('foo/stable')
+        handle = self.getRbuildHandle(productStore=mock.MockObject())
+        productStore = dirstore.CheckoutProductStore(handle)
+        mock.mockMethod(productStore._getSourceTroveVersion,
+            returnValue='cny.tv@ns:1/2-3')
+        prodDef = productStore.getProduct()
+        productStore._getSourceTroveVersion._mock.assertCalled()
+
+        # the source trove is read back from the cache, the XML is parsed
+        prodDef.setProductDescription("Even more foo")
+        productStore.save(prodDef)
+        prodDef = productStore.getProduct()
+        productStore._getSourceTroveVersion._mock.assertNotCalled()
+        self.assertEqual(prodDef.getProductDescription(), 'Even more foo')
+        self.assertEqual(prodDef._sourceTrove, 'cny.tv@ns:1/2-3')
+
+        # changing the checkout state invalidates the cache
+        self.writeFile(self.workDir
+                       + '/foo/.rbuild/product-definition/CONARY', 'other\n')
+        productStore.getProduct()
+        productStore._getSourceTroveVersion._mock.assertCalled()
+
+        # as does a cache that cannot be read
+        self.writeFile(self.workDir + '/foo/.rbuild/productcache', 'garbage')
+        productStore.getProduct()
+        productStore._getSourceTroveVersion._mock.assertCalled()
+
     def testGetConfigData(self):
         productStore = mock.MockInstance(dirstore.CheckoutProductStore)
         productStore._mock.enable('_baseDirectory')
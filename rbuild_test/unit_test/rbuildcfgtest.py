@@ -57,9 +57,12 @@ class ConfigTest(rbuildhelp.RbuildHelper):
 
         expected = '''\
 # applianceTemplate (Default: groupSetAppliance) (At `rbuild init': groupSetAppliance)
+# cacheDirectory (Default: ~/.rbuild/cache) (At `rbuild init': ~/.rbuild/cache)
+# cacheTimeouts (Default: ) (At `rbuild init': )
 # contact (Default: None) (At `rbuild init': mr.user@foo.com)
 # factoryTemplate (Default: factory) (At `rbuild init': factory)
 # groupTemplate (Default: groupSet) (At `rbuild init': groupSet)
+# jobTimeout (Default: 0) (At `rbuild init': 0)
 # name (Default: None) (At `rbuild init': Mr. User)
 # pluginDirs (Default: /usr/share/rbuild/plugins:~/.rbuild/plugins.d) (At `rbuild init': /usr/share/rbuild/plugins:~/.rbuild/plugins.d)
 # quiet (Default: False) (At `rbuild init': True)
@@ -74,6 +77,7 @@ repositoryMap             foo.com                   https://repo.foo.com/conary/
 # serverUrl (Default: None) (At `rbuild init': http://myrbuilder.foo)
 # signatureKey (Default: None) (At `rbuild init': ASDF)
 # signatureKeyMap (Default: []) (At `rbuild init': foo FDSA)
+# useCache (Default: True) (At `rbuild init': True)
 '''
 
         self.assertEqualWithDiff(dump, expected)
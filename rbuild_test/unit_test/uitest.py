@@ -102,6 +102,19 @@ class UserInterfaceTest(rbuildhelp.RbuildHelper):
         h.ui._log._mock.assertCalled(('  data5  '))
         h.ui._log._mock.assertCalled(('    data6'))
 
+    def testWriteTableStream(self):
+        h = self.getRbuildHandle()
+        h.ui._log = mock.MockObject()
+
+        rows = iter([('data1', 'a'), ('data2', 'b'), ('longer data3', 'c')])
+
+        # only the sampled rows are used for padding
+        h.ui.writeTable(rows, headers=('H1', 'H2'), sampleSize=2)
+        h.ui.outStream.write._mock.assertCalled(('H1     H2\n'))
+        h.ui.outStream.write._mock.assertCalled(('data1  a\n'))
+        h.ui.outStream.write._mock.assertCalled(('data2  b\n'))
+        h.ui.outStream.write._mock.assertCalled(('longer data3  c\n'))
+
     def testUserInterface(self):
         h = self.getRbuildHandle()
         h.ui._log = mock.MockObject()